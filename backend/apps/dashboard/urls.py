@@ -5,4 +5,5 @@ urlpatterns = [
     path("overview/", views.dashboard_overview, name="dashboard-overview"),
     path("sales-summary/", views.sales_summary, name="sales-summary"),
     path("inventory-alerts/", views.inventory_alerts, name="inventory-alerts"),
+    path("cache-stats/", views.cache_stats, name="cache-stats"),
 ]
@@ -2,18 +2,25 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Sum, Count, Avg, F
-from django.utils import timezone
-from datetime import datetime, timedelta
+from django.db.models import Sum, Q
 from decimal import Decimal
 
-from apps.orders.models import Order, OrderItem
-from apps.products.models import Product
-from apps.inventory.models import Inventory
+from apps.orders.dateranges import get_store_today
+from apps.orders.models import Order, DailySalesRollup
+from apps.orders.selectors import OrderSelectors
+from apps.orders.services import SalesAnalyticsService
+from apps.products.models import STOCK_LOW, STOCK_OUT, Product
+from store_backend.cache import cached_api, get_cache_stats
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@cached_api(
+    "dashboard_overview",
+    ("orders", "products", "inventory"),
+    ttl=30,
+    vary=get_store_today,
+)
 def dashboard_overview(request):
     """
     Comprehensive dashboard API for in-store management system
@@ -21,95 +28,43 @@ def dashboard_overview(request):
     """
 
     # Get date ranges
-    today = timezone.now().date()
-    # week_start = today - timedelta(days=today.weekday())
+    today = get_store_today()
     month_start = today.replace(day=1)
-    print(f"Today's date: {today}, Month start: {month_start}")
 
-    # Today's metrics
-    today_orders = Order.objects.filter(
-        created_at__date=today, status__in=["completed", "paid"]
+    # Today's and this month's totals in one conditional-aggregate query
+    totals = SalesAnalyticsService.get_rollup_totals_by_range(
+        {"today": (today, today), "month": (month_start, today)}
     )
+
+    # Today's metrics
+    today_totals = totals["today"]
     today_metrics = {
-        "orders_count": today_orders.count(),
-        "total_sales": today_orders.aggregate(total=Sum("total"))["total"]
-        or Decimal("0"),
-        "avg_order_value": today_orders.aggregate(avg=Avg("total"))["avg"]
-        or Decimal("0"),
-        "items_sold": OrderItem.objects.filter(order__in=today_orders).aggregate(
-            total=Sum("quantity")
-        )["total"]
-        or 0,
+        "orders_count": today_totals["total_orders"],
+        "total_sales": today_totals["total_revenue"],
+        "avg_order_value": today_totals["average_order_value"],
+        "items_sold": today_totals["total_items_sold"],
     }
 
-    # This week's metrics
-    # week_orders = Order.objects.filter(
-    #     created_at__date__gte=week_start, status__in=["completed", "paid"]
-    # )
-    # week_metrics = {
-    #     "orders_count": week_orders.count(),
-    #     "total_sales": week_orders.aggregate(total=Sum("total"))["total"]
-    #     or Decimal("0"),
-    #     "avg_order_value": week_orders.aggregate(avg=Avg("total"))["avg"]
-    #     or Decimal("0"),
-    #     "items_sold": OrderItem.objects.filter(order__in=week_orders).aggregate(
-    #         total=Sum("quantity")
-    #     )["total"]
-    #     or 0,
-    # }
-
     # This month's metrics
-    month_orders = Order.objects.filter(
-        created_at__date__gte=month_start, status__in=["completed", "paid"]
-    )
+    month_totals = totals["month"]
     month_metrics = {
-        "orders_count": month_orders.count(),
-        "total_revenue": month_orders.aggregate(total=Sum("total"))["total"]
-        or Decimal("0"),
-        "avg_order_value": month_orders.aggregate(avg=Avg("total"))["avg"]
-        or Decimal("0"),
-        "items_sold": OrderItem.objects.filter(order__in=month_orders).aggregate(
-            total=Sum("quantity")
-        )["total"]
-        or 0,
+        "orders_count": month_totals["total_orders"],
+        "total_revenue": month_totals["total_revenue"],
+        "avg_order_value": month_totals["average_order_value"],
+        "items_sold": month_totals["total_items_sold"],
     }
 
-    # Inventory status
-    # total_products = Product.objects.filter(status="active").count()
-    # low_stock_products = Product.objects.filter(status="active", stock__lte=10).count()
-    # out_of_stock_products = Product.objects.filter(status="active", stock=0).count()
-
-    # Top selling products (this month)
-    # top_products = (
-    #     OrderItem.objects.filter(
-    #         order__created_at__date__gte=month_start,
-    #         order__status__in=["completed", "paid"],
-    #     )
-    #     .values("product__name", "product_name")
-    #     .annotate(
-    #         total_quantity=Sum("quantity"),
-    #         total_revenue=Sum(F("quantity") * F("price")),
-    #     )
-    #     .order_by("-total_quantity")[:5]
-    # )
-
     # Inventory alerts
     low_stock_products = (
-        Product.objects.filter(status="active", stock__lte=10)
+        Product.objects.filter(status="active", stock_state__in=[STOCK_LOW, STOCK_OUT])
         .values("id", "name", "stock", "min_stock")
         .order_by("stock")[:5]
     )
 
-    # inventory_alerts = {
-    #     "low_stock_items": list(low_stock_products),
-    # }
-
     # Recent orders
-    recent_orders = (
-        Order.objects.select_related()
-        .prefetch_related("items__product")
-        .order_by("-created_at")[:10]
-    )
+    recent_orders = OrderSelectors.with_item_totals(
+        Order.objects.order_by("-created_at")
+    )[:10]
 
     recent_orders_data = []
     for order in recent_orders:
@@ -122,7 +77,7 @@ def dashboard_overview(request):
                 "status": order.status,
                 "payment_method": order.payment_method,
                 "created_at": order.created_at.isoformat(),
-                "items_count": order.items.count(),
+                "items_count": order.item_count,
             }
         )
 
@@ -138,42 +93,32 @@ def dashboard_overview(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@cached_api("sales_summary", ("orders",), ttl=30, vary=get_store_today)
 def sales_summary(request):
     """
     Quick sales summary for the current day
     """
-    today = timezone.now().date()
-
-    # Today's completed orders
-    today_orders = Order.objects.filter(
-        created_at__date=today, status__in=["completed", "paid"]
+    today = get_store_today()
+
+    # Today's totals by status and payment method in one query
+    completed = Q(status="completed")
+    totals = DailySalesRollup.objects.filter(day=today).aggregate(
+        total_orders=Sum("order_count", filter=completed),
+        total_sales=Sum("total", filter=completed),
+        total_items=Sum("items_sold", filter=completed),
+        pending_orders=Sum("order_count", filter=Q(status="pending")),
+        cash_sales=Sum("total", filter=completed & Q(payment_method="cash")),
+        card_sales=Sum("total", filter=completed & Q(payment_method="card")),
     )
 
     summary = {
         "date": today.isoformat(),
-        "total_orders": today_orders.count(),
-        "total_sales": str(
-            today_orders.aggregate(total=Sum("total"))["total"] or Decimal("0")
-        ),
-        "total_items": OrderItem.objects.filter(order__in=today_orders).aggregate(
-            total=Sum("quantity")
-        )["total"]
-        or 0,
-        "pending_orders": Order.objects.filter(
-            created_at__date=today, status="pending"
-        ).count(),
-        "cash_sales": str(
-            today_orders.filter(payment_method="cash").aggregate(total=Sum("total"))[
-                "total"
-            ]
-            or Decimal("0")
-        ),
-        "card_sales": str(
-            today_orders.filter(payment_method="card").aggregate(total=Sum("total"))[
-                "total"
-            ]
-            or Decimal("0")
-        ),
+        "total_orders": totals["total_orders"] or 0,
+        "total_sales": str(totals["total_sales"] or Decimal("0")),
+        "total_items": totals["total_items"] or 0,
+        "pending_orders": totals["pending_orders"] or 0,
+        "cash_sales": str(totals["cash_sales"] or Decimal("0")),
+        "card_sales": str(totals["card_sales"] or Decimal("0")),
     }
 
     return Response(summary)
@@ -181,28 +126,40 @@ def sales_summary(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@cached_api("inventory_alerts", ("products", "inventory"), ttl=60)
 def inventory_alerts(request):
     """
     Get inventory alerts for low stock and out of stock items
     """
 
-    # Low stock products (stock <= 10)
-    low_stock = (
-        Product.objects.filter(status="active", stock__lte=10, stock__gt=0)
+    # Low stock products (at or below their minimum stock), an index range scan
+    low_stock = list(
+        Product.objects.filter(status="active", stock_state=STOCK_LOW)
         .values("id", "name", "stock", "min_stock")
         .order_by("stock")
     )
 
     # Out of stock products
-    out_of_stock = Product.objects.filter(status="active", stock=0).values(
-        "id", "name", "stock", "min_stock"
+    out_of_stock = list(
+        Product.objects.filter(status="active", stock_state=STOCK_OUT).values(
+            "id", "name", "stock", "min_stock"
+        )
     )
 
     return Response(
         {
-            "low_stock_products": list(low_stock),
-            "out_of_stock_products": list(out_of_stock),
-            "low_stock_count": low_stock.count(),
-            "out_of_stock_count": out_of_stock.count(),
+            "low_stock_products": low_stock,
+            "out_of_stock_products": out_of_stock,
+            "low_stock_count": len(low_stock),
+            "out_of_stock_count": len(out_of_stock),
         }
     )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def cache_stats(request):
+    """
+    Hit, miss and wait counters of the cached dashboard and analytics endpoints
+    """
+    return Response(get_cache_stats())
@@ -1,7 +1,33 @@
 from django.contrib import admin
-from .models import Supplier, Inventory, RestockHistory
+from .models import Supplier, Inventory, RestockHistory, StockMovement
 
 admin.site.register(Supplier)
-admin.site.register(Inventory)
 admin.site.register(RestockHistory)
-# Register your models here.
+
+
+@admin.register(Inventory)
+class InventoryAdmin(admin.ModelAdmin):
+    """Inventory records; min_stock mirrors the product's and is edited there"""
+
+    list_display = ("product", "min_stock", "supplier", "updated_at")
+    list_select_related = ("product", "supplier")
+    readonly_fields = ("min_stock",)
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    """Read-only admin for the stock ledger"""
+
+    list_display = ("created_at", "product", "kind", "quantity", "order", "note")
+    list_filter = ("kind", "created_at")
+    search_fields = ("product__name", "order__order_number", "note")
+    list_select_related = ("product", "order")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -1,45 +1,171 @@
-from django.core.management.base import BaseCommand
+"""
+Management command to bring inventory records in line with products.
+Usage: python manage.py sync_inventory [--chunk-size 1000] [--dry-run]
+       [--reconcile-ledger]
+
+Products are processed in primary key chunks, each with a fixed number of
+set-based queries: one bulk insert for missing inventory records, one
+UPDATE (after fetching the ids) for records whose min_stock disagrees with
+their product, and one aggregate comparing product stock with the stock
+ledger. An item's stock status is not stored on the record; it is read from
+the product's stock_state, which every stock change keeps current.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Now
 from apps.products.models import Product
-from apps.inventory.models import Inventory
+from apps.inventory.models import Inventory, StockMovement
 
 
 class Command(BaseCommand):
-    help = "Sync product stock with inventory records"
+    help = "Sync inventory records with products and audit stock against the ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of products processed per transaction (default: 1000)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the differences without changing anything",
+        )
+        parser.add_argument(
+            "--reconcile-ledger",
+            action="store_true",
+            help="Record adjustments so the ledger matches drifted product stock",
+        )
 
     def handle(self, *args, **options):
-        products = Product.objects.all()
-        created_count = 0
-        updated_count = 0
-
-        for product in products:
-            inventory, created = Inventory.objects.get_or_create(
-                product=product,
-                defaults={
-                    "stock": product.stock,
-                    "min_stock": product.min_stock or 1,
-                    "status": "in_stock" if product.stock > 0 else "out_of_stock",
-                },
-            )
-
-            if created:
-                created_count += 1
-                self.stdout.write(
-                    self.style.SUCCESS(f"Created inventory for product: {product.name}")
-                )
-            else:
-                # Update existing inventory to match product stock
-                if inventory.stock != product.stock:
-                    inventory.stock = product.stock
-                    inventory.save()
-                    updated_count += 1
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f"Updated inventory for product: {product.name}"
-                        )
-                    )
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        dry_run = options["dry_run"]
 
+        total_products = Product.objects.count()
+        chunks = (total_products + chunk_size - 1) // chunk_size
+        totals = {"created": 0, "updated": 0, "drifted": 0, "reconciled": 0}
+
+        last_id = None
+        for chunk in range(1, chunks + 1):
+            products = Product.objects.order_by("pk")
+            if last_id is not None:
+                products = products.filter(pk__gt=last_id)
+            product_ids = list(products.values_list("pk", flat=True)[:chunk_size])
+            if not product_ids:
+                break
+            last_id = product_ids[-1]
+
+            with transaction.atomic():
+                counts = self.sync_chunk(product_ids, dry_run, options)
+                if dry_run:
+                    transaction.set_rollback(True)
+
+            for key, value in counts.items():
+                totals[key] += value
+            self.stdout.write(
+                f"Chunk {chunk}/{chunks}: {len(product_ids)} products, "
+                f"{counts['created']} created, {counts['updated']} updated, "
+                f"{counts['drifted']} drifted"
+            )
+
+        prefix = "Dry run completed" if dry_run else "Sync completed"
         self.stdout.write(
             self.style.SUCCESS(
-                f"Sync completed. Created: {created_count}, Updated: {updated_count}"
+                f"{prefix}. Products: {total_products}, "
+                f"Created: {totals['created']}, Updated: {totals['updated']}, "
+                f"Drifted: {totals['drifted']}, Reconciled: {totals['reconciled']}"
             )
         )
+
+    def sync_chunk(self, product_ids, dry_run, options):
+        """Sync the inventory records and audit the ledger of one chunk"""
+        counts = {"created": 0, "updated": 0, "drifted": 0, "reconciled": 0}
+
+        # Missing inventory records
+        missing = list(
+            Product.objects.filter(
+                pk__in=product_ids, inventory__isnull=True
+            ).values_list("id", "name", "min_stock")
+        )
+        counts["created"] = len(missing)
+        if dry_run:
+            for _, name, _ in missing:
+                self.stdout.write(f"  + {name}: inventory record missing")
+        else:
+            Inventory.objects.bulk_create(
+                [
+                    Inventory(product_id=product_id, min_stock=min_stock or 1)
+                    for product_id, _, min_stock in missing
+                ]
+            )
+
+        # Records whose min_stock disagrees with the product
+        mismatched = (
+            Inventory.objects.filter(product_id__in=product_ids)
+            .annotate(expected_min_stock=Greatest(F("product__min_stock"), Value(1)))
+            .exclude(min_stock=F("expected_min_stock"))
+        )
+        if dry_run:
+            rows = list(
+                mismatched.values_list(
+                    "product__name", "min_stock", "expected_min_stock"
+                )
+            )
+            counts["updated"] = len(rows)
+            for name, min_stock, expected_min in rows:
+                self.stdout.write(
+                    f"  ~ {name}: min_stock {min_stock} -> {expected_min}"
+                )
+        else:
+            # MySQL cannot UPDATE a table it selects from, so fetch the ids first
+            mismatched_ids = list(mismatched.values_list("pk", flat=True))
+            product = Product.objects.filter(pk=OuterRef("product_id"))
+            counts["updated"] = Inventory.objects.filter(pk__in=mismatched_ids).update(
+                min_stock=Greatest(Subquery(product.values("min_stock")[:1]), Value(1)),
+                updated_at=Now(),
+            )
+
+        # Product stock that disagrees with the stock ledger
+        ledger_total = (
+            StockMovement.objects.filter(product=OuterRef("pk"))
+            .values("product")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        )
+        drifted = list(
+            Product.objects.filter(pk__in=product_ids)
+            .annotate(
+                ledger_stock=Coalesce(
+                    Subquery(ledger_total, output_field=IntegerField()), Value(0)
+                )
+            )
+            .exclude(stock=F("ledger_stock"))
+            .values_list("id", "name", "stock", "ledger_stock")
+        )
+        counts["drifted"] = len(drifted)
+        for _, name, stock, ledger_stock in drifted:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"  ! {name}: product stock {stock}, ledger {ledger_stock}"
+                )
+            )
+        if options["reconcile_ledger"] and drifted and not dry_run:
+            StockMovement.objects.bulk_create(
+                [
+                    StockMovement(
+                        product_id=product_id,
+                        kind=StockMovement.ADJUSTMENT,
+                        quantity=stock - ledger_stock,
+                        note="Ledger reconciliation",
+                    )
+                    for product_id, _, stock, ledger_stock in drifted
+                ]
+            )
+            counts["reconciled"] = len(drifted)
+
+        return counts
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def record_opening_balances(apps, schema_editor):
+    """Start the ledger of every product at its current on-hand stock"""
+    Product = apps.get_model("products", "Product")
+    StockMovement = apps.get_model("inventory", "StockMovement")
+
+    StockMovement.objects.bulk_create(
+        (
+            StockMovement(
+                product_id=product_id,
+                kind="opening",
+                quantity=stock,
+                note="Opening balance from product stock",
+            )
+            for product_id, stock in Product.objects.exclude(stock=0)
+            .values_list("id", "stock")
+            .iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0001_initial"),
+        ("orders", "0006_order_number_sequence"),
+        ("products", "0005_product_image"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("opening", "Opening balance"),
+                            ("sale", "Sale"),
+                            ("cancel", "Cancellation"),
+                            ("refund", "Refund"),
+                            ("restock", "Restock"),
+                            ("adjustment", "Adjustment"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("quantity", models.IntegerField()),
+                ("note", models.CharField(blank=True, max_length=255)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "order",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="stock_movements",
+                        to="orders.order",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_movements",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["product", "created_at"],
+                        name="inventory_s_product_5919a9_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="inventory",
+            name="stock",
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0002_stock_movement_ledger"),
+        ("products", "0006_cursor_pagination_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="inventory",
+            index=models.Index(
+                fields=["created_at", "id"], name="inventory_i_created_16f572_idx"
+            ),
+        ),
+    ]
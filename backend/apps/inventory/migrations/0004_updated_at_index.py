@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0003_cursor_pagination_index"),
+        ("products", "0010_updated_at_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="inventory",
+            index=models.Index(
+                fields=["updated_at"], name="inventory_i_updated_22da79_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 03:07
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0004_updated_at_index"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="inventory",
+            name="status",
+        ),
+    ]
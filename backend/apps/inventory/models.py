@@ -21,15 +21,32 @@ class Inventory(models.Model):
     product = models.OneToOneField(
         Product, on_delete=models.CASCADE, related_name="inventory"
     )
-    stock = models.PositiveIntegerField(default=0)
+    # On-hand stock is Product.stock, maintained through the StockMovement ledger
     min_stock = models.PositiveIntegerField(default=1)
     supplier = models.ForeignKey(
         Supplier, on_delete=models.SET_NULL, null=True, blank=True
     )
-    status = models.CharField(max_length=20, default="in_stock")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset (cursor) pagination of the inventory list
+            models.Index(fields=["created_at", "id"]),
+            # MAX(updated_at) for list ETags (store_backend.conditional)
+            models.Index(fields=["updated_at"]),
+        ]
+
+    @property
+    def stock(self):
+        return self.product.stock
+
+    @property
+    def status(self):
+        # Derived from the product's stock_state, which every stock change
+        # keeps current, rather than stored a second time
+        return self.product.stock_status
+
     def __str__(self):
         return f"{self.product.name} Inventory"
 
@@ -46,3 +63,46 @@ class RestockHistory(models.Model):
 
     def __str__(self):
         return f"Restock {self.quantity} on {self.restocked_at}"
+
+
+class StockMovement(models.Model):
+    """Append-only ledger entry for a change in a product's on-hand stock"""
+
+    OPENING = "opening"
+    SALE = "sale"
+    CANCEL = "cancel"
+    REFUND = "refund"
+    RESTOCK = "restock"
+    ADJUSTMENT = "adjustment"
+    KIND_CHOICES = [
+        (OPENING, "Opening balance"),
+        (SALE, "Sale"),
+        (CANCEL, "Cancellation"),
+        (REFUND, "Refund"),
+        (RESTOCK, "Restock"),
+        (ADJUSTMENT, "Adjustment"),
+    ]
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="stock_movements"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField()  # Signed change to on-hand stock
+    order = models.ForeignKey(
+        "orders.Order",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="stock_movements",
+    )
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["product", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} {self.product_id}"
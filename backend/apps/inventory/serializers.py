@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Inventory, Supplier, RestockHistory
+from apps.products.models import STOCK_STATUS_LABELS
 from apps.products.serializers import ProductSerializer
 
 
@@ -46,12 +47,19 @@ class InventorySerializer(serializers.ModelSerializer):
     # Stock quantity aliased for consistency
     stock_quantity = serializers.IntegerField(source="stock", read_only=True)
 
+    # The product's minimum stock, which alerts are judged against; the
+    # inventory column only mirrors it
+    min_stock = serializers.IntegerField(
+        source="product.min_stock", min_value=0, required=False
+    )
+
     # Size and color (if available in product model, otherwise default)
     size = serializers.SerializerMethodField()
     color = serializers.SerializerMethodField()
 
     # Stock status
     stock_status = serializers.SerializerMethodField()
+    status = serializers.CharField(read_only=True)
 
     class Meta:
         model = Inventory
@@ -77,6 +85,17 @@ class InventorySerializer(serializers.ModelSerializer):
             "updated_at",
         ]
 
+    def update(self, instance, validated_data):
+        """Update the item, saving a new minimum stock on its product"""
+        min_stock = validated_data.pop("product", {}).get("min_stock")
+        if min_stock is not None:
+            product = instance.product
+            product.min_stock = min_stock
+            # Recomputes stock_state and syncs the inventory mirror
+            product.save(update_fields=["min_stock", "updated_at"])
+            instance.min_stock = min_stock
+        return super().update(instance, validated_data)
+
     def get_size(self, obj):
         """Get product size if available, otherwise return default"""
         return getattr(obj.product, "size", "One Size")
@@ -87,8 +106,4 @@ class InventorySerializer(serializers.ModelSerializer):
 
     def get_stock_status(self, obj):
         """Return human-readable stock status"""
-        if obj.stock == 0:
-            return "Out of Stock"
-        elif obj.stock <= obj.min_stock:
-            return "Low Stock"
-        return "In Stock"
+        return STOCK_STATUS_LABELS[obj.product.stock_status]
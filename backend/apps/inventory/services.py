@@ -0,0 +1,261 @@
+from functools import reduce
+from operator import or_
+from typing import Dict, Optional
+from uuid import UUID
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, When
+from apps.products.models import Product, stock_update
+from store_backend.cache import mark_changed
+from .models import StockMovement
+
+
+class InsufficientStockError(ValueError):
+    """Raised when a stock deduction would take a product below zero"""
+
+
+class StockService:
+    """
+    Service class for product stock changes
+
+    Product.stock is the cached on-hand quantity and StockMovement is the
+    ledger behind it. Every change goes through this class so that both are
+    written in the same transaction, and every stock UPDATE also sets the
+    product's stored stock_state (see stock_update).
+    """
+
+    @staticmethod
+    @transaction.atomic
+    def deduct(
+        quantities: Dict[UUID, int],
+        kind: str = StockMovement.SALE,
+        order=None,
+        note: str = "",
+    ) -> None:
+        """
+        Take stock for several products in one conditional UPDATE
+
+        Every row is only decremented if it still holds enough stock, so the
+        update can never oversell even without a prior lock on the products.
+
+        Args:
+            quantities: Mapping of product ID to the quantity to take
+            kind: Ledger movement kind
+            order: Order the movement belongs to, if any
+            note: Free text stored on the movements
+
+        Raises:
+            InsufficientStockError: If any product lacks stock; nothing is
+                deducted in that case
+        """
+        quantities = {
+            product_id: quantity
+            for product_id, quantity in quantities.items()
+            if quantity
+        }
+        if not quantities:
+            return
+
+        enough_stock = reduce(
+            or_,
+            (
+                Q(id=product_id, stock__gte=quantity)
+                for product_id, quantity in quantities.items()
+            ),
+        )
+        updated = Product.objects.filter(enough_stock).update(
+            **stock_update(
+                Case(
+                    *(
+                        When(id=product_id, then=F("stock") - quantity)
+                        for product_id, quantity in quantities.items()
+                    ),
+                    output_field=IntegerField(),
+                )
+            )
+        )
+        if updated != len(quantities):
+            StockService._raise_insufficient(quantities)
+
+        StockService._record(
+            {product_id: -quantity for product_id, quantity in quantities.items()},
+            kind,
+            order,
+            note,
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def restore(
+        quantities: Dict[UUID, int], kind: str, order=None, note: str = ""
+    ) -> None:
+        """
+        Return or receive stock for several products in one UPDATE
+
+        Args:
+            quantities: Mapping of product ID to the quantity to add
+            kind: Ledger movement kind (cancel, refund, restock...)
+            order: Order the movement belongs to, if any
+            note: Free text stored on the movements
+        """
+        quantities = {
+            product_id: quantity
+            for product_id, quantity in quantities.items()
+            if quantity
+        }
+        if not quantities:
+            return
+
+        Product.objects.filter(id__in=quantities).update(
+            **stock_update(
+                Case(
+                    *(
+                        When(id=product_id, then=F("stock") + quantity)
+                        for product_id, quantity in quantities.items()
+                    ),
+                    output_field=IntegerField(),
+                )
+            )
+        )
+        StockService._record(quantities, kind, order, note)
+
+    @staticmethod
+    @transaction.atomic
+    def set_stock(
+        product_id: UUID,
+        stock: int,
+        kind: str = StockMovement.ADJUSTMENT,
+        note: str = "",
+    ) -> int:
+        """
+        Set a product's on-hand stock, recording the difference
+
+        Args:
+            product_id: Product to count
+            stock: New on-hand quantity
+            kind: Ledger movement kind
+            note: Free text stored on the movement
+
+        Returns:
+            Signed change applied to the stock
+
+        Raises:
+            ValueError: If the stock is negative
+            Product.DoesNotExist: If the product does not exist
+        """
+        if stock < 0:
+            raise ValueError("Stock quantity cannot be negative")
+
+        current = (
+            Product.objects.select_for_update()
+            .values_list("stock", flat=True)
+            .get(id=product_id)
+        )
+        change = stock - current
+        if change:
+            Product.objects.filter(id=product_id).update(**stock_update(stock))
+            StockService._record({product_id: change}, kind, None, note)
+        return change
+
+    @staticmethod
+    @transaction.atomic
+    def set_stocks(
+        products: Dict[UUID, Product],
+        counts: Dict[UUID, int],
+        kind: str = StockMovement.ADJUSTMENT,
+        note: str = "",
+        chunk_size: int = 500,
+    ) -> Dict[UUID, int]:
+        """
+        Set the on-hand stock of many products, recording the differences
+
+        Writes happen in chunks of chunk_size products, each one CASE-based
+        UPDATE plus one bulk ledger INSERT.
+
+        Args:
+            products: Products to count, locked with select_for_update by
+                the caller so their stock cannot change underneath
+            counts: Mapping of product ID to the new on-hand quantity
+            kind: Ledger movement kind
+            note: Free text stored on the movements
+            chunk_size: Number of products written per UPDATE
+
+        Returns:
+            Mapping of product ID to the stock it had before
+        """
+        previous = {product_id: products[product_id].stock for product_id in counts}
+        changes = {
+            product_id: stock - previous[product_id]
+            for product_id, stock in counts.items()
+            if stock != previous[product_id]
+        }
+
+        changed_ids = list(changes)
+        for start in range(0, len(changed_ids), chunk_size):
+            chunk = changed_ids[start : start + chunk_size]
+            Product.objects.filter(id__in=chunk).update(
+                **stock_update(
+                    Case(
+                        *(
+                            When(id=product_id, then=counts[product_id])
+                            for product_id in chunk
+                        ),
+                        output_field=IntegerField(),
+                    )
+                )
+            )
+            StockService._record(
+                {product_id: changes[product_id] for product_id in chunk},
+                kind,
+                None,
+                note,
+            )
+
+        for product_id, stock in counts.items():
+            products[product_id].stock = stock
+        return previous
+
+    @staticmethod
+    def record_opening(product: Product) -> None:
+        """
+        Record the stock a new product was created with
+
+        Args:
+            product: Newly created product
+        """
+        StockService._record(
+            {product.id: product.stock}, StockMovement.OPENING, None, ""
+        )
+
+    @staticmethod
+    def _record(
+        changes: Dict[UUID, int], kind: str, order: Optional[object], note: str
+    ) -> None:
+        """Append ledger movements for signed stock changes"""
+        mark_changed("inventory")
+        StockMovement.objects.bulk_create(
+            [
+                StockMovement(
+                    product_id=product_id,
+                    kind=kind,
+                    quantity=change,
+                    order=order,
+                    note=note,
+                )
+                for product_id, change in changes.items()
+                if change
+            ]
+        )
+
+    @staticmethod
+    def _raise_insufficient(quantities: Dict[UUID, int]) -> None:
+        """Raise an error naming the first product that lacks stock"""
+        products = Product.objects.filter(id__in=quantities).values_list(
+            "id", "name", "stock"
+        )
+        for product_id, name, stock in products:
+            if stock < quantities[product_id]:
+                raise InsufficientStockError(
+                    f"Insufficient stock for {name}. Available: {stock}, "
+                    f"Requested: {quantities[product_id]}"
+                )
+        raise InsufficientStockError("Insufficient stock")
@@ -1,3 +1,411 @@
+"""
+Test suite for the Inventory app.
+Tests the stock ledger and the endpoints and commands built on it.
+"""
+
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.orders.services import OrderService
+from apps.products.models import Product, Category
+from apps.products.serializers import ProductSerializer
+from .models import Inventory, StockMovement
+from .services import StockService
+
+
+class StockLedgerTest(TestCase):
+    """Test cases for the stock movement ledger"""
+
+    databases = {"default", "order_numbers"}
+
+    def setUp(self):
+        """Set up test data"""
+        self.category = Category.objects.create(name="Trousers")
+        self.product = Product.objects.create(
+            name="Chinos", price=Decimal("30.00"), stock=10, category=self.category
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username="stockkeeper", password="secret")
+        )
+
+    def assert_ledger_matches(self):
+        self.product.refresh_from_db()
+        ledger = self.product.stock_movements.aggregate(total=Sum("quantity"))
+        self.assertEqual(ledger["total"], self.product.stock)
+
+    def test_new_product_opening_balance(self):
+        """Creating a product adds its inventory record and opening balance"""
+        self.assertTrue(Inventory.objects.filter(product=self.product).exists())
+        movement = self.product.stock_movements.get()
+        self.assertEqual(movement.kind, StockMovement.OPENING)
+        self.assertEqual(movement.quantity, 10)
+
+    def test_sale_and_cancel_movements(self):
+        """Sales and cancellations are recorded against their order"""
+        order = OrderService.create_order(
+            items=[{"product_id": self.product.id, "quantity": 3}],
+            payment_method="cash",
+        )
+        OrderService.cancel_order(order.id)
+
+        movements = dict(order.stock_movements.values_list("kind", "quantity"))
+        self.assertEqual(movements, {StockMovement.SALE: -3, StockMovement.CANCEL: 3})
+        self.assert_ledger_matches()
+        self.assertEqual(self.product.stock, 10)
+
+    def test_update_stock_endpoint(self):
+        """Counting stock through the API records an adjustment"""
+        inventory = self.product.inventory
+        response = self.client.post(
+            f"/api/inventory/{inventory.pk}/update_stock/", {"stock": 7}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["stock_quantity"], 7)
+
+        response = self.client.put(
+            f"/api/inventory/{inventory.pk}/", {"stock_quantity": 12}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        adjustments = self.product.stock_movements.filter(
+            kind=StockMovement.ADJUSTMENT
+        ).values_list("quantity", flat=True)
+        self.assertEqual(sorted(adjustments), [-3, 5])
+        self.assert_ledger_matches()
+
+        response = self.client.post(
+            f"/api/inventory/{inventory.pk}/update_stock/", {"stock": -1}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_product_edit_keeps_concurrent_sale(self):
+        """Editing a product does not write back a stale stock value"""
+        stale = Product.objects.get(pk=self.product.pk)
+        StockService.deduct({self.product.id: 4})
+
+        serializer = ProductSerializer(
+            stale, data={"name": "Slim Chinos"}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, "Slim Chinos")
+        self.assertEqual(self.product.stock, 6)
+        self.assert_ledger_matches()
+
+    def test_product_edit_stock(self):
+        """Changing stock through the product serializer is an adjustment"""
+        serializer = ProductSerializer(self.product, data={"stock": 4}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(
+            self.product.stock_movements.filter(kind=StockMovement.ADJUSTMENT)
+            .get()
+            .quantity,
+            -6,
+        )
+        self.assert_ledger_matches()
+
+    def test_low_stock_endpoint(self):
+        """Low stock is judged on product stock"""
+        StockService.set_stock(self.product.id, 1)
+        response = self.client.get("/api/inventory/low_stock/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["product_name"] for row in response.data], ["Chinos"])
+
+    def test_inventory_list_etag(self):
+        """The inventory list answers a matching If-None-Match with a 304"""
+        response = self.client.get("/api/inventory/")
+        etag = response["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/inventory/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertLessEqual(len(queries), 1)
+
+        OrderService.create_order(
+            items=[{"product_id": self.product.id, "quantity": 1}],
+            payment_method="cash",
+        )
+        response = self.client.get("/api/inventory/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["stock_quantity"], 9)
+
+    def test_inventory_cursor_pages(self):
+        """Cursor pages cover every inventory record newest first"""
+        for number in range(4):
+            Product.objects.create(
+                name=f"Cords {number}", price=Decimal("30.00"), category=self.category
+            )
+        seen = []
+        params = {"pagination": "cursor", "page_size": 2}
+        while True:
+            response = self.client.get("/api/inventory/", params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row["id"] for row in response.data["results"])
+            if not response.data["has_next"]:
+                break
+            params["cursor"] = response.data["next_cursor"]
+
+        self.assertEqual(
+            seen,
+            list(
+                Inventory.objects.order_by("-created_at", "-id").values_list(
+                    "id", flat=True
+                )
+            ),
+        )
+
+
+class StockStateTest(TestCase):
+    """Test cases for the stored stock_state and the alerts reading it"""
+
+    databases = {"default", "order_numbers"}
+
+    def setUp(self):
+        """Set up test data"""
+        self.category = Category.objects.create(name="Outerwear")
+        self.coat = Product.objects.create(
+            name="Coat",
+            price=Decimal("90.00"),
+            stock=12,
+            min_stock=10,
+            category=self.category,
+        )
+        self.hat = Product.objects.create(
+            name="Hat",
+            price=Decimal("15.00"),
+            stock=12,
+            min_stock=20,
+            category=self.category,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username="stockkeeper", password="secret")
+        )
+
+    def assert_states(self, **states):
+        self.assertEqual(
+            {
+                name.lower(): state
+                for name, state in Product.objects.values_list("name", "stock_state")
+            },
+            states,
+        )
+
+    def test_state_follows_every_stock_change(self):
+        """Sales, returns, counts and bulk counts all keep stock_state current"""
+        self.assert_states(coat="ok", hat="low")
+
+        order = OrderService.create_order(
+            items=[
+                {"product_id": self.coat.id, "quantity": 2},
+                {"product_id": self.hat.id, "quantity": 12},
+            ],
+            payment_method="cash",
+        )
+        self.assert_states(coat="low", hat="out")
+
+        OrderService.cancel_order(order.id)
+        self.assert_states(coat="ok", hat="low")
+
+        StockService.set_stock(self.coat.id, 0)
+        self.assert_states(coat="out", hat="low")
+
+        StockService.set_stocks(
+            Product.objects.in_bulk([self.coat.id, self.hat.id]),
+            {self.coat.id: 5, self.hat.id: 40},
+        )
+        self.assert_states(coat="low", hat="ok")
+        # Inventory status is read from the product, with no sync needed
+        self.assertEqual(
+            {
+                item.product.name: item.status
+                for item in Inventory.objects.select_related("product")
+            },
+            {"Coat": "low_stock", "Hat": "in_stock"},
+        )
+
+    def test_threshold_edits_use_current_stock(self):
+        """Changing the threshold judges it against the stock in the database"""
+        stale = Product.objects.get(pk=self.coat.pk)
+        StockService.deduct({self.coat.id: 7})
+
+        serializer = ProductSerializer(stale, data={"min_stock": 3}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assert_states(coat="ok", hat="low")
+
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name="Gloves",
+                    price=Decimal("9.00"),
+                    stock=2,
+                    min_stock=5,
+                    category=self.category,
+                )
+            ]
+        )
+        self.assertEqual(Product.objects.get(name="Gloves").stock_state, "low")
+
+    def test_alert_endpoints_read_stock_state(self):
+        """Every alert list honours each product's own threshold"""
+        StockService.set_stock(self.coat.id, 0)
+
+        # Both lists are read once; the counts are taken from them
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/dashboard/inventory-alerts/")
+        self.assertEqual(response.data["low_stock_count"], 1)
+        self.assertEqual(response.data["out_of_stock_count"], 1)
+        self.assertEqual(
+            [row["name"] for row in response.data["low_stock_products"]], ["Hat"]
+        )
+        self.assertEqual(
+            [row["name"] for row in response.data["out_of_stock_products"]], ["Coat"]
+        )
+
+        self.assert_alerts(low=["Hat"], out=["Coat"])
+        response = self.client.get("/api/inventory/", {"stock_status": "good"})
+        self.assertEqual(response.data["results"], [])
+
+    def test_threshold_edits_reach_every_alert(self):
+        """Minimum stock edited through either API moves every alert list"""
+        self.assert_alerts(low=["Hat"], out=[])
+
+        inventory = Inventory.objects.get(product=self.coat)
+        response = self.client.put(
+            f"/api/inventory/{inventory.id}/", {"min_stock": 15}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["min_stock"], 15)
+        self.assertEqual(response.data["stock_status"], "Low Stock")
+        self.assertEqual(Inventory.objects.get(pk=inventory.pk).min_stock, 15)
+        self.assert_alerts(low=["Coat", "Hat"], out=[])
+
+        response = self.client.patch(
+            f"/api/products/{self.hat.id}/", {"min_stock": 5}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Inventory.objects.get(product=self.hat).min_stock, 5)
+        self.assert_alerts(low=["Coat"], out=[])
+
+        StockService.set_stock(self.coat.id, 0)
+        self.assert_alerts(low=[], out=["Coat"])
+
+    def assert_alerts(self, low, out):
+        """Every alert endpoint lists these low and out of stock products"""
+        alerts = self.client.get("/api/dashboard/inventory-alerts/").data
+        self.assertEqual(
+            sorted(row["name"] for row in alerts["low_stock_products"]), low
+        )
+        self.assertEqual(
+            sorted(row["name"] for row in alerts["out_of_stock_products"]), out
+        )
+        overview = self.client.get("/api/dashboard/overview/").data
+        self.assertEqual(
+            sorted(row["name"] for row in overview["inventory_alerts"]),
+            sorted(low + out),
+        )
+
+        for code, names, label in [
+            ("low_stock", low, "Low Stock"),
+            ("out_of_stock", out, "Out of Stock"),
+        ]:
+            rows = self.client.get(f"/api/products/{code}/").data
+            self.assertEqual(sorted(row["name"] for row in rows), names)
+            self.assertTrue(all(row["stock_status"] == label for row in rows))
+            rows = self.client.get("/api/products/", {"stock_status": code})
+            self.assertEqual(sorted(row["name"] for row in rows.data["results"]), names)
+
+            rows = self.client.get(f"/api/inventory/{code}/").data
+            self.assertEqual(sorted(row["product_name"] for row in rows), names)
+            self.assertTrue(all(row["stock_status"] == label for row in rows))
+            state = code.split("_")[0]
+            rows = self.client.get("/api/inventory/", {"stock_status": state})
+            self.assertEqual(
+                sorted(row["product_name"] for row in rows.data["results"]), names
+            )
+
+
+class SyncInventoryCommandTest(TestCase):
+    """Test cases for the set-based sync_inventory command"""
+
+    def setUp(self):
+        """Set up test data"""
+        category = Category.objects.create(name="Knitwear")
+        self.products = [
+            Product.objects.create(
+                name=f"Jumper {number}",
+                price=Decimal("25.00"),
+                stock=number,
+                min_stock=3,
+                category=category,
+            )
+            for number in range(5)
+        ]
+        # Drift every kind of difference the command deals with
+        Inventory.objects.filter(product=self.products[1]).delete()
+        Inventory.objects.filter(product=self.products[2]).update(min_stock=9)
+        Inventory.objects.filter(product=self.products[3]).update(min_stock=0)
+        Product.objects.filter(pk=self.products[4].pk).update(stock=20)
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command("sync_inventory", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_reports_without_changes(self):
+        """A dry run lists the differences and leaves the data alone"""
+        output = self.run_command("--dry-run")
+
+        self.assertIn("+ Jumper 1: inventory record missing", output)
+        self.assertIn("~ Jumper 2: min_stock 9 -> 3", output)
+        self.assertIn("~ Jumper 3: min_stock 0 -> 3", output)
+        self.assertNotIn("Jumper 0", output)
+        self.assertIn("! Jumper 4: product stock 20, ledger 4", output)
+        self.assertIn("Created: 1, Updated: 2, Drifted: 1, Reconciled: 0", output)
+        self.assertFalse(Inventory.objects.filter(product=self.products[1]).exists())
+        self.assertEqual(Inventory.objects.get(product=self.products[2]).min_stock, 9)
+
+    def test_sync_in_chunks(self):
+        """Chunked runs fix every record and can reconcile the ledger"""
+        output = self.run_command("--chunk-size", "2", "--reconcile-ledger")
+
+        self.assertIn("Chunk 3/3", output)
+        self.assertIn("Created: 1, Updated: 2, Drifted: 1, Reconciled: 1", output)
+        self.assertEqual(
+            set(Inventory.objects.values_list("min_stock", flat=True)), {3}
+        )
+        self.assertEqual(
+            self.products[4].stock_movements.aggregate(total=Sum("quantity"))["total"],
+            20,
+        )
+        self.assertIn("Drifted: 0", self.run_command())
+
+    def test_query_count_does_not_grow_with_chunk(self):
+        """Each chunk costs the same number of queries however big it is"""
+        with CaptureQueriesContext(connection) as small:
+            self.run_command("--dry-run", "--chunk-size", "5")
+
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name=f"Cardigan {number}",
+                    price=Decimal("35.00"),
+                    category=self.products[0].category,
+                )
+                for number in range(40)
+            ]
+        )
+        with CaptureQueriesContext(connection) as large:
+            self.run_command("--dry-run", "--chunk-size", "45")
 
-# Create your tests here.
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
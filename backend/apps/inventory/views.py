@@ -1,11 +1,14 @@
 from django.shortcuts import render
 from django.db import models
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, F
+from django.db.models import Q
+from apps.products.models import STOCK_LOW, STOCK_OK, STOCK_OUT, Category, Product
+from store_backend.conditional import conditional_list
+from store_backend.pagination import paginate_list
 from .models import Inventory, Supplier, RestockHistory
+from .services import StockService
 from .serializers import (
     InventorySerializer,
     SupplierSerializer,
@@ -21,6 +24,7 @@ class InventoryViewSet(viewsets.ViewSet):
     Provides CRUD operations with filtering, searching, and pagination.
     """
 
+    @conditional_list(Inventory, Product, Category, Supplier)
     def list(self, request):
         """
         List all inventory items with filtering, searching, and pagination.
@@ -32,14 +36,17 @@ class InventoryViewSet(viewsets.ViewSet):
         - ordering: Field to order by
         - page: Page number
         - page_size: Items per page (default: 10)
+        - count: "approximate" to estimate the count instead of counting
+        - pagination: "cursor" for keyset pages, newest first
+        - cursor: next_cursor of the previous page (cursor pagination)
+
+        Responses carry an ETag; a matching If-None-Match gets a 304.
         """
         # Get query parameters
         search = request.query_params.get("search", None)
         category = request.query_params.get("category", None)
         stock_status = request.query_params.get("stock_status", None)
         ordering = request.query_params.get("ordering", "-created_at")
-        page = request.query_params.get("page", 1)
-        page_size = int(request.query_params.get("page_size", 10))
 
         # Start with base queryset
         queryset = Inventory.objects.select_related(
@@ -56,39 +63,31 @@ class InventoryViewSet(viewsets.ViewSet):
             queryset = queryset.filter(product__category__name__icontains=category)
 
         if stock_status and stock_status != "all":
+            # Read from the product's indexed stock_state, the same states
+            # as the product filters and the items' stock_status
             if stock_status == "low":
-                queryset = queryset.filter(stock__lte=F("min_stock"))
+                queryset = queryset.filter(product__stock_state=STOCK_LOW)
             elif stock_status == "out":
-                queryset = queryset.filter(stock=0)
+                queryset = queryset.filter(product__stock_state=STOCK_OUT)
             elif stock_status == "good":
-                queryset = queryset.filter(stock__gt=F("min_stock"))
+                queryset = queryset.filter(product__stock_state=STOCK_OK)
 
-        # Apply ordering
+        # Apply ordering (stock is held on the product)
         if ordering:
+            if ordering.lstrip("-") in ("stock", "stock_quantity"):
+                ordering = ordering.replace(ordering.lstrip("-"), "product__stock")
             queryset = queryset.order_by(ordering)
 
         # Pagination
-        paginator = Paginator(queryset, page_size)
-        try:
-            inventory_page = paginator.page(page)
-        except PageNotAnInteger:
-            inventory_page = paginator.page(1)
-        except EmptyPage:
-            inventory_page = paginator.page(paginator.num_pages)
+        inventory_page, pagination = paginate_list(
+            request, queryset, ("-created_at", "-id")
+        )
 
         # Serialize data
         serializer = InventorySerializer(inventory_page, many=True)
 
         return Response(
-            {
-                "results": serializer.data,
-                "count": paginator.count,
-                "num_pages": paginator.num_pages,
-                "current_page": inventory_page.number,
-                "has_next": inventory_page.has_next(),
-                "has_previous": inventory_page.has_previous(),
-            },
-            status=status.HTTP_200_OK,
+            {"results": serializer.data, **pagination}, status=status.HTTP_200_OK
         )
 
     def retrieve(self, request, pk=None):
@@ -116,31 +115,9 @@ class InventoryViewSet(viewsets.ViewSet):
             )
 
         # Handle stock_quantity update
-        if "stock_quantity" in request.data:
-            new_stock = request.data.get("stock_quantity")
-            try:
-                new_stock = int(new_stock)
-                if new_stock < 0:
-                    return Response(
-                        {"error": "Stock quantity cannot be negative"},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-
-                inventory.stock = new_stock
-                inventory.save()
-
-                # Also update the product stock
-                inventory.product.stock = new_stock
-                inventory.product.save()
-
-                serializer = InventorySerializer(inventory)
-                return Response(serializer.data)
-
-            except (ValueError, TypeError):
-                return Response(
-                    {"error": "Invalid stock quantity"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+        if "stock_quantity" in request.data or "stock" in request.data:
+            new_stock = request.data.get("stock_quantity", request.data.get("stock"))
+            return self._set_stock(inventory, new_stock)
 
         # Handle other field updates
         serializer = InventorySerializer(inventory, data=request.data, partial=True)
@@ -152,10 +129,10 @@ class InventoryViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=["get"])
     def low_stock(self, request):
-        """Get items with low stock"""
+        """Get items with low stock (out of stock items are listed separately)"""
         queryset = Inventory.objects.select_related(
             "product", "product__category", "supplier"
-        ).filter(stock__lte=F("min_stock"))
+        ).filter(product__stock_state=STOCK_LOW)
 
         serializer = InventorySerializer(queryset, many=True)
         return Response(serializer.data)
@@ -165,7 +142,7 @@ class InventoryViewSet(viewsets.ViewSet):
         """Get items that are out of stock"""
         queryset = Inventory.objects.select_related(
             "product", "product__category", "supplier"
-        ).filter(stock=0)
+        ).filter(product__stock_state=STOCK_OUT)
 
         serializer = InventorySerializer(queryset, many=True)
         return Response(serializer.data)
@@ -188,28 +165,27 @@ class InventoryViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        return self._set_stock(inventory, new_stock)
+
+    def _set_stock(self, inventory, new_stock):
+        """Count an inventory item's stock through the stock ledger"""
         try:
             new_stock = int(new_stock)
-            if new_stock < 0:
-                return Response(
-                    {"error": "Stock quantity cannot be negative"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            inventory.stock = new_stock
-            inventory.save()
-
-            # Also update the product stock
-            inventory.product.stock = new_stock
-            inventory.product.save()
-
-            serializer = InventorySerializer(inventory)
-            return Response(serializer.data)
-
         except (ValueError, TypeError):
             return Response(
                 {"error": "Invalid stock quantity"}, status=status.HTTP_400_BAD_REQUEST
             )
+        if new_stock < 0:
+            return Response(
+                {"error": "Stock quantity cannot be negative"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        StockService.set_stock(inventory.product_id, new_stock, note="Stock count")
+        inventory.product.refresh_from_db(fields=["stock"])
+
+        serializer = InventorySerializer(inventory)
+        return Response(serializer.data)
 
 
 class SupplierViewSet(viewsets.ModelViewSet):
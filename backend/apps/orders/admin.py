@@ -1,8 +1,11 @@
 from django.contrib import admin
+from django.db import transaction
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
 from .models import Order, OrderItem
+from .selectors import OrderSelectors
+from .services import OrderService, SalesRollupService
 
 
 class OrderItemInline(admin.TabularInline):
@@ -154,26 +157,61 @@ class OrderAdmin(admin.ModelAdmin):
     created_at_formatted.short_description = "Created"
     created_at_formatted.admin_order_field = "created_at"
 
-    # def get_queryset(self, request):
-    #     """Optimize queryset with select_related"""
-    #     return super().get_queryset(request).select_related("customer")
+    def get_queryset(self, request):
+        """Annotate item totals so the changelist does not count per row"""
+        return OrderSelectors.with_item_totals(super().get_queryset(request))
+
+    def save_model(self, request, obj, form, change):
+        """Capture the stored order's rollup contribution before saving"""
+        if change:
+            stored = Order.objects.prefetch_related("items").get(pk=obj.pk)
+            obj._rollup_before = SalesRollupService.get_contribution(stored)
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        """Update the sales rollup once the order and its items are saved"""
+        super().save_related(request, form, formsets, change)
+        order = form.instance
+        before = getattr(order, "_rollup_before", None)
+        if before is None:
+            SalesRollupService.record_order(order)
+        else:
+            SalesRollupService.replace_contribution(before, order)
 
     actions = ["mark_as_completed", "mark_as_cancelled", "mark_as_paid"]
 
+    def _set_status(self, queryset, **fields):
+        """Update orders one at a time so the sales rollup follows along"""
+        updated = 0
+        with transaction.atomic():
+            for order in queryset.select_for_update().prefetch_related("items"):
+                with SalesRollupService.track(order):
+                    for attr, value in fields.items():
+                        setattr(order, attr, value)
+                    order.save(update_fields=list(fields))
+                updated += 1
+        return updated
+
     def mark_as_completed(self, request, queryset):
         """Mark selected orders as completed"""
-        updated = queryset.filter(status__in=["pending", "processing"]).update(
-            status="completed", completed_at=timezone.now()
+        updated = self._set_status(
+            queryset.filter(status__in=["pending", "processing"]),
+            status="completed",
+            completed_at=timezone.now(),
         )
         self.message_user(request, f"{updated} orders marked as completed.")
 
     mark_as_completed.short_description = "Mark selected orders as completed"
 
     def mark_as_cancelled(self, request, queryset):
-        """Mark selected orders as cancelled"""
-        updated = queryset.filter(status__in=["pending", "processing"]).update(
-            status="cancelled"
-        )
+        """Mark selected orders as cancelled, returning their stock"""
+        updated = 0
+        with transaction.atomic():
+            for order_id in queryset.filter(
+                status__in=["pending", "processing"]
+            ).values_list("id", flat=True):
+                OrderService.cancel_order(order_id)
+                updated += 1
         self.message_user(request, f"{updated} orders marked as cancelled.")
 
     mark_as_cancelled.short_description = "Mark selected orders as cancelled"
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class OrdersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.orders"
+
+    def ready(self):  # noqa: D401
+        # Import signals to keep the sales rollup in step with deletions
+        from . import signals  # noqa: F401
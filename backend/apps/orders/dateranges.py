@@ -0,0 +1,157 @@
+from datetime import date, datetime, time, timedelta, tzinfo
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.db.models import Q
+
+# Longest rolling window parse_window accepts ("3660d")
+MAX_WINDOW_DAYS = 3660
+
+
+def get_store_timezone() -> tzinfo:
+    """
+    Get the timezone the store trades in
+
+    Calendar days, hours and periods in reports are the store's local ones,
+    which can differ from the UTC timestamps stored in the database.
+
+    Returns:
+        Store timezone (STORE_TIME_ZONE, falling back to TIME_ZONE)
+    """
+    return ZoneInfo(getattr(settings, "STORE_TIME_ZONE", settings.TIME_ZONE))
+
+
+def get_store_today() -> date:
+    """Get the current calendar date in the store timezone"""
+    return datetime.now(get_store_timezone()).date()
+
+
+def local_date_range(start_date: date, end_date: date) -> Tuple[datetime, datetime]:
+    """
+    Convert an inclusive range of local calendar dates to datetimes
+
+    Args:
+        start_date: First local date of the range
+        end_date: Last local date of the range (inclusive)
+
+    Returns:
+        Aware (start, end) datetimes in the store timezone where end is the
+        local midnight after end_date, to be used as a half-open range
+    """
+    store_tz = get_store_timezone()
+    start = datetime.combine(start_date, time.min, tzinfo=store_tz)
+    end = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=store_tz)
+    return start, end
+
+
+def date_range_q(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    field: str = "created_at",
+) -> Q:
+    """
+    Build an index-friendly filter on a datetime field for local dates
+
+    Filters such as created_at__date or created_at__year wrap the column in
+    a function, which stops the database from using an index on it. This
+    compares the bare column with the store-local day boundaries instead.
+
+    Args:
+        start_date: First local date to include (unbounded when None)
+        end_date: Last local date to include (unbounded when None)
+        field: Datetime field or lookup path, e.g. "order__created_at"
+
+    Returns:
+        Q object for field >= start and field < end
+    """
+    q = Q()
+    if start_date is not None:
+        q &= Q(**{f"{field}__gte": local_date_range(start_date, start_date)[0]})
+    if end_date is not None:
+        q &= Q(**{f"{field}__lt": local_date_range(end_date, end_date)[1]})
+    return q
+
+
+def get_period_dates(period: str, today: Optional[date] = None) -> Tuple[date, date]:
+    """
+    Get the local calendar dates covered by a named period
+
+    Args:
+        period: One of 'today'/'day', 'yesterday', 'this_week'/'week',
+            'last_week', 'this_month'/'month', 'last_month', 'this_year'/'year'
+            or 'last_year'
+        today: Reference date (defaults to today in the store timezone)
+
+    Returns:
+        Tuple of (first date, last date), both inclusive
+
+    Raises:
+        ValueError: If the period is not recognised
+    """
+    if today is None:
+        today = get_store_today()
+
+    if period in ("today", "day"):
+        return today, today
+    if period == "yesterday":
+        yesterday = today - timedelta(days=1)
+        return yesterday, yesterday
+    if period in ("this_week", "week", "last_week"):
+        start = today - timedelta(days=today.weekday())
+        if period == "last_week":
+            start -= timedelta(days=7)
+        return start, start + timedelta(days=6)
+    if period in ("this_month", "month", "last_month"):
+        start = today.replace(day=1)
+        if period == "last_month":
+            start = (start - timedelta(days=1)).replace(day=1)
+        if start.month == 12:
+            next_start = start.replace(year=start.year + 1, month=1)
+        else:
+            next_start = start.replace(month=start.month + 1)
+        return start, next_start - timedelta(days=1)
+    if period in ("this_year", "year", "last_year"):
+        year = today.year - 1 if period == "last_year" else today.year
+        return date(year, 1, 1), date(year, 12, 31)
+
+    raise ValueError(f"Unknown period: {period}")
+
+
+def parse_window(window: str, today: Optional[date] = None) -> Tuple[date, date]:
+    """
+    Get the local calendar dates covered by a reporting window
+
+    Args:
+        window: A period name accepted by get_period_dates, 'Nd' for the
+            last N days up to today (e.g. '30d'), or an explicit range
+            'YYYY-MM-DD..YYYY-MM-DD'
+        today: Reference date (defaults to today in the store timezone)
+
+    Returns:
+        Tuple of (first date, last date), both inclusive
+
+    Raises:
+        ValueError: If the window is not recognised or its range is empty
+    """
+    if today is None:
+        today = get_store_today()
+    window = window.strip()
+
+    if ".." in window:
+        start, _, end = window.partition("..")
+        try:
+            start_date = datetime.strptime(start, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end, "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError(f"Dates in {window} must use the YYYY-MM-DD format")
+        if start_date > end_date:
+            raise ValueError(f"Window {window} ends before it starts")
+        return start_date, end_date
+
+    if window.endswith("d") and window[:-1].isdigit():
+        days = int(window[:-1])
+        if not 1 <= days <= MAX_WINDOW_DAYS:
+            raise ValueError(f"Window {window} must cover 1 to {MAX_WINDOW_DAYS} days")
+        return today - timedelta(days=days - 1), today
+
+    return get_period_dates(window, today)
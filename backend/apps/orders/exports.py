@@ -0,0 +1,194 @@
+"""
+Streaming CSV and NDJSON exports of orders and order lines.
+
+Rows are read as plain tuples in keyset chunks (see keyset_chunks) and
+encoded chunk by chunk into a StreamingHttpResponse, so an export of any
+size holds one chunk in memory at a time. Timestamps are written in the
+store timezone.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Iterator, List, Sequence, Tuple
+from uuid import UUID
+
+from django.db.models import DecimalField, ExpressionWrapper, F, QuerySet
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+from store_backend.pagination import keyset_chunks
+from .dateranges import get_store_timezone, get_store_today
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (header, values_list field) pairs, in column order
+ORDER_COLUMNS = [
+    ("order_number", "order_number"),
+    ("created_at", "created_at"),
+    ("completed_at", "completed_at"),
+    ("status", "status"),
+    ("payment_status", "payment_status"),
+    ("payment_method", "payment_method"),
+    ("customer_name", "customer_name"),
+    ("served_by", "served_by"),
+    ("subtotal", "subtotal"),
+    ("tax_amount", "tax_amount"),
+    ("discount_amount", "discount_amount"),
+    ("total", "total"),
+    ("id", "id"),
+]
+ORDER_KEYSET = ("created_at", "id")
+
+ORDER_ITEM_COLUMNS = [
+    ("order_number", "order__order_number"),
+    ("order_created_at", "order__created_at"),
+    ("order_status", "order__status"),
+    ("product_id", "product_id"),
+    ("sku", "product__sku"),
+    ("product_name", "product_name"),
+    ("quantity", "quantity"),
+    ("price", "price"),
+    ("discount", "discount"),
+    ("line_total", "line_total"),
+    ("order_id", "order_id"),
+    ("id", "id"),
+]
+ORDER_ITEM_KEYSET = ("order__created_at", "id")
+
+
+def with_line_total(queryset: QuerySet) -> QuerySet:
+    """Annotate order lines with quantity * price - discount"""
+    return queryset.annotate(
+        line_total=ExpressionWrapper(
+            F("quantity") * F("price") - F("discount"),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+    )
+
+
+def _plain_value(value: Any, store_tz) -> Any:
+    """Convert a database value to a str/int/None for the export"""
+    if isinstance(value, datetime):
+        return timezone.localtime(value, store_tz).isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+def iter_export_rows(
+    queryset: QuerySet,
+    columns: Sequence[Tuple[str, str]],
+    ordering: Sequence[str],
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[List[List[Any]]]:
+    """
+    Read export rows chunk by chunk
+
+    Args:
+        queryset: Filtered rows to export
+        columns: (header, field) pairs
+        ordering: Keyset columns ending in a unique one
+        chunk_size: Rows fetched per query
+
+    Returns:
+        Iterator of chunks of rows, each a list of plain values
+    """
+    store_tz = get_store_timezone()
+    fields = [field for _, field in columns]
+    for rows in keyset_chunks(queryset, ordering, fields, chunk_size):
+        yield [[_plain_value(value, store_tz) for value in row] for row in rows]
+
+
+def encode_csv(
+    headers: Sequence[str], chunks: Iterator[List[List[Any]]]
+) -> Iterator[str]:
+    """Encode chunks of rows as CSV text, one string per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    yield buffer.getvalue()
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def encode_ndjson(
+    headers: Sequence[str], chunks: Iterator[List[List[Any]]]
+) -> Iterator[str]:
+    """Encode chunks of rows as newline-delimited JSON objects"""
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    for rows in chunks:
+        yield "".join(f"{dumps(dict(zip(headers, row)))}\n" for row in rows)
+
+
+ENCODERS = {
+    "csv": (encode_csv, "text/csv; charset=utf-8"),
+    "ndjson": (encode_ndjson, "application/x-ndjson; charset=utf-8"),
+}
+
+
+def stream_export(
+    queryset: QuerySet,
+    columns: Sequence[Tuple[str, str]],
+    ordering: Sequence[str],
+    export_format: str,
+    filename: str,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> StreamingHttpResponse:
+    """
+    Stream a queryset as a CSV or NDJSON download
+
+    Args:
+        queryset: Filtered rows to export
+        columns: (header, field) pairs
+        ordering: Keyset columns ending in a unique one
+        export_format: 'csv' or 'ndjson'
+        filename: Download name without extension
+        chunk_size: Rows fetched per query
+
+    Returns:
+        StreamingHttpResponse with the export as an attachment
+    """
+    encode, content_type = ENCODERS[export_format]
+    headers = [header for header, _ in columns]
+    response = StreamingHttpResponse(
+        encode(headers, iter_export_rows(queryset, columns, ordering, chunk_size)),
+        content_type=content_type,
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{filename}-{get_store_today().isoformat()}'
+        f'.{export_format}"'
+    )
+    return response
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Content negotiation for the export actions (?format=csv or ndjson)
+
+    Exports stream their rows themselves; only error responses such as
+    invalid filters are rendered here, as JSON text.
+    """
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, default=str).encode(self.charset)
+
+
+class CSVExportRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class NDJSONExportRenderer(ExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+EXPORT_RENDERERS = [CSVExportRenderer, NDJSONExportRenderer]
@@ -1,18 +1,17 @@
 import django_filters
 from django_filters import rest_framework as filters
 from django.db import models
+from .dateranges import date_range_q, get_period_dates
 from .models import Order, OrderItem
 
 
 class OrderFilter(filters.FilterSet):
     """Filter class for Order model"""
 
-    # Date range filters
-    created_after = filters.DateFilter(field_name="created_at", lookup_expr="date__gte")
-    created_before = filters.DateFilter(
-        field_name="created_at", lookup_expr="date__lte"
-    )
-    created_range = filters.DateFromToRangeFilter(field_name="created_at__date")
+    # Date range filters (local calendar dates)
+    created_after = filters.DateFilter(method="filter_created_after")
+    created_before = filters.DateFilter(method="filter_created_before")
+    created_range = filters.DateFromToRangeFilter(method="filter_created_range")
 
     # Amount range filters
     total_min = filters.NumberFilter(field_name="total", lookup_expr="gte")
@@ -79,35 +78,40 @@ class OrderFilter(filters.FilterSet):
             "updated_at": ["gte", "lte"],
         }
 
+    def filter_created_after(self, queryset, name, value):
+        """Filter orders created on or after a local date"""
+        if value:
+            return queryset.filter(date_range_q(start_date=value))
+        return queryset
+
+    def filter_created_before(self, queryset, name, value):
+        """Filter orders created on or before a local date"""
+        if value:
+            return queryset.filter(date_range_q(end_date=value))
+        return queryset
+
+    def filter_created_range(self, queryset, name, value):
+        """Filter orders created between two local dates"""
+        if value and (value.start or value.stop):
+            return queryset.filter(date_range_q(value.start, value.stop))
+        return queryset
+
     def filter_today(self, queryset, name, value):
         """Filter orders created today"""
         if value:
-            from django.utils import timezone
-
-            today = timezone.now().date()
-            return queryset.filter(created_at__date=today)
+            return queryset.filter(date_range_q(*get_period_dates("today")))
         return queryset
 
     def filter_this_week(self, queryset, name, value):
         """Filter orders created this week"""
         if value:
-            from django.utils import timezone
-            from datetime import timedelta
-
-            today = timezone.now().date()
-            start_of_week = today - timedelta(days=today.weekday())
-            return queryset.filter(created_at__date__gte=start_of_week)
+            return queryset.filter(date_range_q(*get_period_dates("this_week")))
         return queryset
 
     def filter_this_month(self, queryset, name, value):
         """Filter orders created this month"""
         if value:
-            from django.utils import timezone
-
-            today = timezone.now().date()
-            return queryset.filter(
-                created_at__year=today.year, created_at__month=today.month
-            )
+            return queryset.filter(date_range_q(*get_period_dates("this_month")))
         return queryset
 
 
@@ -131,18 +135,30 @@ class OrderItemFilter(filters.FilterSet):
     order_status = filters.ChoiceFilter(
         field_name="order__status", choices=Order.STATUS_CHOICES
     )
-    order_created_after = filters.DateFilter(
-        field_name="order__created_at", lookup_expr="date__gte"
-    )
-    order_created_before = filters.DateFilter(
-        field_name="order__created_at", lookup_expr="date__lte"
-    )
+    order_created_after = filters.DateFilter(method="filter_order_created_after")
+    order_created_before = filters.DateFilter(method="filter_order_created_before")
 
     # Discount filter
     has_discount = filters.BooleanFilter(
         field_name="discount", lookup_expr="gt", label="Has Discount"
     )
 
+    def filter_order_created_after(self, queryset, name, value):
+        """Filter items of orders created on or after a local date"""
+        if value:
+            return queryset.filter(
+                date_range_q(start_date=value, field="order__created_at")
+            )
+        return queryset
+
+    def filter_order_created_before(self, queryset, name, value):
+        """Filter items of orders created on or before a local date"""
+        if value:
+            return queryset.filter(
+                date_range_q(end_date=value, field="order__created_at")
+            )
+        return queryset
+
     class Meta:
         model = OrderItem
         fields = {
@@ -175,7 +191,7 @@ class SalesReportFilter(filters.FilterSet):
     )
 
     # Product category for analysis
-    category = filters.UUIDFilter(field_name="items__product__category__id")
+    category = filters.UUIDFilter(method="filter_category")
 
     # Payment method for analysis
     payment_method = filters.ChoiceFilter(choices=Order.PAYMENT_METHODS)
@@ -186,55 +202,37 @@ class SalesReportFilter(filters.FilterSet):
     def filter_start_date(self, queryset, name, value):
         """Filter by start date"""
         if value:
-            return queryset.filter(created_at__date__gte=value)
+            return queryset.filter(date_range_q(start_date=value))
         return queryset
 
     def filter_end_date(self, queryset, name, value):
         """Filter by end date"""
         if value:
-            return queryset.filter(created_at__date__lte=value)
+            return queryset.filter(date_range_q(end_date=value))
         return queryset
 
     def filter_period(self, queryset, name, value):
         """Filter by predefined period"""
-        from django.utils import timezone
-        from datetime import timedelta
-
-        today = timezone.now().date()
-
-        if value == "today":
-            return queryset.filter(created_at__date=today)
-        elif value == "yesterday":
-            yesterday = today - timedelta(days=1)
-            return queryset.filter(created_at__date=yesterday)
-        elif value == "this_week":
-            start_of_week = today - timedelta(days=today.weekday())
-            return queryset.filter(created_at__date__gte=start_of_week)
-        elif value == "last_week":
-            start_of_last_week = today - timedelta(days=today.weekday() + 7)
-            end_of_last_week = start_of_last_week + timedelta(days=6)
-            return queryset.filter(
-                created_at__date__range=[start_of_last_week, end_of_last_week]
-            )
-        elif value == "this_month":
-            return queryset.filter(
-                created_at__year=today.year, created_at__month=today.month
-            )
-        elif value == "last_month":
-            if today.month == 1:
-                last_month_year = today.year - 1
-                last_month = 12
-            else:
-                last_month_year = today.year
-                last_month = today.month - 1
+        try:
+            start_date, end_date = get_period_dates(value)
+        except ValueError:
+            return queryset
+        return queryset.filter(date_range_q(start_date, end_date))
+
+    def filter_category(self, queryset, name, value):
+        """
+        Filter orders with at least one item in a category
+
+        A semi-join (IN subquery) rather than a join on items, so an order
+        with several lines in the category is still returned once and sums
+        over the filtered orders are not multiplied.
+        """
+        if value:
             return queryset.filter(
-                created_at__year=last_month_year, created_at__month=last_month
+                id__in=OrderItem.objects.filter(product__category_id=value).values(
+                    "order_id"
+                )
             )
-        elif value == "this_year":
-            return queryset.filter(created_at__year=today.year)
-        elif value == "last_year":
-            return queryset.filter(created_at__year=today.year - 1)
-
         return queryset
 
     class Meta:
@@ -0,0 +1,219 @@
+"""
+Management command to benchmark the streaming order exports.
+Usage: python manage.py benchmark_export [--orders 200000] [--lines 3]
+       [--format csv|ndjson] [--chunk-size 2000] [--compare] [--keep]
+
+Streams the order and order line exports exactly as the export endpoints
+do and reports rows per second and the process's peak resident memory
+before and after. --compare then builds the same orders through the
+paginated list's OrderReadSerializer in one go, for contrast. With
+--orders, that many synthetic orders are inserted first inside a
+transaction that is rolled back afterwards unless --keep is given.
+"""
+
+import random
+import resource
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from apps.orders.exports import (
+    ENCODERS,
+    ORDER_COLUMNS,
+    ORDER_ITEM_COLUMNS,
+    ORDER_ITEM_KEYSET,
+    ORDER_KEYSET,
+    stream_export,
+    with_line_total,
+)
+from apps.orders.models import Order, OrderItem
+from apps.orders.selectors import OrderSelectors
+from apps.orders.serializers import OrderReadSerializer
+from apps.products.models import Product
+
+NUMBER_PREFIX = "BENCH"
+BATCH_SIZE = 2000
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process so far (Linux reports KiB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def create_synthetic_orders(count: int, lines: int) -> float:
+    """
+    Bulk insert synthetic orders (signals and rollups are skipped)
+
+    Args:
+        count: Orders to create
+        lines: Order lines per order
+
+    Returns:
+        Seconds taken
+
+    Raises:
+        CommandError: If there are no products to order
+    """
+    products = list(Product.objects.values_list("id", "name", "price")[:50])
+    if not products:
+        raise CommandError("Synthetic orders need at least one product")
+    rng = random.Random(1)
+    started = time.perf_counter()
+    now = timezone.now()
+    for start in range(0, count, BATCH_SIZE):
+        orders, items = [], []
+        for number in range(start, min(start + BATCH_SIZE, count)):
+            order = Order(
+                order_number=f"{NUMBER_PREFIX}{number:09d}",
+                status="completed",
+                payment_method=rng.choice(["cash", "card", "mobile_money"]),
+                payment_status="paid",
+            )
+            subtotal = Decimal("0")
+            for _ in range(lines):
+                product_id, name, price = rng.choice(products)
+                quantity = rng.randint(1, 4)
+                subtotal += price * quantity
+                items.append(
+                    OrderItem(
+                        order=order,
+                        product_id=product_id,
+                        product_name=name,
+                        quantity=quantity,
+                        price=price,
+                    )
+                )
+            order.subtotal = order.total = subtotal
+            orders.append(order)
+        Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create(items)
+        # Spread the orders over the last year
+        for order in orders:
+            order.created_at = now - timedelta(minutes=rng.randint(0, 525600))
+        Order.objects.bulk_update(orders, ["created_at"])
+    return time.perf_counter() - started
+
+
+class Rollback(Exception):
+    """Raised to discard the synthetic orders"""
+
+
+class Command(BaseCommand):
+    help = "Measure export throughput and memory of the streaming order exports"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--orders",
+            type=int,
+            default=0,
+            help="Synthetic orders to add before timing (default: 0)",
+        )
+        parser.add_argument(
+            "--lines",
+            type=int,
+            default=3,
+            help="Order lines per synthetic order (default: 3)",
+        )
+        parser.add_argument(
+            "--format",
+            dest="export_format",
+            choices=sorted(ENCODERS),
+            default="csv",
+            help="Export format (default: csv)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched per query (default: 2000)",
+        )
+        parser.add_argument(
+            "--compare",
+            action="store_true",
+            help="Also serialize all orders with OrderReadSerializer",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the synthetic orders after the run",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1 or options["lines"] < 1:
+            raise CommandError("--chunk-size and --lines must be at least 1")
+        try:
+            with transaction.atomic():
+                if options["orders"]:
+                    self.create_orders(options["orders"], options["lines"])
+                self.run(options)
+                if options["orders"] and not options["keep"]:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write("Rolled back the synthetic orders")
+
+    def create_orders(self, count, lines):
+        elapsed = create_synthetic_orders(count, lines)
+        self.stdout.write(
+            f"Created {count} orders with {count * lines} lines in {elapsed:.1f}s"
+        )
+
+    def run(self, options):
+        export_format = options["export_format"]
+        chunk_size = options["chunk_size"]
+        self.stdout.write(f"Peak RSS before exporting: {peak_rss_mb():.1f} MB")
+
+        self.time_export(
+            "orders",
+            stream_export(
+                Order.objects.all(),
+                ORDER_COLUMNS,
+                ORDER_KEYSET,
+                export_format,
+                "orders",
+                chunk_size,
+            ),
+        )
+        self.time_export(
+            "order lines",
+            stream_export(
+                with_line_total(OrderItem.objects.all()),
+                ORDER_ITEM_COLUMNS,
+                ORDER_ITEM_KEYSET,
+                export_format,
+                "order-items",
+                chunk_size,
+            ),
+        )
+
+        if options["compare"]:
+            started = time.perf_counter()
+            orders = OrderSelectors.with_item_totals(
+                OrderSelectors.with_items(Order.objects.order_by("created_at"))
+            )
+            data = OrderReadSerializer(orders, many=True).data
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                self.style.WARNING(
+                    f"serializer   {len(data):>10} orders  "
+                    f"{len(data) / elapsed:>10.0f} rows/s  "
+                    f"peak RSS {peak_rss_mb():8.1f} MB"
+                )
+            )
+
+    def time_export(self, name, response):
+        started = time.perf_counter()
+        rows = -1 if response["Content-Type"].startswith("text/csv") else 0
+        size = 0
+        for part in response.streaming_content:
+            rows += part.count(b"\n")
+            size += len(part)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{name:<12} {rows:>10} rows  "
+                f"{rows / elapsed if elapsed else 0:>10.0f} rows/s  "
+                f"{size / 1048576:8.1f} MB  peak RSS {peak_rss_mb():8.1f} MB"
+            )
+        )
@@ -0,0 +1,132 @@
+"""
+Management command to benchmark API payload rendering and compression.
+Usage: python manage.py benchmark_payloads [--orders 1000] [--page-size 100]
+       [--rounds 50] [--keep]
+
+Builds one page of GET /api/orders/ as the endpoint does, renders it with
+DRF's JSONRenderer and with FastJSONRenderer and reports the median render
+time of each (checking both give the same bytes), then sends the JSON
+through CompressionMiddleware once per Accept-Encoding and reports the
+bytes on the wire and the time taken. With --orders, that many synthetic
+orders are inserted first inside a transaction that is rolled back
+afterwards unless --keep is given.
+"""
+
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+from apps.orders.models import Order
+from apps.orders.views import OrderViewSet
+from store_backend import middleware, renderers
+from store_backend.middleware import CompressionMiddleware
+from store_backend.renderers import FastJSONRenderer
+from .benchmark_export import Rollback, create_synthetic_orders
+
+
+class Command(BaseCommand):
+    help = "Compare JSON renderers and response encodings for the order list"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--orders",
+            type=int,
+            default=0,
+            help="Synthetic orders to add before timing (default: 0)",
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=100,
+            help="Orders on the rendered page (default: 100)",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=50,
+            help="Timed rounds per case; the median is reported (default: 50)",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the synthetic orders after the run",
+        )
+
+    def handle(self, *args, **options):
+        if options["rounds"] < 1 or options["page_size"] < 1:
+            raise CommandError("--rounds and --page-size must be at least 1")
+        try:
+            with transaction.atomic():
+                if options["orders"]:
+                    elapsed = create_synthetic_orders(options["orders"], 3)
+                    self.stdout.write(
+                        f"Created {options['orders']} orders in {elapsed:.1f}s"
+                    )
+                self.run(options["page_size"], options["rounds"])
+                if options["orders"] and not options["keep"]:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write("Rolled back the synthetic orders")
+
+    def run(self, page_size, rounds):
+        if not Order.objects.exists():
+            raise CommandError("No orders to render; use --orders N")
+        request = APIRequestFactory().get("/api/orders/", {"page_size": page_size})
+        # An unsaved user passes IsAuthenticated; the list is not per user
+        force_authenticate(request, user=get_user_model()(username="benchmark"))
+        view = OrderViewSet.as_view({"get": "list"})
+        data = view(request).data
+        self.stdout.write(
+            f"GET /api/orders/?page_size={page_size}: "
+            f"{len(data['results'])} orders, median of {rounds} rounds"
+        )
+
+        stdlib = JSONRenderer()
+        fast = FastJSONRenderer()
+        content = stdlib.render(data)
+        if renderers.orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed"))
+        elif fast.render(data) != content:
+            raise CommandError("FastJSONRenderer output differs from JSONRenderer")
+
+        old = self.time(lambda: stdlib.render(data), rounds)
+        new = self.time(lambda: fast.render(data), rounds)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"render  JSONRenderer {old * 1000:7.2f} ms  "
+                f"FastJSONRenderer {new * 1000:7.2f} ms  ({old / new:.1f}x)"
+            )
+        )
+
+        encodings = ["identity", "gzip"]
+        if middleware.brotli is not None:
+            encodings.append("br")
+        else:
+            self.stdout.write(self.style.WARNING("brotli is not installed"))
+        for encoding in encodings:
+            compress = CompressionMiddleware(lambda request: HttpResponse(content))
+            request = APIRequestFactory().get(
+                "/api/orders/", HTTP_ACCEPT_ENCODING=encoding
+            )
+            elapsed = self.time(lambda: compress(request), rounds)
+            size = len(compress(request).content)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{encoding:<9} {size:>9} bytes  "
+                    f"({size / len(content):6.1%})  {elapsed * 1000:7.2f} ms"
+                )
+            )
+
+    @staticmethod
+    def time(call, rounds):
+        """Median seconds of one call"""
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
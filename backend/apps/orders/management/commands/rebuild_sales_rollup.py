@@ -0,0 +1,88 @@
+"""
+Management command to rebuild or backfill the daily sales rollup tables.
+Usage: python manage.py rebuild_sales_rollup [--start-date YYYY-MM-DD]
+       [--end-date YYYY-MM-DD] [--chunk-days 31]
+"""
+
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from apps.orders.dateranges import get_store_timezone
+from apps.orders.models import Order
+from apps.orders.services import SalesRollupService
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales rollup tables from orders, in chunks of days"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start-date",
+            help="First day to rebuild (defaults to the day of the first order)",
+        )
+        parser.add_argument(
+            "--end-date",
+            help="Last day to rebuild (defaults to the day of the latest order)",
+        )
+        parser.add_argument(
+            "--chunk-days",
+            type=int,
+            default=31,
+            help="Number of days rebuilt per transaction (default: 31)",
+        )
+
+    def parse_date(self, value, option):
+        try:
+            return datetime.strptime(value, "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError(f"{option} must use the YYYY-MM-DD format")
+
+    def handle(self, *args, **options):
+        if options["chunk_days"] < 1:
+            raise CommandError("--chunk-days must be at least 1")
+
+        bounds = Order.objects.aggregate(
+            first=Min("created_at"), last=Max("created_at")
+        )
+        if bounds["first"] is None and not (
+            options["start_date"] and options["end_date"]
+        ):
+            self.stdout.write("No orders to roll up.")
+            return
+
+        store_tz = get_store_timezone()
+        start_date = (
+            self.parse_date(options["start_date"], "--start-date")
+            if options["start_date"]
+            else timezone.localtime(bounds["first"], store_tz).date()
+        )
+        end_date = (
+            self.parse_date(options["end_date"], "--end-date")
+            if options["end_date"]
+            else timezone.localtime(bounds["last"], store_tz).date()
+        )
+        if start_date > end_date:
+            raise CommandError("--start-date must be on or before --end-date")
+
+        order_rows = product_rows = 0
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(
+                chunk_start + timedelta(days=options["chunk_days"] - 1), end_date
+            )
+            written = SalesRollupService.rebuild(chunk_start, chunk_end)
+            order_rows += written[0]
+            product_rows += written[1]
+            self.stdout.write(
+                f"Rebuilt {chunk_start} to {chunk_end}: "
+                f"{written[0]} order rows, {written[1]} product rows"
+            )
+            chunk_start = chunk_end + timedelta(days=1)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rollup rebuilt from {start_date} to {end_date}. "
+                f"Order rows: {order_rows}, Product rows: {product_rows}"
+            )
+        )
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:26
+
+from datetime import datetime
+
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    """Start each day's counter after the highest existing order number"""
+    Order = apps.get_model("orders", "Order")
+    OrderNumberSequence = apps.get_model("orders", "OrderNumberSequence")
+
+    last_values = {}
+    for order_number in Order.objects.values_list("order_number", flat=True).iterator():
+        parts = order_number.split("-")
+        if len(parts) != 3 or parts[0] != "ORD":
+            continue
+        try:
+            day = datetime.strptime(parts[1], "%Y%m%d").date()
+            number = int(parts[2])
+        except ValueError:
+            continue
+        last_values[day] = max(number, last_values.get(day, 0))
+
+    OrderNumberSequence.objects.bulk_create(
+        [
+            OrderNumberSequence(day=day, last_value=last_value)
+            for day, last_value in last_values.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0005_daily_sales_rollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderNumberSequence",
+            fields=[
+                ("day", models.DateField(primary_key=True, serialize=False)),
+                ("last_value", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.db.models import Sum, F
 from apps.products.models import Product
+from .numbering import generate_order_number
 import uuid
 
 
@@ -61,22 +62,7 @@ class Order(models.Model):
     def save(self, *args, **kwargs):
         if not self.order_number:
             # Generate order number like ORD-20250611-001
-            from django.utils import timezone
-
-            today = timezone.now().strftime("%Y%m%d")
-            last_order = (
-                Order.objects.filter(order_number__startswith=f"ORD-{today}")
-                .order_by("-order_number")
-                .first()
-            )
-
-            if last_order:
-                last_num = int(last_order.order_number.split("-")[-1])
-                new_num = last_num + 1
-            else:
-                new_num = 1
-
-            self.order_number = f"ORD-{today}-{new_num:03d}"
+            self.order_number = generate_order_number()
         super().save(*args, **kwargs)
 
     def calculate_totals(self):
@@ -93,10 +79,22 @@ class Order(models.Model):
 
     @property
     def item_count(self):
+        """Number of line items, using list annotations or prefetched items"""
+        if hasattr(self, "annotated_item_count"):
+            return self.annotated_item_count
+        prefetched = getattr(self, "_prefetched_objects_cache", {})
+        if "items" in prefetched:
+            return len(prefetched["items"])
         return self.items.count()
 
     @property
     def total_quantity(self):
+        """Units across all line items, using list annotations or prefetched items"""
+        if hasattr(self, "annotated_total_quantity"):
+            return self.annotated_total_quantity
+        prefetched = getattr(self, "_prefetched_objects_cache", {})
+        if "items" in prefetched:
+            return sum(item.quantity for item in prefetched["items"])
         return self.items.aggregate(total=Sum("quantity"))["total"] or 0
 
     def __str__(self):
@@ -132,3 +130,71 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity} x {self.product_name}"
+
+
+class OrderNumberSequence(models.Model):
+    """Last order sequence number handed out for a store day"""
+
+    day = models.DateField(primary_key=True)  # Local date in the store timezone
+    last_value = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.last_value}"
+
+
+class DailySalesRollup(models.Model):
+    """Order totals pre-aggregated per store day, payment method and status"""
+
+    day = models.DateField()  # Local date in the store timezone
+    payment_method = models.CharField(max_length=20, choices=Order.PAYMENT_METHODS)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    order_count = models.IntegerField(default=0)
+    items_sold = models.IntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["day", "payment_method", "status"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "payment_method", "status"],
+                name="unique_daily_sales_rollup",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["status", "day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.payment_method} {self.status}: {self.total}"
+
+
+class DailyProductSalesRollup(models.Model):
+    """Order line totals pre-aggregated per store day, product and status"""
+
+    day = models.DateField()  # Local date in the store timezone
+    product_id = models.UUIDField()
+    product_name = models.CharField(max_length=200, default="")
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["day", "product_name"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "product_id", "status"],
+                name="unique_daily_product_sales_rollup",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["status", "day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.product_name} {self.status}: {self.quantity}"
@@ -0,0 +1,203 @@
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db import DatabaseError, connection, connections, transaction
+from django.db.models.constants import OnConflict
+from .dateranges import get_store_today
+
+# Database alias of the autocommit connection the counter is bumped on
+ORDER_NUMBER_DATABASE = "order_numbers"
+
+
+class OrderNumberAllocator:
+    """
+    Allocator for per-day order sequence numbers
+
+    The counter for each store day lives in an OrderNumberSequence row and
+    is bumped with a single UPDATE that also returns the new value. Inside
+    a checkout transaction that UPDATE runs on the worker thread's
+    connection to the "order_numbers" database alias, which autocommits and
+    is closed and reused like any other (CONN_MAX_AGE), so the row lock is
+    released at once instead of being held until the checkout commits;
+    checkouts then only queue on the counter for the duration of one
+    statement. The trade-off:
+    a checkout that rolls back leaves a gap in the day's numbers, and
+    numbers may commit out of order when checkouts overlap.
+
+    SQLite locks the whole database for writes, so there the counter is
+    bumped on the checkout's own connection (as it is everywhere with
+    ORDER_NUMBER_OWN_CONNECTION=False or without the alias) and a rolled
+    back checkout gives its number back.
+
+    With a block size above 1 a worker reserves several numbers per round
+    trip and serves the rest from memory. A block reserved inside the
+    checkout transaction is only shared once that transaction commits, so
+    a rolled back reservation can never hand out a number twice.
+    """
+
+    def __init__(
+        self,
+        block_size: Optional[int] = None,
+        own_connection: Optional[bool] = None,
+    ):
+        self._block_size = block_size
+        self._own_connection = own_connection
+        self._lock = threading.Lock()
+        self._blocks: Dict[date, List[List[int]]] = {}
+
+    @property
+    def block_size(self) -> int:
+        """Numbers reserved per round trip (ORDER_NUMBER_BLOCK_SIZE by default)"""
+        if self._block_size is not None:
+            return max(1, self._block_size)
+        return max(1, getattr(settings, "ORDER_NUMBER_BLOCK_SIZE", 1))
+
+    @property
+    def own_connection(self) -> bool:
+        """Whether to bump the counter outside the checkout transaction"""
+        if self._own_connection is not None:
+            return self._own_connection
+        return getattr(settings, "ORDER_NUMBER_OWN_CONNECTION", True)
+
+    def allocate(self, day: Optional[date] = None) -> int:
+        """
+        Allocate the next sequence number for a day
+
+        Args:
+            day: Store-local date the number belongs to (defaults to today)
+
+        Returns:
+            Sequence number, unique for the day
+        """
+        if day is None:
+            day = get_store_today()
+
+        with self._lock:
+            for block in self._blocks.get(day, []):
+                if block[0] <= block[1]:
+                    block[0] += 1
+                    return block[0] - 1
+
+        database = self._get_connection()
+        first, last = self._reserve(database, day, self.block_size)
+        if last > first:
+            if database is connection:
+                transaction.on_commit(lambda: self._publish(day, first + 1, last))
+            else:
+                # Already committed on the separate connection
+                self._publish(day, first + 1, last)
+        return first
+
+    def reset(self) -> None:
+        """Forget all reserved blocks, leaving their numbers unused"""
+        with self._lock:
+            self._blocks = {}
+
+    def _get_connection(self):
+        """Connection the counter is bumped on"""
+        if (
+            not self.own_connection
+            or not connection.in_atomic_block
+            or connection.vendor == "sqlite"
+            or ORDER_NUMBER_DATABASE not in connections
+        ):
+            return connection
+        return connections[ORDER_NUMBER_DATABASE]
+
+    def _publish(self, day: date, first: int, last: int) -> None:
+        """Make the unused part of a committed block available to the worker"""
+        with self._lock:
+            self._blocks = {
+                block_day: [block for block in blocks if block[0] <= block[1]]
+                for block_day, blocks in self._blocks.items()
+                if block_day >= day
+            }
+            self._blocks.setdefault(day, []).append([first, last])
+
+    @classmethod
+    def _reserve(cls, database, day: date, count: int) -> Tuple[int, int]:
+        """
+        Reserve a range of numbers on the day's counter row
+
+        Args:
+            database: Connection to bump the counter on
+            day: Store-local date of the counter
+            count: Number of sequence numbers to reserve
+
+        Returns:
+            Tuple of (first, last) reserved numbers, both inclusive
+        """
+        try:
+            last = cls._increment(database, day, count)
+        except DatabaseError:
+            if database is connection:
+                raise
+            # The separate connection timed out while idle; the UPDATE did
+            # not run, so retry it once on a fresh connection
+            database.close()
+            last = cls._increment(database, day, count)
+        return last - count + 1, last
+
+    @staticmethod
+    def _increment(database, day: date, count: int) -> int:
+        """Add count to the day's counter, creating it, and return its value"""
+        from .models import OrderNumberSequence
+
+        ops = database.ops
+        table = ops.quote_name(OrderNumberSequence._meta.db_table)
+        day_column, value_column = ops.quote_name("day"), ops.quote_name("last_value")
+        params = [count, day.isoformat()]
+        if database.vendor == "mysql":
+            # LAST_INSERT_ID(expr) hands the new value back with the UPDATE
+            update = (
+                f"UPDATE {table} SET {value_column} = "
+                f"LAST_INSERT_ID({value_column} + %s) WHERE {day_column} = %s"
+            )
+        else:
+            update = (
+                f"UPDATE {table} SET {value_column} = {value_column} + %s "
+                f"WHERE {day_column} = %s RETURNING {value_column}"
+            )
+
+        with database.cursor() as cursor:
+            for _ in range(2):
+                cursor.execute(update, params)
+                if database.vendor == "mysql":
+                    if cursor.rowcount:
+                        return cursor.lastrowid
+                else:
+                    row = cursor.fetchone()
+                    if row is not None:
+                        return row[0]
+                # First order of the day; another worker may create it too
+                cursor.execute(
+                    f"{ops.insert_statement(on_conflict=OnConflict.IGNORE)} "
+                    f"{table} ({day_column}, {value_column}) VALUES (%s, 0) "
+                    + ops.on_conflict_suffix_sql([], OnConflict.IGNORE, None, None),
+                    [day.isoformat()],
+                )
+        raise DatabaseError(f"Could not create the order number counter for {day}")
+
+
+order_number_allocator = OrderNumberAllocator()
+
+
+def format_order_number(day: date, number: int) -> str:
+    """Format an order number like ORD-20250611-001 (widens past 999)"""
+    return f"ORD-{day:%Y%m%d}-{number:03d}"
+
+
+def generate_order_number(day: Optional[date] = None) -> str:
+    """
+    Generate a new unique order number
+
+    Args:
+        day: Store-local date of the order (defaults to today)
+
+    Returns:
+        Order number string
+    """
+    if day is None:
+        day = get_store_today()
+    return format_order_number(day, order_number_allocator.allocate(day))
@@ -1,13 +1,69 @@
 from typing import Optional, List, Dict
 from datetime import date, datetime, timedelta
-from django.db.models import QuerySet, Q, Prefetch
-from django.utils import timezone
+from decimal import Decimal
+from django.db.models import Count, OuterRef, Prefetch, Q, QuerySet, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .dateranges import (
+    date_range_q,
+    get_period_dates,
+    get_store_today,
+    parse_window,
+)
 from .models import Order, OrderItem
 
 
 class OrderSelectors:
     """Selectors for order queries"""
 
+    @staticmethod
+    def with_items(queryset: QuerySet[Order]) -> QuerySet[Order]:
+        """
+        Prefetch order items with everything OrderReadSerializer shows
+
+        Items come in one query joined to their product and category, so
+        product details cost nothing per line however long the page is.
+
+        Args:
+            queryset: Orders to prefetch items for
+
+        Returns:
+            QuerySet with items prefetched
+        """
+        return queryset.prefetch_related(
+            Prefetch(
+                "items",
+                queryset=OrderItem.objects.select_related("product__category"),
+            )
+        )
+
+    @staticmethod
+    def with_item_totals(queryset: QuerySet[Order]) -> QuerySet[Order]:
+        """
+        Annotate each order with its item count and total quantity
+
+        Correlated subqueries are used rather than a join so that filters on
+        items (e.g. by category) cannot multiply the totals. Order.item_count
+        and Order.total_quantity read these annotations when present.
+
+        Args:
+            queryset: Orders to annotate
+
+        Returns:
+            QuerySet with annotated_item_count and annotated_total_quantity
+        """
+        items = (
+            OrderItem.objects.filter(order=OuterRef("pk")).order_by().values("order")
+        )
+        return queryset.annotate(
+            annotated_item_count=Coalesce(
+                Subquery(items.annotate(count=Count("pk")).values("count")), 0
+            ),
+            annotated_total_quantity=Coalesce(
+                Subquery(items.annotate(quantity=Sum("quantity")).values("quantity")),
+                0,
+            ),
+        )
+
     @staticmethod
     def get_order_list(
         status: Optional[str] = None,
@@ -21,8 +77,8 @@ class OrderSelectors:
         """
         Get filtered order list with optimized queries
         """
-        queryset = Order.objects.prefetch_related(
-            Prefetch("items", queryset=OrderItem.objects.select_related("product"))
+        queryset = OrderSelectors.with_item_totals(
+            OrderSelectors.with_items(Order.objects.all())
         )
 
         # Apply filters
@@ -32,10 +88,8 @@ class OrderSelectors:
             queryset = queryset.filter(payment_status=payment_status)
         if payment_method:
             queryset = queryset.filter(payment_method=payment_method)
-        if start_date:
-            queryset = queryset.filter(created_at__date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(created_at__date__lte=end_date)
+        if start_date or end_date:
+            queryset = queryset.filter(date_range_q(start_date, end_date))
         if served_by:
             queryset = queryset.filter(served_by__icontains=served_by)
         if search:
@@ -50,18 +104,16 @@ class OrderSelectors:
     @staticmethod
     def get_pending_orders() -> QuerySet[Order]:
         """Get all pending orders"""
-        return (
-            Order.objects.filter(status="pending")
-            .prefetch_related("items__product")
-            .order_by("created_at")
-        )
+        return OrderSelectors.with_item_totals(
+            OrderSelectors.with_items(Order.objects.filter(status="pending"))
+        ).order_by("created_at")
 
     @staticmethod
     def get_recent_orders(limit: int = 10) -> QuerySet[Order]:
         """Get recent orders"""
-        return Order.objects.prefetch_related("items__product").order_by("-created_at")[
-            :limit
-        ]
+        return OrderSelectors.with_item_totals(
+            OrderSelectors.with_items(Order.objects.all())
+        ).order_by("-created_at")[:limit]
 
 
 class SalesSelectors:
@@ -86,13 +138,10 @@ class SalesSelectors:
         """
         queryset = Order.objects.filter(status=status)
 
-        if start_date:
-            queryset = queryset.filter(created_at__date__gte=start_date)
-
-        if end_date:
-            queryset = queryset.filter(created_at__date__lte=end_date)
+        if start_date or end_date:
+            queryset = queryset.filter(date_range_q(start_date, end_date))
 
-        return queryset.select_related("customer").prefetch_related("items__product")
+        return OrderSelectors.with_items(queryset)
 
     @staticmethod
     def get_todays_sales() -> QuerySet[Order]:
@@ -102,11 +151,9 @@ class SalesSelectors:
         Returns:
             QuerySet of today's sales
         """
-        today = timezone.now().date()
-        return (
-            Order.objects.filter(status="completed", created_at__date=today)
-            .select_related("customer")
-            .prefetch_related("items__product")
+        today = get_store_today()
+        return OrderSelectors.with_items(
+            Order.objects.filter(date_range_q(today, today), status="completed")
         )
 
     @staticmethod
@@ -120,16 +167,14 @@ class SalesSelectors:
         Returns:
             QuerySet of weekly sales
         """
-        today = timezone.now().date()
-        start_of_week = today - timedelta(days=today.weekday() + (weeks_back * 7))
-        end_of_week = start_of_week + timedelta(days=6)
+        start_of_week, end_of_week = get_period_dates(
+            "week", get_store_today() - timedelta(weeks=weeks_back)
+        )
 
-        return (
+        return OrderSelectors.with_items(
             Order.objects.filter(
-                status="completed", created_at__date__range=[start_of_week, end_of_week]
+                date_range_q(start_of_week, end_of_week), status="completed"
             )
-            .select_related("customer")
-            .prefetch_related("items__product")
         )
 
     @staticmethod
@@ -144,12 +189,12 @@ class SalesSelectors:
         Returns:
             QuerySet of monthly sales
         """
-        return (
+        start_of_month, end_of_month = get_period_dates("month", date(year, month, 1))
+
+        return OrderSelectors.with_items(
             Order.objects.filter(
-                status="completed", created_at__year=year, created_at__month=month
+                date_range_q(start_of_month, end_of_month), status="completed"
             )
-            .select_related("customer")
-            .prefetch_related("items__product")
         )
 
     @staticmethod
@@ -163,12 +208,9 @@ class SalesSelectors:
         Returns:
             QuerySet of high-value orders
         """
-        return (
+        return OrderSelectors.with_items(
             Order.objects.filter(status="completed", total__gte=min_amount)
-            .select_related("customer")
-            .prefetch_related("items__product")
-            .order_by("-total")
-        )
+        ).order_by("-total")
 
     @staticmethod
     def get_refunded_orders(
@@ -186,13 +228,87 @@ class SalesSelectors:
         """
         queryset = Order.objects.filter(status="refunded")
 
-        if start_date:
-            queryset = queryset.filter(created_at__date__gte=start_date)
+        if start_date or end_date:
+            queryset = queryset.filter(date_range_q(start_date, end_date))
+
+        return OrderSelectors.with_items(queryset)
+
+    @staticmethod
+    def get_customer_stats(period: str = "month", limit: int = 10) -> Dict:
+        """
+        Get customer statistics for the completed sales of a period
+
+        Orders without a customer name are counted as walk-in sales. Item
+        quantities come from a per-order subquery, so order totals are
+        summed once per order rather than once per order line.
+
+        Args:
+            period: Window accepted by parse_window (default: month)
+            limit: Number of top customers to return
+
+        Returns:
+            Dict with customer and walk-in order counts and revenue, the
+            number of repeat customers and the top customers by spend
 
-        if end_date:
-            queryset = queryset.filter(created_at__date__lte=end_date)
+        Raises:
+            ValueError: If the period is not recognised
+        """
+        start_date, end_date = parse_window(period)
+        orders = OrderSelectors.with_item_totals(
+            Order.objects.filter(date_range_q(start_date, end_date), status="completed")
+        )
+        named = ~Q(customer_name="")
+
+        totals = orders.aggregate(
+            customers=Count("customer_name", distinct=True, filter=named),
+            customer_orders=Count("id", filter=named),
+            customer_revenue=Sum("total", filter=named),
+            walk_in_orders=Count("id", filter=~named),
+            walk_in_revenue=Sum("total", filter=~named),
+            items_sold=Sum("annotated_total_quantity"),
+        )
 
-        return queryset.select_related("customer").prefetch_related("items__product")
+        by_customer = (
+            orders.filter(named)
+            .values("customer_name")
+            .annotate(
+                orders=Count("id"),
+                total_spent=Sum("total"),
+                items_bought=Sum("annotated_total_quantity"),
+            )
+            .order_by()
+        )
+        repeat_customers = by_customer.filter(orders__gt=1).count()
+        top_customers = by_customer.order_by("-total_spent", "customer_name")[:limit]
+
+        customer_revenue = totals["customer_revenue"] or Decimal("0")
+        customer_orders = totals["customer_orders"]
+        return {
+            "period": period,
+            "start_date": start_date,
+            "end_date": end_date,
+            "total_customers": totals["customers"],
+            "repeat_customers": repeat_customers,
+            "customer_orders": customer_orders,
+            "customer_revenue": customer_revenue,
+            "average_customer_order_value": (
+                (customer_revenue / customer_orders).quantize(Decimal("0.01"))
+                if customer_orders
+                else Decimal("0")
+            ),
+            "walk_in_orders": totals["walk_in_orders"],
+            "walk_in_revenue": totals["walk_in_revenue"] or Decimal("0"),
+            "items_sold": totals["items_sold"] or 0,
+            "top_customers": [
+                {
+                    "customer_name": row["customer_name"],
+                    "orders": row["orders"],
+                    "total_spent": row["total_spent"],
+                    "items_bought": row["items_bought"] or 0,
+                }
+                for row in top_customers
+            ],
+        }
 
 
 class OrderItemSelectors:
@@ -217,11 +333,10 @@ class OrderItemSelectors:
         """
         queryset = OrderItem.objects.filter(order__status="completed")
 
-        if start_date:
-            queryset = queryset.filter(order__created_at__date__gte=start_date)
-
-        if end_date:
-            queryset = queryset.filter(order__created_at__date__lte=end_date)
+        if start_date or end_date:
+            queryset = queryset.filter(
+                date_range_q(start_date, end_date, field="order__created_at")
+            )
 
         return queryset.select_related("product", "order").order_by("-quantity")[:limit]
 
@@ -246,10 +361,14 @@ class OrderItemSelectors:
             product_id=product_id, order__status="completed"
         )
 
-        if start_date:
-            queryset = queryset.filter(order__created_at__date__gte=start_date)
-
-        if end_date:
-            queryset = queryset.filter(order__created_at__date__lte=end_date)
+        if start_date or end_date:
+            queryset = queryset.filter(
+                date_range_q(start_date, end_date, field="order__created_at")
+            )
 
         return queryset.select_related("order").order_by("-order__created_at")
+
+    @staticmethod
+    def list_order_items() -> QuerySet[OrderItem]:
+        """Get all order items with their order, product and category"""
+        return OrderItem.objects.select_related("order", "product__category")
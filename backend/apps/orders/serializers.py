@@ -1,8 +1,8 @@
 from rest_framework import serializers
-from decimal import Decimal
 from django.db import transaction
 from django.utils import timezone
 from .models import Order, OrderItem
+from .services import OrderService, SalesRollupService
 from apps.products.models import Product
 
 
@@ -40,21 +40,12 @@ class OrderItemReadSerializer(serializers.ModelSerializer):
 class OrderItemWriteSerializer(serializers.ModelSerializer):
     """Serializer for creating/updating order items"""
 
-    product_id = serializers.UUIDField(source="product.id")
+    product_id = serializers.UUIDField()
 
     class Meta:
         model = OrderItem
         fields = ["product_id", "quantity", "price", "discount"]
 
-    def validate_product_id(self, value):
-        try:
-            product = Product.objects.get(id=value)
-            if product.status != "active":
-                raise serializers.ValidationError("Product is not active")
-            return value
-        except Product.DoesNotExist:
-            raise serializers.ValidationError("Product does not exist")
-
     def validate_quantity(self, value):
         if value <= 0:
             raise serializers.ValidationError("Quantity must be greater than 0")
@@ -130,6 +121,24 @@ class OrderWriteSerializer(serializers.ModelSerializer):
         print("Validating order items:", value)
         if not value:
             raise serializers.ValidationError("Order must contain at least one item")
+
+        # Check every product of the basket with a single query
+        statuses = dict(
+            Product.objects.filter(
+                id__in=[item["product_id"] for item in value]
+            ).values_list("id", "status")
+        )
+        errors = []
+        for item in value:
+            product_status = statuses.get(item["product_id"])
+            if product_status is None:
+                errors.append({"product_id": ["Product does not exist"]})
+            elif product_status != "active":
+                errors.append({"product_id": ["Product is not active"]})
+            else:
+                errors.append({})
+        if any(errors):
+            raise serializers.ValidationError(errors)
         return value
 
     @transaction.atomic
@@ -144,62 +153,13 @@ class OrderWriteSerializer(serializers.ModelSerializer):
         # Create order
         order = Order.objects.create(**validated_data)
 
-        # Create order items and calculate totals
-        subtotal = Decimal("0")
-        for item_data in items_data:
-            product = Product.objects.get(id=item_data["product"]["id"])
-
-            # Check stock availability
-            if product.stock < item_data["quantity"]:
-                raise serializers.ValidationError(
-                    f"Insufficient stock for {product.name}. Available: {product.stock}"
-                )
+        # Create order items, take stock and calculate totals
+        try:
+            order_items = OrderService.add_order_items(order, items_data)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
 
-            # Use current product price if not provided
-            if "price" not in item_data:
-                item_data["price"] = product.effective_price
-
-            order_item = OrderItem.objects.create(
-                order=order,
-                product=product,
-                product_name=product.name,
-                quantity=item_data["quantity"],
-                price=item_data["price"],
-                discount=item_data.get("discount", 0),
-            )
-
-            # Update product stock
-            product.stock -= item_data["quantity"]
-            product.save(update_fields=["stock"])
-
-            # Update or create inventory record to mirror product stock
-            try:
-                from apps.inventory.models import Inventory
-
-                inventory, _created = Inventory.objects.get_or_create(
-                    product=product,
-                    defaults={
-                        "stock": product.stock,
-                        "min_stock": getattr(product, "min_stock", 1) or 1,
-                    },
-                )
-                # If existing inventory, sync stock value
-                if not _created:
-                    inventory.stock = product.stock
-                    # ensure min_stock stays in sync if product has it
-                    if getattr(product, "min_stock", None) is not None:
-                        inventory.min_stock = product.min_stock
-                    inventory.save(update_fields=["stock", "min_stock"])
-            except Exception as e:
-                # Fail silently to avoid breaking order flow; could log
-                print("Inventory sync failed (create):", e)
-
-            subtotal += order_item.line_total
-
-        # Update order totals
-        order.subtotal = subtotal
-        order.total = order.subtotal + order.tax_amount - order.discount_amount
-        order.save(update_fields=["subtotal", "total"])
+        SalesRollupService.record_order(order, order_items)
 
         return order
 
@@ -207,78 +167,31 @@ class OrderWriteSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         items_data = validated_data.pop("items", [])
 
-        # Update order fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-
-        # If order is being completed, set completed_at
-        if instance.status == "completed" and not instance.completed_at:
-            instance.completed_at = timezone.now()
-
-        instance.save()
-
-        # Update items if provided
-        if items_data:
-            # Restore stock from existing items BEFORE deleting them
-            for existing in instance.items.all():
-                if existing.product:
-                    existing.product.stock += existing.quantity
-                    existing.product.save(update_fields=["stock"])
-                    try:
-                        from apps.inventory.models import Inventory
-
-                        inv = existing.product.inventory
-                        inv.stock = existing.product.stock
-                        inv.save(update_fields=["stock"])
-                    except Exception:
-                        pass
-            # Remove old items
-            instance.items.all().delete()
-
-            subtotal = Decimal("0")
-            for item_data in items_data:
-                product = Product.objects.get(id=item_data["product"]["id"])
-
-                order_item = OrderItem.objects.create(
-                    order=instance,
-                    product=product,
-                    product_name=product.name,
-                    quantity=item_data["quantity"],
-                    price=item_data["price"],
-                    discount=item_data.get("discount", 0),
-                )
-
-                # Decrease product stock for new items
-                product.stock -= item_data["quantity"]
-                product.save(update_fields=["stock"])
+        # Serialise with cancellations and refunds of the same order
+        instance.refresh_from_db(from_queryset=Order.objects.select_for_update())
 
-                # Sync inventory
+        with SalesRollupService.track(instance):
+            # Replace items against the stock the order held so far
+            if items_data:
                 try:
-                    from apps.inventory.models import Inventory
-
-                    inventory, _created = Inventory.objects.get_or_create(
-                        product=product,
-                        defaults={
-                            "stock": product.stock,
-                            "min_stock": getattr(product, "min_stock", 1) or 1,
-                        },
-                    )
-                    if not _created:
-                        inventory.stock = product.stock
-                        if getattr(product, "min_stock", None) is not None:
-                            inventory.min_stock = product.min_stock
-                        inventory.save(update_fields=["stock", "min_stock"])
-                except Exception as e:
-                    print("Inventory sync failed (update):", e)
-
-                subtotal += order_item.line_total
-
-            # Update order totals
-            instance.subtotal = subtotal
-            instance.total = (
-                instance.subtotal + instance.tax_amount - instance.discount_amount
-            )
-            instance.save(update_fields=["subtotal", "total"])
+                    OrderService.replace_order_items(instance, items_data)
+                except ValueError as e:
+                    raise serializers.ValidationError(str(e))
+
+            # Update order fields
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+
+            # If order is being completed, set completed_at
+            if instance.status == "completed" and not instance.completed_at:
+                instance.completed_at = timezone.now()
+
+            if items_data:
+                instance.total = (
+                    instance.subtotal + instance.tax_amount - instance.discount_amount
+                )
+
+            instance.save()
 
         return instance
 
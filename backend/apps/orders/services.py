@@ -1,12 +1,33 @@
-from typing import Dict, List, Optional, Tuple, Any
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
 from decimal import Decimal
-from datetime import datetime, date, timedelta
-from django.db import transaction
-from django.db.models import Sum, Count, Avg, Q, F
+from datetime import date, timedelta
+from uuid import UUID
+from django.db import connection, transaction
+from django.db.models import Sum, Count, Q, F, Max
+from django.db.models.functions import (
+    ExtractHour,
+    ExtractIsoWeekDay,
+    TruncDate,
+    TruncDay,
+    TruncMonth,
+    TruncWeek,
+)
 from django.utils import timezone
-from .models import Order, OrderItem
+from .dateranges import (
+    date_range_q,
+    get_period_dates,
+    get_store_timezone,
+    get_store_today,
+    parse_window,
+)
+from .models import Order, OrderItem, DailySalesRollup, DailyProductSalesRollup
+from apps.inventory.models import StockMovement
+from apps.inventory.services import StockService
 from apps.products.models import Product
 from apps.customers.models import Customer
+from store_backend.cache import mark_changed
 
 
 class OrderService:
@@ -56,7 +77,7 @@ class OrderService:
 
         # Create order
         order = Order.objects.create(
-            customer=customer,
+            customer_name=customer.name if customer else "",
             payment_method=payment_method,
             payment_status=payment_status,
             tax_amount=tax_amount,
@@ -65,71 +86,139 @@ class OrderService:
             served_by=served_by,
         )
 
-        # Process items
-        subtotal = Decimal("0")
+        order_items = OrderService.add_order_items(order, items)
+
+        SalesRollupService.record_order(order, order_items)
+
+        return order
+
+    @staticmethod
+    @transaction.atomic
+    def add_order_items(order: Order, items: List[Dict]) -> List[OrderItem]:
+        """
+        Add basket lines to an order and take their stock
+
+        Products are fetched in one query, lines are inserted with one bulk
+        INSERT and stock is taken with one conditional UPDATE, so the number
+        of queries does not grow with the size of the basket. The UPDATE only
+        takes stock that is still there, so products need no lock while the
+        basket is priced.
+
+        Args:
+            order: Saved order to add the lines to
+            items: List of dicts with product_id, quantity, price (optional), discount (optional)
+
+        Returns:
+            Created OrderItem instances
+
+        Raises:
+            ValueError: If a product does not exist, a quantity is not
+                positive or stock is insufficient
+        """
+        product_ids = []
         for item_data in items:
             try:
-                product = Product.objects.get(id=item_data["product_id"])
-            except Product.DoesNotExist:
+                product_ids.append(UUID(str(item_data["product_id"])))
+            except ValueError:
                 raise ValueError(
                     f"Product with ID {item_data['product_id']} does not exist"
                 )
 
-            quantity = item_data["quantity"]
-            if quantity <= 0:
-                raise ValueError("Quantity must be greater than 0")
+        products = Product.objects.in_bulk(product_ids)
 
-            # Check stock availability
-            if product.stock < quantity:
+        subtotal = Decimal("0")
+        quantities = defaultdict(int)
+        order_items = []
+        for product_id, item_data in zip(product_ids, items):
+            product = products.get(product_id)
+            if product is None:
                 raise ValueError(
-                    f"Insufficient stock for {product.name}. Available: {product.stock}, Requested: {quantity}"
+                    f"Product with ID {item_data['product_id']} does not exist"
                 )
 
+            quantity = item_data["quantity"]
+            if quantity <= 0:
+                raise ValueError("Quantity must be greater than 0")
+
             # Use current product price if not provided
-            price = Decimal(str(item_data.get("price", product.effective_price)))
-            discount = Decimal(str(item_data.get("discount", 0)))
+            price = item_data.get("price")
+            if price is None:
+                price = product.effective_price
 
-            # Create order item
-            order_item = OrderItem.objects.create(
+            order_item = OrderItem(
                 order=order,
                 product=product,
                 product_name=product.name,
                 quantity=quantity,
-                price=price,
-                discount=discount,
+                price=Decimal(str(price)),
+                discount=Decimal(str(item_data.get("discount", 0))),
             )
-
-            # Update product stock
-            product.stock -= quantity
-            product.save(update_fields=["stock"])
-
-            # Update inventory if it exists
-            try:
-                from apps.inventory.models import Inventory
-
-                inventory = Inventory.objects.get(product=product)
-                inventory.stock -= quantity
-                inventory.save(update_fields=["stock"])
-            except Inventory.DoesNotExist:
-                # Create inventory record if it doesn't exist
-                from apps.inventory.models import Inventory
-
-                Inventory.objects.create(
-                    product=product,
-                    stock=product.stock,
-                    min_stock=product.min_stock or 1,
-                )
-
+            quantities[product_id] += quantity
             subtotal += order_item.line_total
+            order_items.append(order_item)
+
+        # Fails without changes when any product lacks stock
+        StockService.deduct(quantities, order=order)
+        OrderItem.objects.bulk_create(order_items)
 
         # Update order totals
         order.subtotal = subtotal
         order.total = order.subtotal + order.tax_amount - order.discount_amount
         order.save(update_fields=["subtotal", "total"])
 
-        return order
+        return order_items
 
     @staticmethod
+    @transaction.atomic
+    def replace_order_items(order: Order, items: List[Dict]) -> List[OrderItem]:
+        """
+        Replace the lines of an order, returning the old stock first
+
+        Args:
+            order: Order whose lines are replaced
+            items: List of dicts with product_id, quantity, price (optional), discount (optional)
+
+        Returns:
+            Created OrderItem instances
+
+        Raises:
+            ValueError: If the order no longer holds stock or a new line is
+                invalid; nothing is changed in that case
+        """
+        if order.status in ["cancelled", "refunded"]:
+            raise ValueError(
+                f"Cannot change items of order with status: {order.status}"
+            )
+
+        StockService.restore(
+            OrderService.get_item_quantities(order),
+            StockMovement.CANCEL,
+            order=order,
+            note="Items replaced",
+        )
+        order.items.all().delete()
+        return OrderService.add_order_items(order, items)
+
+    @staticmethod
+    def get_item_quantities(order: Order) -> Dict[UUID, int]:
+        """
+        Get the quantity an order holds of each product
+
+        Args:
+            order: Order to total
+
+        Returns:
+            Mapping of product ID to quantity, for lines whose product still exists
+        """
+        quantities = defaultdict(int)
+        for product_id, quantity in order.items.filter(
+            product__isnull=False
+        ).values_list("product_id", "quantity"):
+            quantities[product_id] += quantity
+        return quantities
+
+    @staticmethod
+    @transaction.atomic
     def complete_order(order_id: str, payment_status: str = "paid") -> Order:
         """
         Mark an order as completed
@@ -142,17 +231,18 @@ class OrderService:
             Updated Order instance
         """
         try:
-            order = Order.objects.get(id=order_id)
+            order = Order.objects.select_for_update().get(id=order_id)
         except Order.DoesNotExist:
             raise ValueError("Order does not exist")
 
         if order.status == "completed":
             raise ValueError("Order is already completed")
 
-        order.status = "completed"
-        order.payment_status = payment_status
-        order.completed_at = timezone.now()
-        order.save(update_fields=["status", "payment_status", "completed_at"])
+        with SalesRollupService.track(order):
+            order.status = "completed"
+            order.payment_status = payment_status
+            order.completed_at = timezone.now()
+            order.save(update_fields=["status", "payment_status", "completed_at"])
 
         return order
 
@@ -170,35 +260,26 @@ class OrderService:
             Updated Order instance
         """
         try:
-            order = Order.objects.get(id=order_id)
+            order = Order.objects.select_for_update().get(id=order_id)
         except Order.DoesNotExist:
             raise ValueError("Order does not exist")
 
-        if order.status in ["completed", "cancelled"]:
+        if order.status in ["completed", "cancelled", "refunded"]:
             raise ValueError(f"Cannot cancel order with status: {order.status}")
 
-        # Restore stock for each item
-        for item in order.items.all():
-            if item.product:
-                item.product.stock += item.quantity
-                item.product.save(update_fields=["stock"])
-
-                # Also restore inventory stock
-                try:
-                    from apps.inventory.models import Inventory
-
-                    inventory = Inventory.objects.get(product=item.product)
-                    inventory.stock += item.quantity
-                    inventory.save(update_fields=["stock"])
-                except Inventory.DoesNotExist:
-                    pass  # If no inventory record exists, skip
-                item.product.save(update_fields=["stock"])
-
-        # Update order
-        order.status = "cancelled"
-        if reason:
-            order.notes = f"{order.notes}\n\nCancelled: {reason}".strip()
-        order.save(update_fields=["status", "notes"])
+        with SalesRollupService.track(order):
+            # Restore stock for each item
+            StockService.restore(
+                OrderService.get_item_quantities(order),
+                StockMovement.CANCEL,
+                order=order,
+            )
+
+            # Update order
+            order.status = "cancelled"
+            if reason:
+                order.notes = f"{order.notes}\n\nCancelled: {reason}".strip()
+            order.save(update_fields=["status", "notes"])
 
         return order
 
@@ -219,7 +300,7 @@ class OrderService:
             Updated Order instance
         """
         try:
-            order = Order.objects.get(id=order_id)
+            order = Order.objects.select_for_update().get(id=order_id)
         except Order.DoesNotExist:
             raise ValueError("Order does not exist")
 
@@ -232,72 +313,570 @@ class OrderService:
         if refund_amount > order.total:
             raise ValueError("Refund amount cannot exceed order total")
 
-        # Restore stock if full refund
-        if refund_amount == order.total:
-            for item in order.items.all():
-                if item.product:
-                    item.product.stock += item.quantity
-                    item.product.save(update_fields=["stock"])
+        with SalesRollupService.track(order):
+            # Restore stock if full refund
+            if refund_amount == order.total:
+                StockService.restore(
+                    OrderService.get_item_quantities(order),
+                    StockMovement.REFUND,
+                    order=order,
+                )
 
-        # Update order
-        order.status = "refunded"
-        order.payment_status = "refunded"
-        if reason:
-            order.notes = f"{order.notes}\n\nRefunded {refund_amount}: {reason}".strip()
-        order.save(update_fields=["status", "payment_status", "notes"])
+            # Update order
+            order.status = "refunded"
+            order.payment_status = "refunded"
+            if reason:
+                order.notes = (
+                    f"{order.notes}\n\nRefunded {refund_amount}: {reason}".strip()
+                )
+            order.save(update_fields=["status", "payment_status", "notes"])
 
         return order
 
 
+class SalesRollupService:
+    """Service class maintaining the daily sales rollup tables"""
+
+    ORDER_KEY_FIELDS = ("day", "payment_method", "status")
+    ORDER_VALUE_FIELDS = (
+        "order_count",
+        "items_sold",
+        "subtotal",
+        "tax_amount",
+        "discount_amount",
+        "total",
+    )
+    PRODUCT_KEY_FIELDS = ("day", "product_id", "status")
+    PRODUCT_VALUE_FIELDS = ("quantity", "revenue", "order_count")
+
+    @staticmethod
+    def get_order_day(order: Order) -> date:
+        """Get the store-local calendar day an order belongs to"""
+        return timezone.localtime(order.created_at, get_store_timezone()).date()
+
+    @staticmethod
+    def get_contribution(
+        order: Order, items: Optional[List[OrderItem]] = None
+    ) -> Tuple[Dict, Dict]:
+        """
+        Get what an order adds to the rollup tables
+
+        Lines whose product has been deleted are left out of the per-product
+        rollup since they can no longer be attributed to a product.
+
+        Args:
+            order: Order instance
+            items: Order items, loaded from the database when not provided
+
+        Returns:
+            Tuple of (order deltas, product deltas), each a mapping of rollup
+            key to a mapping of field to value
+        """
+        if items is None:
+            items = list(order.items.all())
+
+        day = SalesRollupService.get_order_day(order)
+        order_key = (day, order.payment_method, order.status)
+        order_deltas = {
+            order_key: {
+                "order_count": 1,
+                "items_sold": sum(item.quantity for item in items),
+                "subtotal": order.subtotal,
+                "tax_amount": order.tax_amount,
+                "discount_amount": order.discount_amount,
+                "total": order.total,
+            }
+        }
+
+        product_deltas = {}
+        for item in items:
+            if item.product_id is None:
+                continue
+            key = (day, item.product_id, order.status)
+            values = product_deltas.setdefault(
+                key,
+                {
+                    "quantity": 0,
+                    "revenue": Decimal("0"),
+                    "order_count": 1,
+                    "product_name": item.product_name,
+                },
+            )
+            values["quantity"] += item.quantity
+            values["revenue"] += item.line_total
+
+        return order_deltas, product_deltas
+
+    @staticmethod
+    def _merge(target: Dict, deltas: Dict, sign: int) -> None:
+        """Add signed deltas into target, keyed by rollup key"""
+        for key, values in deltas.items():
+            merged = target.setdefault(key, {})
+            for field, value in values.items():
+                if field == "product_name":
+                    merged[field] = value
+                else:
+                    merged[field] = merged.get(field, 0) + sign * value
+
+    @staticmethod
+    def _upsert_sql(model, key_fields, value_fields, set_fields, rows: int) -> str:
+        """
+        Build an INSERT of rollup rows that adds to existing rows on conflict
+
+        Args:
+            model: Rollup model
+            key_fields: Fields of the table's unique key
+            value_fields: Fields added to an existing row's values
+            set_fields: Fields overwritten on an existing row
+            rows: Number of rows in the VALUES list
+
+        Returns:
+            SQL with one placeholder per field of every row
+        """
+        ops = connection.ops
+        table = ops.quote_name(model._meta.db_table)
+        columns = {
+            name: ops.quote_name(model._meta.get_field(name).column)
+            for name in (*key_fields, *set_fields, *value_fields)
+        }
+        placeholders = f"({', '.join(['%s'] * len(columns))})"
+        insert = (
+            f"INSERT INTO {table} ({', '.join(columns.values())}) "
+            f"VALUES {', '.join([placeholders] * rows)}"
+        )
+
+        if connection.vendor == "mysql":
+            if connection.mysql_is_mariadb:
+                alias, new = "", "VALUE({})".format
+            elif connection.mysql_version >= (8, 0, 19):
+                alias, new = " AS new", "new.{}".format
+            else:
+                alias, new = "", "VALUES({})".format
+            conflict = f"{alias} ON DUPLICATE KEY UPDATE "
+        else:
+            key_columns = ", ".join(columns[name] for name in key_fields)
+            new = "excluded.{}".format
+            conflict = f" ON CONFLICT ({key_columns}) DO UPDATE SET "
+        assignments = [
+            f"{columns[name]} = {table}.{columns[name]} + {new(columns[name])}"
+            for name in value_fields
+        ] + [f"{columns[name]} = {new(columns[name])}" for name in set_fields]
+        return insert + conflict + ", ".join(assignments)
+
+    @staticmethod
+    def _apply(model, key_fields, value_fields, deltas: Dict) -> None:
+        """
+        Add deltas to rollup rows, creating missing rows
+
+        All rows are written by one INSERT that adds to existing rows on a
+        key conflict (ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE), so
+        concurrent writers to the same day never lose an increment. Rows are
+        written in key order, and updated_at is set explicitly since the
+        statement bypasses auto_now.
+        """
+        deltas = {
+            key: values
+            for key, values in deltas.items()
+            if any(values.get(field) for field in value_fields)
+        }
+        if not deltas:
+            return
+
+        keys = sorted(deltas, key=lambda key: tuple(str(part) for part in key))
+        set_fields = sorted(
+            {
+                field
+                for values in deltas.values()
+                for field in values
+                if field not in value_fields
+            }
+        ) + ["updated_at"]
+        now = timezone.now()
+        params = []
+        for key in keys:
+            values = {**deltas[key], "updated_at": now}
+            row = [
+                *key,
+                *(values.get(field, "") for field in set_fields),
+                *(values.get(field, 0) for field in value_fields),
+            ]
+            fields = (*key_fields, *set_fields, *value_fields)
+            params.extend(
+                model._meta.get_field(field).get_db_prep_save(value, connection)
+                for field, value in zip(fields, row)
+            )
+
+        sql = SalesRollupService._upsert_sql(
+            model, key_fields, value_fields, set_fields, len(keys)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    @staticmethod
+    def apply_deltas(order_deltas: Dict, product_deltas: Dict) -> None:
+        """Apply order and product deltas to the rollup tables"""
+        mark_changed("orders")
+        SalesRollupService._apply(
+            DailySalesRollup,
+            SalesRollupService.ORDER_KEY_FIELDS,
+            SalesRollupService.ORDER_VALUE_FIELDS,
+            order_deltas,
+        )
+        SalesRollupService._apply(
+            DailyProductSalesRollup,
+            SalesRollupService.PRODUCT_KEY_FIELDS,
+            SalesRollupService.PRODUCT_VALUE_FIELDS,
+            product_deltas,
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def record_order(order: Order, items: Optional[List[OrderItem]] = None) -> None:
+        """Add a new order to the rollup tables"""
+        order_deltas, product_deltas = SalesRollupService.get_contribution(order, items)
+        SalesRollupService.apply_deltas(order_deltas, product_deltas)
+
+    @staticmethod
+    @transaction.atomic
+    def remove_order(order: Order, items: Optional[List[OrderItem]] = None) -> None:
+        """Take an order out of the rollup tables"""
+        order_deltas, product_deltas = SalesRollupService.get_contribution(order, items)
+        merged_orders, merged_products = {}, {}
+        SalesRollupService._merge(merged_orders, order_deltas, -1)
+        SalesRollupService._merge(merged_products, product_deltas, -1)
+        SalesRollupService.apply_deltas(merged_orders, merged_products)
+
+    @staticmethod
+    @contextmanager
+    def track(order: Order):
+        """
+        Keep the rollup tables in step with changes made to an order
+
+        Usage:
+            with SalesRollupService.track(order):
+                order.status = "completed"
+                order.save()
+
+        The order's contribution is captured on entry and replaced by its
+        new contribution on exit, so status, payment method, total and item
+        changes all move the right amounts between rollup rows.
+        """
+        before = SalesRollupService.get_contribution(order, list(order.items.all()))
+        yield
+        if hasattr(order, "_prefetched_objects_cache"):
+            order._prefetched_objects_cache.pop("items", None)
+        SalesRollupService.replace_contribution(before, order)
+
+    @staticmethod
+    def replace_contribution(
+        before: Tuple[Dict, Dict], order: Order, items: Optional[List[OrderItem]] = None
+    ) -> None:
+        """
+        Swap an order's previous rollup contribution for its current one
+
+        Args:
+            before: Contribution captured with get_contribution before the change
+            order: Order instance after the change
+            items: Current order items, loaded from the database when not provided
+        """
+        after = SalesRollupService.get_contribution(order, items)
+
+        merged_orders, merged_products = {}, {}
+        SalesRollupService._merge(merged_orders, before[0], -1)
+        SalesRollupService._merge(merged_products, before[1], -1)
+        SalesRollupService._merge(merged_orders, after[0], 1)
+        SalesRollupService._merge(merged_products, after[1], 1)
+        SalesRollupService.apply_deltas(merged_orders, merged_products)
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild(start_date: date, end_date: date) -> Tuple[int, int]:
+        """
+        Recompute the rollup rows of a range of days from the order tables
+
+        Args:
+            start_date: First store-local day to rebuild
+            end_date: Last store-local day to rebuild (inclusive)
+
+        Returns:
+            Tuple of (order rollup rows, product rollup rows) written
+        """
+        store_tz = get_store_timezone()
+
+        DailySalesRollup.objects.filter(day__range=[start_date, end_date]).delete()
+        DailyProductSalesRollup.objects.filter(
+            day__range=[start_date, end_date]
+        ).delete()
+
+        orders = Order.objects.filter(date_range_q(start_date, end_date))
+        order_rows = (
+            orders.annotate(day=TruncDate("created_at", tzinfo=store_tz))
+            .values("day", "payment_method", "status")
+            .annotate(
+                order_count=Count("id"),
+                subtotal_sum=Sum("subtotal"),
+                tax_sum=Sum("tax_amount"),
+                discount_sum=Sum("discount_amount"),
+                total_sum=Sum("total"),
+            )
+            .order_by()
+        )
+        items = OrderItem.objects.filter(
+            date_range_q(start_date, end_date, field="order__created_at")
+        ).annotate(day=TruncDate("order__created_at", tzinfo=store_tz))
+        items_sold = {
+            (row["day"], row["order__payment_method"], row["order__status"]): row[
+                "items_sold"
+            ]
+            for row in items.values("day", "order__payment_method", "order__status")
+            .annotate(items_sold=Sum("quantity"))
+            .order_by()
+        }
+        product_rows = (
+            items.filter(product_id__isnull=False)
+            .values("day", "product_id", "order__status")
+            .annotate(
+                latest_name=Max("product_name"),
+                quantity_sum=Sum("quantity"),
+                revenue_sum=Sum(F("quantity") * F("price") - F("discount")),
+                order_count=Count("order", distinct=True),
+            )
+            .order_by()
+        )
+
+        order_rollups = DailySalesRollup.objects.bulk_create(
+            [
+                DailySalesRollup(
+                    day=row["day"],
+                    payment_method=row["payment_method"],
+                    status=row["status"],
+                    order_count=row["order_count"],
+                    items_sold=items_sold.get(
+                        (row["day"], row["payment_method"], row["status"])
+                    )
+                    or 0,
+                    subtotal=row["subtotal_sum"] or 0,
+                    tax_amount=row["tax_sum"] or 0,
+                    discount_amount=row["discount_sum"] or 0,
+                    total=row["total_sum"] or 0,
+                )
+                for row in order_rows
+            ]
+        )
+        product_rollups = DailyProductSalesRollup.objects.bulk_create(
+            [
+                DailyProductSalesRollup(
+                    day=row["day"],
+                    product_id=row["product_id"],
+                    product_name=row["latest_name"] or "",
+                    status=row["order__status"],
+                    quantity=row["quantity_sum"] or 0,
+                    revenue=row["revenue_sum"] or 0,
+                    order_count=row["order_count"],
+                )
+                for row in product_rows
+            ]
+        )
+
+        mark_changed("orders")
+        return len(order_rollups), len(product_rollups)
+
+
 class SalesAnalyticsService:
     """Service class for sales analytics and reporting"""
 
     @staticmethod
-    def get_daily_sales(start_date: date, end_date: date) -> List[Dict]:
+    def _bucket_start(day: date, granularity: str) -> date:
         """
-        Get daily sales data for a date range
+        Get the first day of the bucket that contains a date
 
         Args:
-            start_date: Start date
+            day: Date inside the bucket
+            granularity: Bucket size ('day', 'week', 'month')
+
+        Returns:
+            First day of the bucket
+        """
+        if granularity == "week":
+            return day - timedelta(days=day.weekday())
+        if granularity == "month":
+            return day.replace(day=1)
+        return day
+
+    @staticmethod
+    def _next_bucket_start(bucket_start: date, granularity: str) -> date:
+        """Get the first day of the bucket following bucket_start"""
+        if granularity == "week":
+            return bucket_start + timedelta(days=7)
+        if granularity == "month":
+            if bucket_start.month == 12:
+                return bucket_start.replace(year=bucket_start.year + 1, month=1)
+            return bucket_start.replace(month=bucket_start.month + 1)
+        return bucket_start + timedelta(days=1)
+
+    @staticmethod
+    def _get_bucketed_sales(
+        start_date: date, end_date: date, granularity: str = "day"
+    ) -> List[Dict]:
+        """
+        Aggregate completed sales into day/week/month buckets
+
+        Every report goes through this method so that a report costs the
+        same single query whatever the length of the range: daily rollup
+        rows are grouped by their truncated day in the database and buckets
+        with no sales are zero-filled in Python.
+
+        Args:
+            start_date: Start date (widened to the start of its bucket)
             end_date: End date
+            granularity: Bucket size ('day', 'week', 'month')
 
         Returns:
-            List of daily sales data
+            List of buckets ordered by date, each with bucket_start,
+            bucket_end (clipped to end_date), total_revenue, total_orders,
+            average_order_value and total_items_sold
         """
-        sales_data = []
-        current_date = start_date
+        truncators = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}
+        if granularity not in truncators:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        trunc = truncators[granularity]
 
-        while current_date <= end_date:
-            orders = Order.objects.filter(
-                status="completed", created_at__date=current_date
-            )
+        range_start = SalesAnalyticsService._bucket_start(start_date, granularity)
 
-            daily_stats = orders.aggregate(
-                total_sales=Sum("total"),
-                total_orders=Count("id"),
-                total_items=Sum("items__quantity"),
-                avg_order_value=Avg("total"),
+        rows = (
+            DailySalesRollup.objects.filter(
+                status="completed", day__range=[range_start, end_date]
             )
+            .annotate(bucket=trunc("day"))
+            .values("bucket")
+            .annotate(
+                total_revenue=Sum("total"),
+                total_orders=Sum("order_count"),
+                total_items=Sum("items_sold"),
+            )
+            .order_by()
+        )
+        totals_by_bucket = {row["bucket"]: row for row in rows}
 
-            # Handle None values from aggregation
-            total_sales = daily_stats["total_sales"] or Decimal("0")
-            total_orders = daily_stats["total_orders"] or 0
-            total_items = daily_stats["total_items"] or 0
-            avg_order_value = daily_stats["avg_order_value"] or Decimal("0")
+        buckets = []
+        bucket_start = range_start
+        while bucket_start <= end_date:
+            next_start = SalesAnalyticsService._next_bucket_start(
+                bucket_start, granularity
+            )
+            row = totals_by_bucket.get(bucket_start, {})
+            total_revenue = row.get("total_revenue") or Decimal("0")
+            total_orders = row.get("total_orders") or 0
+            average_order_value = (
+                (total_revenue / total_orders).quantize(Decimal("0.01"))
+                if total_orders
+                else Decimal("0")
+            )
 
-            sales_data.append(
+            buckets.append(
                 {
-                    "date": current_date,
-                    "total_sales": total_sales,
+                    "bucket_start": bucket_start,
+                    "bucket_end": min(next_start - timedelta(days=1), end_date),
+                    "total_revenue": total_revenue,
                     "total_orders": total_orders,
-                    "total_items_sold": total_items,
-                    "average_order_value": avg_order_value,
+                    "average_order_value": average_order_value,
+                    "total_items_sold": row.get("total_items") or 0,
                 }
             )
+            bucket_start = next_start
+
+        return buckets
+
+    @staticmethod
+    def get_rollup_totals(start_date: date, end_date: date) -> Dict:
+        """
+        Total completed sales between two days from the daily rollup
 
-            current_date += timedelta(days=1)
+        Args:
+            start_date: First day
+            end_date: Last day (inclusive)
 
-        return sales_data
+        Returns:
+            Dict with total_revenue, total_orders, total_items_sold and
+            average_order_value
+        """
+        return SalesAnalyticsService.get_rollup_totals_by_range(
+            {"totals": (start_date, end_date)}
+        )["totals"]
+
+    @staticmethod
+    def get_rollup_totals_by_range(
+        ranges: Dict[str, Tuple[date, date]],
+    ) -> Dict[str, Dict]:
+        """
+        Total completed sales for several day ranges in one query
+
+        Each range is a conditional aggregate (SUM ... FILTER) over a single
+        scan of the rollup rows spanning all of them.
+
+        Args:
+            ranges: Mapping of a name to its (first day, last day) range
+
+        Returns:
+            Mapping of each name to the get_rollup_totals dict of its range
+        """
+        if not ranges:
+            return {}
+
+        names = list(ranges)
+        aggregates = {}
+        for position, name in enumerate(names):
+            in_range = Q(day__range=ranges[name])
+            aggregates[f"revenue_{position}"] = Sum("total", filter=in_range)
+            aggregates[f"orders_{position}"] = Sum("order_count", filter=in_range)
+            aggregates[f"items_{position}"] = Sum("items_sold", filter=in_range)
+
+        totals = DailySalesRollup.objects.filter(
+            status="completed",
+            day__gte=min(start for start, _ in ranges.values()),
+            day__lte=max(end for _, end in ranges.values()),
+        ).aggregate(**aggregates)
+
+        results = {}
+        for position, name in enumerate(names):
+            total_revenue = totals[f"revenue_{position}"] or Decimal("0")
+            total_orders = totals[f"orders_{position}"] or 0
+            results[name] = {
+                "total_revenue": total_revenue,
+                "total_orders": total_orders,
+                "total_items_sold": totals[f"items_{position}"] or 0,
+                "average_order_value": (
+                    (total_revenue / total_orders).quantize(Decimal("0.01"))
+                    if total_orders
+                    else Decimal("0")
+                ),
+            }
+        return results
+
+    @staticmethod
+    def get_daily_sales(start_date: date, end_date: date) -> List[Dict]:
+        """
+        Get daily sales data for a date range
+
+        Args:
+            start_date: Start date
+            end_date: End date
+
+        Returns:
+            List of daily sales data
+        """
+        return [
+            {
+                "date": bucket["bucket_start"],
+                "total_sales": bucket["total_revenue"],
+                "total_orders": bucket["total_orders"],
+                "total_items_sold": bucket["total_items_sold"],
+                "average_order_value": bucket["average_order_value"],
+            }
+            for bucket in SalesAnalyticsService._get_bucketed_sales(
+                start_date, end_date, "day"
+            )
+        ]
 
     @staticmethod
     def get_sales_summary(start_date: date, end_date: date) -> Dict:
@@ -311,32 +890,20 @@ class SalesAnalyticsService:
         Returns:
             Sales summary data
         """
-        orders = Order.objects.filter(
-            status="completed", created_at__date__range=[start_date, end_date]
-        )
-
-        summary = orders.aggregate(
-            total_revenue=Sum("total") or Decimal("0"),
-            total_orders=Count("id"),
-            total_items_sold=Sum("items__quantity") or 0,
-            average_order_value=Avg("total") or Decimal("0"),
-            total_customers=Count("customer", distinct=True),
-        )
-
         # Add comparison with previous period
         period_days = (end_date - start_date).days + 1
         prev_start = start_date - timedelta(days=period_days)
         prev_end = start_date - timedelta(days=1)
 
-        prev_orders = Order.objects.filter(
-            status="completed", created_at__date__range=[prev_start, prev_end]
-        )
-
-        prev_summary = prev_orders.aggregate(
-            prev_revenue=Sum("total") or Decimal("0"),
-            prev_orders=Count("id"),
-            prev_items=Sum("items__quantity") or 0,
+        totals = SalesAnalyticsService.get_rollup_totals_by_range(
+            {"current": (start_date, end_date), "previous": (prev_start, prev_end)}
         )
+        summary, previous = totals["current"], totals["previous"]
+        prev_summary = {
+            "prev_revenue": previous["total_revenue"],
+            "prev_orders": previous["total_orders"],
+            "prev_items": previous["total_items_sold"],
+        }
 
         # Calculate growth percentages
         revenue_growth = 0
@@ -373,58 +940,35 @@ class SalesAnalyticsService:
         Returns:
             List of top products data
         """
-        from django.db.models import Sum, Count
-
-        # Calculate date range based on period
-        today = timezone.now().date()
-
-        if period == "day":
-            start_date = today
-            end_date = today
-        elif period == "week":
-            start_date = today - timedelta(days=today.weekday())
-            end_date = start_date + timedelta(days=6)
-        elif period == "month":
-            start_date = today.replace(day=1)
-            # Get last day of month
-            if start_date.month == 12:
-                end_date = start_date.replace(
-                    year=start_date.year + 1, month=1
-                ) - timedelta(days=1)
-            else:
-                end_date = start_date.replace(month=start_date.month + 1) - timedelta(
-                    days=1
-                )
-        elif period == "year":
-            start_date = today.replace(month=1, day=1)
-            end_date = today.replace(month=12, day=31)
-        else:
-            # Default to month
-            start_date = today.replace(day=1)
-            if start_date.month == 12:
-                end_date = start_date.replace(
-                    year=start_date.year + 1, month=1
-                ) - timedelta(days=1)
-            else:
-                end_date = start_date.replace(month=start_date.month + 1) - timedelta(
-                    days=1
-                )
+        # Calculate date range based on period (defaults to month)
+        if period not in ("day", "week", "month", "year"):
+            period = "month"
+        start_date, end_date = get_period_dates(period)
 
         top_products = (
-            OrderItem.objects.filter(
-                order__status="completed",
-                order__created_at__date__range=[start_date, end_date],
+            DailyProductSalesRollup.objects.filter(
+                status="completed", day__range=[start_date, end_date]
             )
-            .values("product_id", "product_name")
+            .values("product_id")
             .annotate(
+                latest_name=Max("product_name"),
                 total_quantity=Sum("quantity"),
-                total_revenue=Sum(F("quantity") * F("price") - F("discount")),
-                order_count=Count("order", distinct=True),
+                total_revenue=Sum("revenue"),
+                order_count=Sum("order_count"),
             )
             .order_by("-total_revenue")[:limit]
         )
 
-        return list(top_products)
+        return [
+            {
+                "product_id": row["product_id"],
+                "product_name": row["latest_name"],
+                "total_quantity": row["total_quantity"],
+                "total_revenue": row["total_revenue"],
+                "order_count": row["order_count"],
+            }
+            for row in top_products
+        ]
 
     @staticmethod
     def get_payment_method_stats(start_date: date, end_date: date) -> List[Dict]:
@@ -438,12 +982,12 @@ class SalesAnalyticsService:
         Returns:
             List of payment method statistics
         """
-        payment_stats = (
-            Order.objects.filter(
-                status="completed", created_at__date__range=[start_date, end_date]
+        payment_stats = list(
+            DailySalesRollup.objects.filter(
+                status="completed", day__range=[start_date, end_date]
             )
             .values("payment_method")
-            .annotate(total_sales=Sum("total"), order_count=Count("id"))
+            .annotate(total_sales=Sum("total"), order_count=Sum("order_count"))
             .order_by("-total_sales")
         )
 
@@ -460,7 +1004,70 @@ class SalesAnalyticsService:
                 (stat["total_sales"] / total_sales * 100) if total_sales > 0 else 0
             )
 
-        return list(payment_stats)
+        return payment_stats
+
+    @staticmethod
+    def _get_hourly_sales(
+        start_date: date, end_date: date, by_weekday: bool = False
+    ) -> Dict[Tuple[int, int], Dict]:
+        """
+        Aggregate completed sales by local hour (and optionally weekday)
+
+        Hours and weekdays are taken in the store timezone. Orders and order
+        lines are grouped in separate queries so that order totals are not
+        repeated once per line.
+
+        Args:
+            start_date: First local date
+            end_date: Last local date (inclusive)
+            by_weekday: Also group by ISO weekday (1 = Monday)
+
+        Returns:
+            Mapping of (weekday, hour) to sales, orders and items_sold;
+            weekday is 0 when by_weekday is False
+        """
+        store_tz = get_store_timezone()
+
+        group_by = {"hour": ExtractHour("created_at", tzinfo=store_tz)}
+        item_group_by = {"hour": ExtractHour("order__created_at", tzinfo=store_tz)}
+        if by_weekday:
+            group_by["weekday"] = ExtractIsoWeekDay("created_at", tzinfo=store_tz)
+            item_group_by["weekday"] = ExtractIsoWeekDay(
+                "order__created_at", tzinfo=store_tz
+            )
+
+        order_rows = (
+            Order.objects.filter(date_range_q(start_date, end_date), status="completed")
+            .annotate(**group_by)
+            .values(*group_by)
+            .annotate(sales=Sum("total"), orders=Count("id"))
+            .order_by()
+        )
+        item_rows = (
+            OrderItem.objects.filter(
+                date_range_q(start_date, end_date, field="order__created_at"),
+                order__status="completed",
+            )
+            .annotate(**item_group_by)
+            .values(*item_group_by)
+            .annotate(items_sold=Sum("quantity"))
+            .order_by()
+        )
+
+        hourly = {}
+        for row in order_rows:
+            key = (row.get("weekday", 0), row["hour"])
+            hourly[key] = {
+                "sales": row["sales"] or Decimal("0"),
+                "orders": row["orders"],
+                "items_sold": 0,
+            }
+        for row in item_rows:
+            key = (row.get("weekday", 0), row["hour"])
+            if key in hourly:
+                hourly[key]["items_sold"] = row["items_sold"] or 0
+
+        return hourly
 
     @staticmethod
     def get_hourly_sales_pattern(date_obj: date) -> List[Dict]:
@@ -468,36 +1075,88 @@ class SalesAnalyticsService:
         Get hourly sales pattern for a specific date
 
         Args:
-            date_obj: Date to analyze
+            date_obj: Date to analyze (in the store timezone)
 
         Returns:
             List of hourly sales data
         """
-        hourly_data = []
+        hourly = SalesAnalyticsService._get_hourly_sales(date_obj, date_obj)
 
+        hourly_data = []
         for hour in range(24):
-            orders = Order.objects.filter(
-                status="completed", created_at__date=date_obj, created_at__hour=hour
-            )
-
-            stats = orders.aggregate(
-                sales=Sum("total") or Decimal("0"),
-                orders=Count("id"),
-                items=Sum("items__quantity") or 0,
-            )
-
+            stats = hourly.get((0, hour), {})
             hourly_data.append(
                 {
                     "hour": hour,
                     "hour_display": f"{hour:02d}:00",
-                    "sales": stats["sales"],
-                    "orders": stats["orders"],
-                    "items_sold": stats["items"],
+                    "sales": stats.get("sales", Decimal("0")),
+                    "orders": stats.get("orders", 0),
+                    "items_sold": stats.get("items_sold", 0),
                 }
             )
 
         return hourly_data
 
+    @staticmethod
+    def get_hourly_sales_heatmap(start_date: date, end_date: date) -> List[Dict]:
+        """
+        Get a day-of-week by hour sales heatmap for a date range
+
+        Args:
+            start_date: Start date (in the store timezone)
+            end_date: End date (in the store timezone)
+
+        Returns:
+            List of 7 x 24 cells ordered by weekday (Monday first) then hour,
+            with totals and per-day averages for each cell
+        """
+        hourly = SalesAnalyticsService._get_hourly_sales(
+            start_date, end_date, by_weekday=True
+        )
+
+        # Number of times each weekday occurs in the range, for averages
+        total_days = (end_date - start_date).days + 1
+        occurrences = {weekday: total_days // 7 for weekday in range(1, 8)}
+        for offset in range(total_days % 7):
+            occurrences[(start_date + timedelta(days=offset)).isoweekday()] += 1
+
+        weekday_names = [
+            "Monday",
+            "Tuesday",
+            "Wednesday",
+            "Thursday",
+            "Friday",
+            "Saturday",
+            "Sunday",
+        ]
+
+        heatmap = []
+        for weekday in range(1, 8):
+            days = occurrences[weekday]
+            for hour in range(24):
+                stats = hourly.get((weekday, hour), {})
+                sales = stats.get("sales", Decimal("0"))
+                orders = stats.get("orders", 0)
+                heatmap.append(
+                    {
+                        "weekday": weekday,
+                        "weekday_display": weekday_names[weekday - 1],
+                        "hour": hour,
+                        "hour_display": f"{hour:02d}:00",
+                        "sales": sales,
+                        "orders": orders,
+                        "items_sold": stats.get("items_sold", 0),
+                        "average_sales": (
+                            (sales / days).quantize(Decimal("0.01"))
+                            if days
+                            else Decimal("0")
+                        ),
+                        "average_orders": orders / days if days else 0,
+                    }
+                )
+
+        return heatmap
+
     @staticmethod
     def get_dashboard_stats(period: str) -> Dict:
         """
@@ -509,108 +1168,69 @@ class SalesAnalyticsService:
         Returns:
             Dictionary with dashboard statistics
         """
-        today = timezone.now().date()
-
-        if period == "today":
-            start_date = today
-            end_date = today
-        elif period == "week":
-            start_date = today - timedelta(days=today.weekday())
-            end_date = start_date + timedelta(days=6)
-        elif period == "month":
-            start_date = today.replace(day=1)
-            # Get last day of month
-            if start_date.month == 12:
-                end_date = start_date.replace(
-                    year=start_date.year + 1, month=1
-                ) - timedelta(days=1)
-            else:
-                end_date = start_date.replace(month=start_date.month + 1) - timedelta(
-                    days=1
-                )
-        else:
-            # Default to month
-            start_date = today.replace(day=1)
-            if start_date.month == 12:
-                end_date = start_date.replace(
-                    year=start_date.year + 1, month=1
-                ) - timedelta(days=1)
-            else:
-                end_date = start_date.replace(month=start_date.month + 1) - timedelta(
-                    days=1
-                )
+        # Calculate date range based on period (defaults to month)
+        if period not in ("today", "week", "month"):
+            period = "month"
+        return SalesAnalyticsService.get_dashboard_stats_for_periods([period])[period]
 
-        # Get orders for the period
-        orders = Order.objects.filter(
-            status="completed", created_at__date__range=[start_date, end_date]
-        )
-
-        # Calculate basic stats
-        stats = orders.aggregate(
-            total_revenue=Sum("total") or Decimal("0"),
-            total_orders=Count("id"),
-            average_order_value=Avg("total") or Decimal("0"),
-        )
+    @staticmethod
+    def get_dashboard_stats_for_periods(periods: List[str]) -> Dict[str, Dict]:
+        """
+        Get dashboard statistics for several periods in one query
 
-        # Calculate products sold
-        products_sold = (
-            OrderItem.objects.filter(order__in=orders).aggregate(
-                total_quantity=Sum("quantity")
-            )["total_quantity"]
-            or 0
-        )
+        Every period is compared with the window of the same length just
+        before it. All current and previous windows are totalled by one
+        conditional-aggregate query over the rollup rows spanning them.
 
-        # Calculate growth compared to previous period
-        period_days = (end_date - start_date).days + 1
-        prev_start = start_date - timedelta(days=period_days)
-        prev_end = start_date - timedelta(days=1)
-
-        prev_orders = Order.objects.filter(
-            status="completed", created_at__date__range=[prev_start, prev_end]
-        )
+        Args:
+            periods: Windows accepted by parse_window, e.g. 'today', 'month',
+                '30d' or '2025-03-01..2025-03-31'
 
-        prev_stats = prev_orders.aggregate(
-            prev_revenue=Sum("total") or Decimal("0"),
-            prev_orders=Count("id"),
-            prev_aov=Avg("total") or Decimal("0"),
-        )
+        Returns:
+            Mapping of each period to its dashboard statistics, in the
+            order given
 
-        prev_products_sold = (
-            OrderItem.objects.filter(order__in=prev_orders).aggregate(
-                total_quantity=Sum("quantity")
-            )["total_quantity"]
-            or 0
-        )
+        Raises:
+            ValueError: If a period is not recognised
+        """
+        today = get_store_today()
+        windows = {period: parse_window(period, today) for period in periods}
+
+        ranges = {}
+        for position, (start_date, end_date) in enumerate(windows.values()):
+            period_days = (end_date - start_date).days + 1
+            ranges[f"current_{position}"] = (start_date, end_date)
+            ranges[f"previous_{position}"] = (
+                start_date - timedelta(days=period_days),
+                start_date - timedelta(days=1),
+            )
+        totals = SalesAnalyticsService.get_rollup_totals_by_range(ranges)
 
-        # Calculate growth percentages (handle None values)
-        current_revenue = (
-            stats["total_revenue"]
-            if stats["total_revenue"] is not None
-            else Decimal("0")
-        )
-        current_total_orders = (
-            stats["total_orders"] if stats["total_orders"] is not None else 0
-        )
-        current_aov = (
-            stats["average_order_value"]
-            if stats["average_order_value"] is not None
-            else Decimal("0")
-        )
+        return {
+            period: SalesAnalyticsService._compare_periods(
+                period,
+                start_date,
+                end_date,
+                totals[f"current_{position}"],
+                totals[f"previous_{position}"],
+            )
+            for position, (period, (start_date, end_date)) in enumerate(windows.items())
+        }
 
-        prev_revenue = (
-            prev_stats["prev_revenue"]
-            if prev_stats["prev_revenue"] is not None
-            else Decimal("0")
-        )
-        prev_orders = (
-            prev_stats["prev_orders"] if prev_stats["prev_orders"] is not None else 0
-        )
-        prev_aov = (
-            prev_stats["prev_aov"]
-            if prev_stats["prev_aov"] is not None
-            else Decimal("0")
-        )
-        prev_products = prev_products_sold if prev_products_sold is not None else 0
+    @staticmethod
+    def _compare_periods(
+        period: str, start_date: date, end_date: date, current: Dict, previous: Dict
+    ) -> Dict:
+        """Dashboard statistics of a period from its and the previous totals"""
+        current_revenue = current["total_revenue"]
+        current_total_orders = current["total_orders"]
+        current_aov = current["average_order_value"]
+        products_sold = current["total_items_sold"]
+
+        prev_revenue = previous["total_revenue"]
+        prev_orders = previous["total_orders"]
+        prev_aov = previous["average_order_value"]
+        prev_products = previous["total_items_sold"]
 
         revenue_growth = 0
         if prev_revenue > 0:
@@ -660,71 +1280,24 @@ class SalesAnalyticsService:
         Returns:
             List of trend data points
         """
-        end_date = timezone.now().date()
+        end_date = get_store_today()
         start_date = end_date - timedelta(days=days)
 
-        trends_data = []
-
-        if period == "daily":
-            current_date = start_date
-            while current_date <= end_date:
-                daily_orders = Order.objects.filter(
-                    status="completed", created_at__date=current_date
-                )
-
-                daily_stats = daily_orders.aggregate(
-                    total_revenue=Sum("total"),
-                    total_orders=Count("id"),
-                )
-
-                # Handle None values from aggregation
-                total_revenue = daily_stats["total_revenue"] or Decimal("0")
-                total_orders = daily_stats["total_orders"] or 0
-
-                trends_data.append(
-                    {
-                        "date": current_date.isoformat(),
-                        "total_revenue": float(total_revenue),
-                        "total_orders": total_orders,
-                        "period_type": "daily",
-                    }
-                )
-
-                current_date += timedelta(days=1)
-
-        elif period == "weekly":
-            # Group by week
-            current_date = start_date
-            while current_date <= end_date:
-                week_start = current_date - timedelta(days=current_date.weekday())
-                week_end = week_start + timedelta(days=6)
-
-                weekly_orders = Order.objects.filter(
-                    status="completed",
-                    created_at__date__range=[week_start, min(week_end, end_date)],
-                )
-
-                weekly_stats = weekly_orders.aggregate(
-                    total_revenue=Sum("total"),
-                    total_orders=Count("id"),
-                )
-
-                # Handle None values from aggregation
-                total_revenue = weekly_stats["total_revenue"] or Decimal("0")
-                total_orders = weekly_stats["total_orders"] or 0
-
-                trends_data.append(
-                    {
-                        "date": week_start.isoformat(),
-                        "total_revenue": float(total_revenue),
-                        "total_orders": total_orders,
-                        "period_type": "weekly",
-                    }
-                )
-
-                current_date = week_end + timedelta(days=1)
-
-        return trends_data
+        granularities = {"daily": "day", "weekly": "week", "monthly": "month"}
+        if period not in granularities:
+            return []
+
+        return [
+            {
+                "date": bucket["bucket_start"].isoformat(),
+                "total_revenue": float(bucket["total_revenue"]),
+                "total_orders": bucket["total_orders"],
+                "period_type": period,
+            }
+            for bucket in SalesAnalyticsService._get_bucketed_sales(
+                start_date, end_date, granularities[period]
+            )
+        ]
 
     @staticmethod
     def get_daily_sales_report(
@@ -741,7 +1314,7 @@ class SalesAnalyticsService:
             List of daily sales data
         """
         if end_date is None:
-            end_date = timezone.now().date()
+            end_date = get_store_today()
         if start_date is None:
             start_date = end_date - timedelta(days=30)
 
@@ -762,56 +1335,23 @@ class SalesAnalyticsService:
             List of weekly sales data
         """
         if end_date is None:
-            end_date = timezone.now().date()
+            end_date = get_store_today()
         if start_date is None:
             start_date = end_date - timedelta(weeks=12)
 
-        weekly_data = []
-        current_date = start_date
-
-        while current_date <= end_date:
-            week_start = current_date - timedelta(days=current_date.weekday())
-            week_end = week_start + timedelta(days=6)
-
-            if week_end > end_date:
-                week_end = end_date
-
-            weekly_orders = Order.objects.filter(
-                status="completed", created_at__date__range=[week_start, week_end]
-            )
-
-            weekly_stats = weekly_orders.aggregate(
-                total_revenue=Sum("total"),
-                total_orders=Count("id"),
-                average_order_value=Avg("total"),
-            )
-
-            # Handle None values from aggregation
-            total_revenue = weekly_stats["total_revenue"] or Decimal("0")
-            total_orders = weekly_stats["total_orders"] or 0
-            average_order_value = weekly_stats["average_order_value"] or Decimal("0")
-
-            total_items = (
-                OrderItem.objects.filter(order__in=weekly_orders).aggregate(
-                    total_quantity=Sum("quantity")
-                )["total_quantity"]
-                or 0
-            )
-
-            weekly_data.append(
-                {
-                    "week_start": week_start,
-                    "week_end": week_end,
-                    "total_revenue": total_revenue,
-                    "total_orders": total_orders,
-                    "average_order_value": average_order_value,
-                    "total_items_sold": total_items,
-                }
+        return [
+            {
+                "week_start": bucket["bucket_start"],
+                "week_end": bucket["bucket_end"],
+                "total_revenue": bucket["total_revenue"],
+                "total_orders": bucket["total_orders"],
+                "average_order_value": bucket["average_order_value"],
+                "total_items_sold": bucket["total_items_sold"],
+            }
+            for bucket in SalesAnalyticsService._get_bucketed_sales(
+                start_date, end_date, "week"
             )
-
-            current_date = week_end + timedelta(days=1)
-
-        return weekly_data
+        ]
 
     @staticmethod
     def get_monthly_sales_report(
@@ -828,65 +1368,21 @@ class SalesAnalyticsService:
             List of monthly sales data
         """
         if end_date is None:
-            end_date = timezone.now().date()
+            end_date = get_store_today()
         if start_date is None:
             start_date = end_date - timedelta(days=365)
 
-        monthly_data = []
-        current_date = start_date.replace(day=1)  # Start at beginning of month
-
-        while current_date <= end_date:
-            # Get last day of current month
-            if current_date.month == 12:
-                month_end = current_date.replace(
-                    year=current_date.year + 1, month=1
-                ) - timedelta(days=1)
-            else:
-                month_end = current_date.replace(
-                    month=current_date.month + 1
-                ) - timedelta(days=1)
-
-            if month_end > end_date:
-                month_end = end_date
-
-            monthly_orders = Order.objects.filter(
-                status="completed", created_at__date__range=[current_date, month_end]
-            )
-
-            monthly_stats = monthly_orders.aggregate(
-                total_revenue=Sum("total"),
-                total_orders=Count("id"),
-                average_order_value=Avg("total"),
-            )
-
-            # Handle None values from aggregation
-            total_revenue = monthly_stats["total_revenue"] or Decimal("0")
-            total_orders = monthly_stats["total_orders"] or 0
-            average_order_value = monthly_stats["average_order_value"] or Decimal("0")
-
-            total_items = (
-                OrderItem.objects.filter(order__in=monthly_orders).aggregate(
-                    total_quantity=Sum("quantity")
-                )["total_quantity"]
-                or 0
+        return [
+            {
+                "month": bucket["bucket_start"].strftime("%Y-%m"),
+                "month_start": bucket["bucket_start"],
+                "month_end": bucket["bucket_end"],
+                "total_revenue": bucket["total_revenue"],
+                "total_orders": bucket["total_orders"],
+                "average_order_value": bucket["average_order_value"],
+                "total_items_sold": bucket["total_items_sold"],
+            }
+            for bucket in SalesAnalyticsService._get_bucketed_sales(
+                start_date, end_date, "month"
             )
-
-            monthly_data.append(
-                {
-                    "month": current_date.strftime("%Y-%m"),
-                    "month_start": current_date,
-                    "month_end": month_end,
-                    "total_revenue": total_revenue,
-                    "total_orders": total_orders,
-                    "average_order_value": average_order_value,
-                    "total_items_sold": total_items,
-                }
-            )
-
-            # Move to next month
-            if current_date.month == 12:
-                current_date = current_date.replace(year=current_date.year + 1, month=1)
-            else:
-                current_date = current_date.replace(month=current_date.month + 1)
-
-        return monthly_data
+        ]
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from store_backend.cache import mark_changed
+from .models import Order, OrderItem
+from .services import SalesRollupService
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_from_rollup(sender, instance: Order, **kwargs):
+    """Take a deleted order out of the daily sales rollup.
+
+    Runs before the order's items are cascaded away so its full
+    contribution can still be computed.
+    """
+    SalesRollupService.remove_order(instance)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_order_responses(sender, **kwargs):
+    """Make cached dashboard and analytics responses miss after order writes."""
+    if not kwargs.get("raw"):
+        mark_changed("orders")
@@ -1,3 +1,1939 @@
-from django.test import TestCase
+"""
+Test suite for the Orders app.
+Tests sales analytics, order services and query behaviour.
+"""
 
-# Create your tests here.
+import csv
+import gzip
+import json
+import random
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+from rest_framework.test import APIClient
+from apps.inventory.services import StockService
+from apps.products.models import Product, Category
+from store_backend.cache import (
+    check_stamp_cache,
+    get_cache,
+    get_stamp_cache,
+    get_versions,
+    make_key,
+)
+from store_backend import middleware, renderers
+from store_backend.pagination import keyset_chunks
+from store_backend.renderers import FastJSONRenderer
+from .dateranges import (
+    date_range_q,
+    get_period_dates,
+    get_store_today,
+    parse_window,
+)
+from .exports import ORDER_KEYSET
+from .filters import OrderFilter, OrderItemFilter, SalesReportFilter
+from .models import (
+    Order,
+    OrderItem,
+    OrderNumberSequence,
+    DailySalesRollup,
+    DailyProductSalesRollup,
+)
+from .numbering import (
+    OrderNumberAllocator,
+    generate_order_number,
+    order_number_allocator,
+)
+from .selectors import OrderSelectors, SalesSelectors
+from .serializers import OrderWriteSerializer
+from .services import OrderService, SalesAnalyticsService, SalesRollupService
+
+
+def create_completed_order(product, quantity, price, created_at, **kwargs):
+    """Create a completed order with a single line at a given timestamp."""
+    order = Order.objects.create(
+        status="completed",
+        payment_method=kwargs.pop("payment_method", "cash"),
+        subtotal=price * quantity,
+        total=price * quantity,
+        **kwargs,
+    )
+    OrderItem.objects.create(
+        order=order,
+        product=product,
+        product_name=product.name,
+        quantity=quantity,
+        price=price,
+    )
+    Order.objects.filter(pk=order.pk).update(created_at=created_at)
+    order.refresh_from_db()
+    return order
+
+
+class SalesReportBucketingTest(TestCase):
+    """Test cases for the bucketed sales report engine."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.category = Category.objects.create(name="Shirts")
+        self.product = Product.objects.create(
+            name="Oxford Shirt",
+            price=Decimal("40.00"),
+            stock=1000,
+            category=self.category,
+        )
+        self.today = timezone.now().date()
+        now = timezone.now()
+        for days_ago in (0, 1, 5, 40, 200, 700):
+            create_completed_order(
+                self.product,
+                2,
+                Decimal("40.00"),
+                now - timedelta(days=days_ago),
+            )
+        call_command("rebuild_sales_rollup", stdout=StringIO())
+
+    def count_queries(self, func, *args):
+        """Return the number of queries executed by func(*args)."""
+        with CaptureQueriesContext(connection) as ctx:
+            func(*args)
+        return len(ctx.captured_queries)
+
+    def test_daily_report_query_count_is_constant(self):
+        """Daily report cost does not grow with the length of the range."""
+        counts = {
+            days: self.count_queries(
+                SalesAnalyticsService.get_daily_sales,
+                self.today - timedelta(days=days - 1),
+                self.today,
+            )
+            for days in (7, 90, 730)
+        }
+        self.assertEqual(len(set(counts.values())), 1, counts)
+        self.assertEqual(counts[730], 1)
+
+    def test_weekly_and_monthly_report_query_count_is_constant(self):
+        """Weekly and monthly reports cost the same for any range."""
+        for report in (
+            SalesAnalyticsService.get_weekly_sales_report,
+            SalesAnalyticsService.get_monthly_sales_report,
+        ):
+            counts = {
+                days: self.count_queries(
+                    report, self.today - timedelta(days=days - 1), self.today
+                )
+                for days in (7, 90, 730)
+            }
+            self.assertEqual(len(set(counts.values())), 1, counts)
+            self.assertEqual(counts[730], 1)
+
+    def test_trends_query_count_is_constant(self):
+        """Trends cost the same for any look-back window."""
+        for period in ("daily", "weekly", "monthly"):
+            counts = {
+                days: self.count_queries(
+                    SalesAnalyticsService.get_sales_trends, period, days
+                )
+                for days in (7, 90, 730)
+            }
+            self.assertEqual(len(set(counts.values())), 1, counts)
+
+    def test_daily_report_zero_fills_gaps(self):
+        """Days without sales are present with zero totals."""
+        report = SalesAnalyticsService.get_daily_sales(
+            self.today - timedelta(days=6), self.today
+        )
+        self.assertEqual(len(report), 7)
+        self.assertEqual(report[-1]["date"], self.today)
+        by_date = {row["date"]: row for row in report}
+        self.assertEqual(by_date[self.today]["total_sales"], Decimal("80.00"))
+        self.assertEqual(by_date[self.today]["total_items_sold"], 2)
+        self.assertEqual(by_date[self.today]["average_order_value"], Decimal("80.00"))
+        empty_day = by_date[self.today - timedelta(days=2)]
+        self.assertEqual(empty_day["total_sales"], Decimal("0"))
+        self.assertEqual(empty_day["total_orders"], 0)
+        self.assertEqual(empty_day["total_items_sold"], 0)
+
+    def test_monthly_report_totals_match_orders(self):
+        """Monthly buckets add up to the orders in the range."""
+        start = self.today - timedelta(days=729)
+        report = SalesAnalyticsService.get_monthly_sales_report(start, self.today)
+        self.assertEqual(report[0]["month_start"], start.replace(day=1))
+        self.assertEqual(report[-1]["month_end"], self.today)
+        self.assertEqual(sum(row["total_orders"] for row in report), 6)
+        self.assertEqual(sum(row["total_items_sold"] for row in report), 12)
+        self.assertEqual(sum(row["total_revenue"] for row in report), Decimal("480.00"))
+
+
+@override_settings(STORE_TIME_ZONE="America/New_York")
+class HourlySalesPatternTest(TestCase):
+    """Test cases for hourly sales patterns and the weekday x hour heatmap."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.category = Category.objects.create(name="Trousers")
+        self.product = Product.objects.create(
+            name="Chinos",
+            price=Decimal("25.00"),
+            stock=100,
+            category=self.category,
+        )
+        store_tz = ZoneInfo("America/New_York")
+        # Monday 2025-03-03 at 21:30 local is 02:30 UTC on the Tuesday
+        self.evening = datetime(2025, 3, 3, 21, 30, tzinfo=store_tz)
+        order = create_completed_order(self.product, 1, Decimal("25.00"), self.evening)
+        # A second line must not inflate the order total
+        OrderItem.objects.create(
+            order=order,
+            product=self.product,
+            product_name=self.product.name,
+            quantity=3,
+            price=Decimal("0.00"),
+        )
+        create_completed_order(
+            self.product,
+            2,
+            Decimal("25.00"),
+            datetime(2025, 3, 10, 9, 5, tzinfo=store_tz),
+        )
+
+    def test_hourly_pattern_uses_store_timezone(self):
+        """Orders are bucketed by the local hour of the local day."""
+        with self.assertNumQueries(2):
+            pattern = SalesAnalyticsService.get_hourly_sales_pattern(date(2025, 3, 3))
+        self.assertEqual(len(pattern), 24)
+        evening = pattern[21]
+        self.assertEqual(evening["orders"], 1)
+        self.assertEqual(evening["sales"], Decimal("25.00"))
+        self.assertEqual(evening["items_sold"], 4)
+        self.assertEqual(sum(hour["orders"] for hour in pattern), 1)
+
+        next_day = SalesAnalyticsService.get_hourly_sales_pattern(date(2025, 3, 4))
+        self.assertEqual(sum(hour["orders"] for hour in next_day), 0)
+
+    def test_heatmap_groups_by_weekday_and_hour(self):
+        """The heatmap covers every weekday/hour with per-day averages."""
+        with self.assertNumQueries(2):
+            heatmap = SalesAnalyticsService.get_hourly_sales_heatmap(
+                date(2025, 3, 3), date(2025, 3, 16)
+            )
+        self.assertEqual(len(heatmap), 7 * 24)
+        cells = {(cell["weekday"], cell["hour"]): cell for cell in heatmap}
+        self.assertEqual(cells[(1, 21)]["sales"], Decimal("25.00"))
+        self.assertEqual(cells[(1, 21)]["average_sales"], Decimal("12.50"))
+        self.assertEqual(cells[(1, 9)]["items_sold"], 2)
+        self.assertEqual(cells[(2, 2)]["orders"], 0)
+
+    def test_hourly_pattern_endpoint(self):
+        """The analytics endpoint serves both modes."""
+        user = User.objects.create_user(username="manager", password="secret")
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(
+            "/api/orders/sales/analytics/hourly_pattern/", {"date": "2025-03-03"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["mode"], "day")
+        self.assertEqual(response.data["results"][21]["orders"], 1)
+
+        response = client.get(
+            "/api/orders/sales/analytics/hourly_pattern/",
+            {"mode": "heatmap", "start_date": "2025-03-03", "end_date": "2025-03-16"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 7 * 24)
+
+        response = client.get(
+            "/api/orders/sales/analytics/hourly_pattern/", {"date": "03/03/2025"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class DailySalesRollupTest(TestCase):
+    """Test cases for incremental maintenance of the daily sales rollup."""
+
+    databases = {"default", "order_numbers"}
+
+    def setUp(self):
+        """Set up test data."""
+        self.category = Category.objects.create(name="Jackets")
+        self.jacket = Product.objects.create(
+            name="Rain Jacket",
+            price=Decimal("120.00"),
+            stock=50,
+            category=self.category,
+        )
+        self.scarf = Product.objects.create(
+            name="Wool Scarf",
+            price=Decimal("15.00"),
+            stock=50,
+            category=self.category,
+        )
+        self.today = SalesRollupService.get_order_day(Order(created_at=timezone.now()))
+
+    def create_order(self, payment_method="cash"):
+        """Create a pending two-line order through the service layer."""
+        return OrderService.create_order(
+            items=[
+                {"product_id": self.jacket.id, "quantity": 1},
+                {"product_id": self.scarf.id, "quantity": 2},
+            ],
+            payment_method=payment_method,
+        )
+
+    def rollup_state(self):
+        """Return the non-empty rollup rows as comparable tuples."""
+        orders = {
+            (row.day, row.payment_method, row.status): (
+                row.order_count,
+                row.items_sold,
+                row.total,
+            )
+            for row in DailySalesRollup.objects.all()
+            if row.order_count
+        }
+        products = {
+            (row.day, row.product_id, row.status): (
+                row.quantity,
+                row.revenue,
+                row.order_count,
+            )
+            for row in DailyProductSalesRollup.objects.all()
+            if row.order_count
+        }
+        return orders, products
+
+    def assert_matches_rebuild(self):
+        """The incrementally maintained rollup equals a full rebuild."""
+        incremental = self.rollup_state()
+        SalesRollupService.rebuild(self.today, self.today)
+        self.assertEqual(incremental, self.rollup_state())
+
+    def test_updated_at_refreshed(self):
+        """Rows updated by a later order get a new updated_at."""
+        self.create_order()
+        rows = DailySalesRollup.objects.filter(day=self.today)
+        products = DailyProductSalesRollup.objects.filter(day=self.today)
+        rows.update(updated_at=timezone.now() - timedelta(days=1))
+        products.update(updated_at=timezone.now() - timedelta(days=1))
+
+        self.create_order()
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        self.assertFalse(rows.filter(updated_at__lt=an_hour_ago).exists())
+        self.assertFalse(products.filter(updated_at__lt=an_hour_ago).exists())
+
+    def test_create_and_complete_order(self):
+        """Creating and completing an order moves it between status rows."""
+        order = self.create_order()
+        row = DailySalesRollup.objects.get(
+            day=self.today, payment_method="cash", status="pending"
+        )
+        self.assertEqual(row.order_count, 1)
+        self.assertEqual(row.items_sold, 3)
+        self.assertEqual(row.total, Decimal("150.00"))
+
+        OrderService.complete_order(order.id)
+        row.refresh_from_db()
+        self.assertEqual(row.order_count, 0)
+        completed = DailySalesRollup.objects.get(
+            day=self.today, payment_method="cash", status="completed"
+        )
+        self.assertEqual(completed.total, Decimal("150.00"))
+        scarf = DailyProductSalesRollup.objects.get(
+            product_id=self.scarf.id, status="completed"
+        )
+        self.assertEqual(scarf.quantity, 2)
+        self.assertEqual(scarf.revenue, Decimal("30.00"))
+        self.assert_matches_rebuild()
+
+    def test_cancel_and_refund_orders(self):
+        """Cancelled and refunded orders leave the completed totals."""
+        cancelled = self.create_order()
+        OrderService.cancel_order(cancelled.id)
+        refunded = self.create_order(payment_method="card")
+        OrderService.complete_order(refunded.id)
+        OrderService.refund_order(refunded.id)
+
+        totals = SalesAnalyticsService.get_rollup_totals(self.today, self.today)
+        self.assertEqual(totals["total_orders"], 0)
+        self.assertEqual(DailySalesRollup.objects.get(status="refunded").order_count, 1)
+        self.assert_matches_rebuild()
+
+    def test_serializer_create_and_update(self):
+        """Orders written through the API serializer keep the rollup current."""
+        serializer = OrderWriteSerializer(
+            data={
+                "payment_method": "cash",
+                "status": "completed",
+                "items": [
+                    {
+                        "product_id": str(self.jacket.id),
+                        "quantity": 1,
+                        "price": "120.00",
+                    }
+                ],
+            }
+        )
+        serializer.is_valid(raise_exception=True)
+        order = serializer.save()
+
+        serializer = OrderWriteSerializer(
+            order,
+            data={
+                "payment_method": "card",
+                "items": [
+                    {"product_id": str(self.scarf.id), "quantity": 4, "price": "15.00"}
+                ],
+            },
+            partial=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        totals = SalesAnalyticsService.get_rollup_totals(self.today, self.today)
+        self.assertEqual(totals["total_revenue"], Decimal("60.00"))
+        self.assertEqual(totals["total_items_sold"], 4)
+        self.assertEqual(
+            DailySalesRollup.objects.get(
+                status="completed", payment_method="cash"
+            ).order_count,
+            0,
+        )
+        self.assert_matches_rebuild()
+
+    def test_deleted_order_leaves_rollup(self):
+        """Deleting an order removes its contribution."""
+        order = self.create_order()
+        order.delete()
+        self.assertEqual(self.rollup_state(), ({}, {}))
+
+    def test_rebuild_command_in_chunks(self):
+        """The rebuild command backfills the rollup chunk by chunk."""
+        for days_ago in (0, 3, 9):
+            create_completed_order(
+                self.jacket,
+                1,
+                Decimal("120.00"),
+                timezone.now() - timedelta(days=days_ago),
+            )
+        DailySalesRollup.objects.all().delete()
+
+        out = StringIO()
+        call_command("rebuild_sales_rollup", "--chunk-days", "2", stdout=out)
+        self.assertIn("Rollup rebuilt", out.getvalue())
+        totals = SalesAnalyticsService.get_rollup_totals(
+            self.today - timedelta(days=30), self.today
+        )
+        self.assertEqual(totals["total_orders"], 3)
+        self.assertEqual(totals["total_revenue"], Decimal("360.00"))
+
+
+class SargableDateRangeTest(TestCase):
+    """Test cases for index-friendly local date range filtering."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.index_name = next(
+            index.name
+            for index in Order._meta.indexes
+            if index.fields == ["created_at"]
+        )
+
+    def assert_uses_created_at_index(self, queryset):
+        """Assert the database answers the queryset with an index range scan."""
+        if connection.vendor == "sqlite":
+            plan = queryset.explain()
+            self.assertIn(f"SEARCH orders_order USING INDEX {self.index_name}", plan)
+            self.assertIn("created_at>", plan)
+        elif connection.vendor == "mysql":
+            plan = json.loads(queryset.explain(format="json"))
+            table = plan["query_block"].get("ordering_operation", plan["query_block"])
+            table = table.get("table", table)
+            self.assertEqual(table["access_type"], "range")
+            self.assertEqual(table["key"], self.index_name)
+        else:
+            self.skipTest(f"No EXPLAIN check for {connection.vendor}")
+
+    def test_date_range_helper(self):
+        """Local date ranges filter the bare created_at column."""
+        self.assert_uses_created_at_index(
+            Order.objects.filter(date_range_q(date(2025, 1, 1), date(2025, 1, 31)))
+        )
+
+    def test_order_filter_dates(self):
+        """OrderFilter date filters use the created_at index."""
+        for params in (
+            {"created_after": "2025-01-01", "created_before": "2025-01-31"},
+            {"created_range_after": "2025-01-01", "created_range_before": "2025-01-31"},
+            {"today": "true"},
+            {"this_week": "true"},
+            {"this_month": "true"},
+        ):
+            with self.subTest(params=params):
+                queryset = OrderFilter(params, queryset=Order.objects.all()).qs
+                self.assert_uses_created_at_index(queryset)
+
+    def test_sales_report_filter_periods(self):
+        """Every SalesReportFilter period uses the created_at index."""
+        for period in (
+            "today",
+            "yesterday",
+            "this_week",
+            "last_week",
+            "this_month",
+            "last_month",
+            "this_year",
+            "last_year",
+        ):
+            with self.subTest(period=period):
+                queryset = SalesReportFilter(
+                    {"period": period}, queryset=Order.objects.all()
+                ).qs
+                self.assert_uses_created_at_index(queryset)
+
+    def test_selectors(self):
+        """The order list selector uses the created_at index."""
+        self.assert_uses_created_at_index(
+            OrderSelectors.get_order_list(
+                start_date=date(2025, 1, 1), end_date=date(2025, 1, 31)
+            )
+        )
+
+    @override_settings(STORE_TIME_ZONE="Asia/Tokyo")
+    def test_local_day_boundaries(self):
+        """Ranges start and end at local midnight, end exclusive."""
+        category = Category.objects.create(name="Socks")
+        product = Product.objects.create(
+            name="Ankle Socks", price=Decimal("5.00"), stock=10, category=category
+        )
+        tokyo = ZoneInfo("Asia/Tokyo")
+        inside = create_completed_order(
+            product, 1, Decimal("5.00"), datetime(2025, 5, 1, 0, 0, tzinfo=tokyo)
+        )
+        create_completed_order(
+            product, 1, Decimal("5.00"), datetime(2025, 5, 2, 0, 0, tzinfo=tokyo)
+        )
+        create_completed_order(
+            product,
+            1,
+            Decimal("5.00"),
+            datetime(2025, 4, 30, 23, 59, tzinfo=tokyo),
+        )
+
+        orders = Order.objects.filter(date_range_q(date(2025, 5, 1), date(2025, 5, 1)))
+        self.assertEqual(list(orders), [inside])
+        items = OrderItemFilter(
+            {"order_created_after": "2025-05-01", "order_created_before": "2025-05-01"},
+            queryset=OrderItem.objects.all(),
+        ).qs
+        self.assertEqual([item.order_id for item in items], [inside.id])
+
+    def test_period_dates(self):
+        """Named periods map to the right calendar dates."""
+        today = date(2025, 1, 15)
+        self.assertEqual(
+            get_period_dates("last_month", today),
+            (date(2024, 12, 1), date(2024, 12, 31)),
+        )
+        self.assertEqual(
+            get_period_dates("this_week", today), (date(2025, 1, 13), date(2025, 1, 19))
+        )
+        self.assertEqual(
+            get_period_dates("last_year", today), (date(2024, 1, 1), date(2024, 12, 31))
+        )
+        with self.assertRaises(ValueError):
+            get_period_dates("fortnight", today)
+
+
+# Keep the counter inside the test transaction on databases with row locks
+@override_settings(ORDER_NUMBER_OWN_CONNECTION=False)
+class OrderNumberAllocatorTest(TestCase):
+    """Test cases for the per-day order number allocator"""
+
+    def test_sequential_numbers(self):
+        """Orders get consecutive numbers for the store day"""
+        today = date(2025, 6, 11)
+        with patch("apps.orders.numbering.get_store_today", return_value=today):
+            first = Order.objects.create(payment_method="cash")
+            second = Order.objects.create(payment_method="card")
+
+        self.assertEqual(first.order_number, "ORD-20250611-001")
+        self.assertEqual(second.order_number, "ORD-20250611-002")
+        self.assertEqual(OrderNumberSequence.objects.get(day=today).last_value, 2)
+
+    def test_widens_past_999(self):
+        """Numbers keep counting past three digits"""
+        day = date(2025, 6, 11)
+        OrderNumberSequence.objects.create(day=day, last_value=999)
+        self.assertEqual(generate_order_number(day), "ORD-20250611-1000")
+
+    def test_block_reservation(self):
+        """A committed block is served from memory without queries"""
+        allocator = OrderNumberAllocator(block_size=5)
+        day = date(2025, 6, 11)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(allocator.allocate(day), 1)
+        with self.assertNumQueries(0):
+            numbers = [allocator.allocate(day) for _ in range(4)]
+        self.assertEqual(numbers, [2, 3, 4, 5])
+        self.assertEqual(allocator.allocate(day), 6)
+        self.assertEqual(OrderNumberSequence.objects.get(day=day).last_value, 10)
+
+    def test_rolled_back_block_is_discarded(self):
+        """Numbers from a rolled back reservation are never reused"""
+        allocator = OrderNumberAllocator(block_size=5)
+        day = date(2025, 6, 11)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.assertEqual(allocator.allocate(day), 1)
+                    raise RuntimeError("checkout failed")
+            except RuntimeError:
+                pass
+
+        self.assertEqual(allocator.allocate(day), 1)
+
+
+@skipUnless(
+    connection.features.has_select_for_update,
+    "Concurrent allocation needs row-level locking",
+)
+class OrderNumberConcurrencyTest(TransactionTestCase):
+    """Stress test for order numbers under concurrent checkouts"""
+
+    databases = {"default", "order_numbers"}
+
+    threads = 8
+    orders_per_thread = 250
+
+    def tearDown(self):
+        """Drop blocks the shared allocator cached for the flushed database"""
+        order_number_allocator.reset()
+
+    def create_orders_concurrently(self):
+        errors = []
+        barrier = threading.Barrier(self.threads)
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.orders_per_thread):
+                    with transaction.atomic():
+                        Order.objects.create(payment_method="cash")
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return errors
+
+    def assert_unique_numbers(self):
+        total = self.threads * self.orders_per_thread
+        numbers = list(Order.objects.values_list("order_number", flat=True))
+        self.assertEqual(len(numbers), total)
+        self.assertEqual(len(set(numbers)), total)
+
+    def test_concurrent_orders(self):
+        """Thousands of concurrent orders get distinct, gap-free numbers"""
+        self.assertEqual(self.create_orders_concurrently(), [])
+        self.assert_unique_numbers()
+        self.assertEqual(
+            OrderNumberSequence.objects.get().last_value,
+            self.threads * self.orders_per_thread,
+        )
+
+    @override_settings(ORDER_NUMBER_BLOCK_SIZE=20)
+    def test_concurrent_orders_with_blocks(self):
+        """Block reservation keeps numbers distinct under concurrency"""
+        self.assertEqual(self.create_orders_concurrently(), [])
+        self.assert_unique_numbers()
+
+    def test_open_checkout_does_not_lock_counter(self):
+        """A checkout still in its transaction does not hold up the next one"""
+        created, release = threading.Event(), threading.Event()
+        committed = []
+
+        def open_checkout():
+            try:
+                with transaction.atomic():
+                    Order.objects.create(payment_method="cash")
+                    created.set()
+                    release.wait(10)
+                committed.append(True)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=open_checkout)
+        thread.start()
+        self.assertTrue(created.wait(10))
+        try:
+            with transaction.atomic():
+                order = Order.objects.create(payment_method="card")
+            self.assertEqual(committed, [])
+        finally:
+            release.set()
+            thread.join()
+        self.assertTrue(order.order_number.endswith("-002"))
+
+
+# The order number counter is bumped on the checkout's connection and counted
+@override_settings(ORDER_NUMBER_OWN_CONNECTION=False)
+class BatchedCheckoutTest(TestCase):
+    """Test cases for the batched checkout path"""
+
+    def setUp(self):
+        """Set up test data"""
+        category = Category.objects.create(name="Shirts")
+        self.products = [
+            Product.objects.create(
+                name=f"Shirt {number:02d}",
+                price=Decimal("10.00"),
+                stock=50,
+                category=category,
+            )
+            for number in range(30)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username="cashier", password="secret")
+        )
+        # Create the day's order number row so every checkout below is alike
+        generate_order_number()
+
+    def basket(self, lines):
+        return [
+            {"product_id": str(product.id), "quantity": 2, "price": "10.00"}
+            for product in self.products[:lines]
+        ]
+
+    def test_service_query_count(self):
+        """OrderService.create_order costs the same for 1 or 30 lines"""
+
+        def checkout(items):
+            OrderService.create_order(items=items, payment_method="cash")
+
+        # Counter, order, product lock, stock update, ledger, lines, totals and
+        # the two rollup upserts, plus the savepoints around them
+        for lines in (1, 30):
+            with self.subTest(lines=lines), self.assertNumQueries(17):
+                checkout(self.basket(lines))
+
+    def test_api_query_count(self):
+        """Creating an order through the API costs the same for 1 or 30 lines"""
+
+        def checkout(items):
+            response = self.client.post(
+                "/api/orders/",
+                {"payment_method": "cash", "items": items},
+                format="json",
+            )
+            self.assertEqual(response.status_code, 201, response.data)
+
+        for lines in (1, 30):
+            with self.subTest(lines=lines), self.assertNumQueries(19):
+                checkout(self.basket(lines))
+
+    def test_stock_and_inventory_updated(self):
+        """Stock is taken for every line and mirrored on inventory"""
+        items = self.basket(3) + [
+            {"product_id": str(self.products[0].id), "quantity": 1}
+        ]
+        order = OrderService.create_order(items=items, payment_method="cash")
+
+        self.assertEqual(order.items.count(), 4)
+        self.assertEqual(order.total, Decimal("70.00"))
+        self.products[0].refresh_from_db()
+        self.products[1].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 47)
+        self.assertEqual(self.products[1].stock, 48)
+        self.assertEqual(self.products[0].inventory.stock, 47)
+
+    def test_insufficient_stock_changes_nothing(self):
+        """A basket with one short line leaves every product untouched"""
+        items = self.basket(2) + [
+            {"product_id": str(self.products[2].id), "quantity": 51}
+        ]
+        with self.assertRaisesMessage(ValueError, "Insufficient stock for Shirt 02"):
+            OrderService.create_order(items=items, payment_method="cash")
+
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(set(Product.objects.values_list("stock", flat=True)), {50})
+
+    def test_api_rejects_unknown_product(self):
+        """Unknown products are reported against their line"""
+        items = self.basket(1) + [
+            {
+                "product_id": "00000000-0000-0000-0000-000000000000",
+                "quantity": 1,
+                "price": "1.00",
+            }
+        ]
+        response = self.client.post(
+            "/api/orders/", {"payment_method": "cash", "items": items}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["items"][1]["product_id"][0], "Product does not exist"
+        )
+
+
+class StockReservationTest(TestCase):
+    """Test cases for stock taken and returned by order changes"""
+
+    databases = {"default", "order_numbers"}
+
+    def setUp(self):
+        """Set up test data"""
+        category = Category.objects.create(name="Jackets")
+        self.jacket = Product.objects.create(
+            name="Rain Jacket", price=Decimal("40.00"), stock=5, category=category
+        )
+        self.scarf = Product.objects.create(
+            name="Wool Scarf", price=Decimal("15.00"), stock=5, category=category
+        )
+        self.order = OrderService.create_order(
+            items=[{"product_id": self.jacket.id, "quantity": 2}],
+            payment_method="cash",
+        )
+
+    def assert_stock(self, jacket, scarf):
+        self.jacket.refresh_from_db()
+        self.scarf.refresh_from_db()
+        self.assertEqual((self.jacket.stock, self.scarf.stock), (jacket, scarf))
+        self.assertEqual(self.jacket.inventory.stock, jacket)
+
+    def test_update_moves_stock(self):
+        """Replacing items returns the old stock and takes the new"""
+        serializer = OrderWriteSerializer(
+            self.order,
+            data={
+                "items": [
+                    {
+                        "product_id": str(self.jacket.id),
+                        "quantity": 1,
+                        "price": "40.00",
+                    },
+                    {"product_id": str(self.scarf.id), "quantity": 5, "price": "15.00"},
+                ]
+            },
+            partial=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        order = serializer.save()
+
+        self.assert_stock(4, 0)
+        self.assertEqual(order.total, Decimal("115.00"))
+
+    def test_update_beyond_stock_changes_nothing(self):
+        """An update that needs more stock than exists is rejected whole"""
+        serializer = OrderWriteSerializer(
+            self.order,
+            data={
+                "items": [
+                    {"product_id": str(self.jacket.id), "quantity": 8, "price": "40.00"}
+                ]
+            },
+            partial=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError):
+            serializer.save()
+
+        self.assert_stock(3, 5)
+        self.assertEqual(self.order.items.get().quantity, 2)
+
+    def test_cancel_returns_stock_once(self):
+        """Cancelling returns stock; cancelling again is refused"""
+        OrderService.cancel_order(self.order.id)
+        self.assert_stock(5, 5)
+        with self.assertRaises(ValueError):
+            OrderService.cancel_order(self.order.id)
+        self.assert_stock(5, 5)
+
+    def test_refund_returns_stock_once(self):
+        """A full refund returns stock and the order cannot then be cancelled"""
+        OrderService.complete_order(self.order.id)
+        OrderService.refund_order(self.order.id)
+        self.assert_stock(5, 5)
+        with self.assertRaises(ValueError):
+            OrderService.cancel_order(self.order.id)
+        self.assert_stock(5, 5)
+
+    def test_partial_refund_keeps_stock(self):
+        """A partial refund leaves the goods sold"""
+        OrderService.complete_order(self.order.id)
+        OrderService.refund_order(self.order.id, refund_amount=Decimal("10.00"))
+        self.assert_stock(3, 5)
+
+
+@skipUnless(
+    connection.features.has_select_for_update,
+    "Concurrent checkouts need a database with row-level locking",
+)
+class StockContentionTest(TransactionTestCase):
+    """Concurrency tests for stock reservation on a transactional database"""
+
+    databases = {"default", "order_numbers"}
+
+    threads = 12
+
+    def setUp(self):
+        """Set up test data"""
+        category = Category.objects.create(name="Limited")
+        self.sneaker = Product.objects.create(
+            name="Limited Sneaker", price=Decimal("90.00"), stock=5, category=category
+        )
+        self.cap = Product.objects.create(
+            name="Limited Cap", price=Decimal("20.00"), stock=5, category=category
+        )
+
+    def tearDown(self):
+        """Drop blocks the shared allocator cached for the flushed database"""
+        order_number_allocator.reset()
+
+    def run_concurrently(self, target, count):
+        results = []
+        barrier = threading.Barrier(count)
+
+        def worker(index):
+            try:
+                barrier.wait()
+                target(index)
+                results.append("ok")
+            except ValueError:
+                results.append("rejected")
+            except Exception as exc:
+                results.append(exc)
+            finally:
+                connections.close_all()
+
+        workers = [
+            threading.Thread(target=worker, args=(index,)) for index in range(count)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return results
+
+    def test_no_oversell(self):
+        """Only as many checkouts succeed as there are units in stock"""
+
+        def checkout(index):
+            # Alternate line order so baskets lock products in both orders
+            lines = [self.sneaker, self.cap][:: 1 if index % 2 else -1]
+            OrderService.create_order(
+                items=[{"product_id": product.id, "quantity": 1} for product in lines],
+                payment_method="cash",
+            )
+
+        results = self.run_concurrently(checkout, self.threads)
+
+        self.assertEqual(results.count("ok") + results.count("rejected"), self.threads)
+        self.assertEqual(results.count("ok"), 5)
+        self.sneaker.refresh_from_db()
+        self.cap.refresh_from_db()
+        self.assertEqual((self.sneaker.stock, self.cap.stock), (0, 0))
+        self.assertEqual(OrderItem.objects.filter(product=self.sneaker).count(), 5)
+
+    def test_concurrent_cancel_returns_stock_once(self):
+        """Racing cancellations of one order return its stock once"""
+        order = OrderService.create_order(
+            items=[{"product_id": self.sneaker.id, "quantity": 3}],
+            payment_method="cash",
+        )
+
+        results = self.run_concurrently(
+            lambda index: OrderService.cancel_order(order.id), 4
+        )
+
+        self.assertEqual(sorted(results), ["ok", "rejected", "rejected", "rejected"])
+        self.sneaker.refresh_from_db()
+        self.assertEqual(self.sneaker.stock, 5)
+
+
+class OrderItemTotalsTest(TestCase):
+    """Test cases for annotated order item counts and quantities"""
+
+    databases = {"default", "order_numbers"}
+
+    def setUp(self):
+        """Set up test data"""
+        category = Category.objects.create(name="Hats")
+        self.products = [
+            Product.objects.create(
+                name=f"Cap {number}",
+                price=Decimal("12.00"),
+                stock=500,
+                category=category,
+            )
+            for number in range(3)
+        ]
+        manager = User.objects.create_superuser(username="manager", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(manager)
+        self.admin_client = Client()
+        self.admin_client.force_login(manager)
+
+    def create_orders(self, count):
+        for _ in range(count):
+            OrderService.create_order(
+                items=[
+                    {"product_id": self.products[0].id, "quantity": 2},
+                    {"product_id": self.products[1].id, "quantity": 3},
+                ],
+                payment_method="cash",
+            )
+
+    def count_queries(self, url, table="", client=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        queries = [query for query in ctx.captured_queries if table in query["sql"]]
+        return len(queries), response
+
+    def test_annotations_and_fallbacks(self):
+        """Annotated, prefetched and plain orders report the same totals"""
+        self.create_orders(1)
+        OrderService.create_order(
+            items=[{"product_id": self.products[2].id, "quantity": 1}],
+            payment_method="cash",
+        )
+        # A filter on items must not multiply the annotated totals
+        annotated = OrderSelectors.with_item_totals(
+            Order.objects.filter(items__product__category=self.products[0].category)
+        ).order_by("created_at")
+        self.assertEqual(
+            [(order.item_count, order.total_quantity) for order in annotated],
+            [(2, 5), (2, 5), (1, 1)],
+        )
+
+        for order in Order.objects.prefetch_related("items").order_by("created_at"):
+            with self.assertNumQueries(0):
+                totals = (order.item_count, order.total_quantity)
+            self.assertIn(totals, [(2, 5), (1, 1)])
+
+        order = Order.objects.order_by("created_at").first()
+        self.assertEqual((order.item_count, order.total_quantity), (2, 5))
+
+    def test_list_endpoints_query_count(self):
+        """Order list pages read order items a fixed number of times"""
+        urls = ("/api/orders/", "/api/orders/pending/", "/api/orders/recent/")
+        self.create_orders(2)
+        small = [self.count_queries(url, "orders_orderitem")[0] for url in urls]
+        self.create_orders(8)
+        large = []
+        for url in urls:
+            queries, response = self.count_queries(url, "orders_orderitem")
+            large.append(queries)
+        self.assertEqual(large, small)
+
+        rows = response.data
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(
+            {(row["item_count"], row["total_quantity"]) for row in rows}, {(2, 5)}
+        )
+
+    def test_dashboard_and_admin_query_count(self):
+        """Dashboard recent orders and the admin changelist do not count per row"""
+        self.create_orders(2)
+        small = (
+            self.count_queries("/api/dashboard/overview/")[0],
+            self.count_queries("/admin/orders/order/", client=self.admin_client)[0],
+        )
+        self.create_orders(8)
+        large = (
+            self.count_queries("/api/dashboard/overview/")[0],
+            self.count_queries("/admin/orders/order/", client=self.admin_client)[0],
+        )
+        self.assertEqual(large, small)
+
+        _, response = self.count_queries("/api/dashboard/overview/")
+        self.assertEqual(
+            {row["items_count"] for row in response.data["recent_orders"]}, {2}
+        )
+
+
+class OrderReadQueryCountTest(TestCase):
+    """Test cases for the query cost of reading order lists"""
+
+    databases = {"default", "order_numbers"}
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up 200 orders over products from several categories"""
+        products = [
+            Product.objects.create(
+                name=f"Scarf {number}",
+                price=Decimal("15.00"),
+                stock=100,
+                category=Category.objects.create(name=f"Accessories {number}"),
+            )
+            for number in range(5)
+        ]
+        orders = Order.objects.bulk_create(
+            [
+                Order(
+                    order_number=f"ORD-20250101-{number:03d}",
+                    status="completed",
+                    payment_method="cash",
+                )
+                for number in range(200)
+            ]
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product=product,
+                    product_name=product.name,
+                    quantity=1,
+                    price=product.price,
+                )
+                for index, order in enumerate(orders)
+                for product in (products[index % 5], products[(index + 1) % 5])
+            ]
+        )
+        cls.user = User.objects.create_user(username="clerk", password="secret")
+
+    def setUp(self):
+        """Authenticate the API client"""
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, url, page_size):
+        with patch.object(PageNumberPagination, "page_size", page_size):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), page_size)
+        return len(ctx.captured_queries), response
+
+    def test_order_list_query_count(self):
+        """GET /api/orders/ costs the same for 10 or 200 orders per page"""
+        small, _ = self.count_queries("/api/orders/", 10)
+        for page_size in (50, 200):
+            queries, response = self.count_queries("/api/orders/", page_size)
+            self.assertEqual(queries, small)
+        self.assertLessEqual(small, 4)
+
+        details = response.data["results"][0]["items"][0]["product_details"]
+        self.assertTrue(details["category"].startswith("Accessories"))
+
+    def test_order_item_list_query_count(self):
+        """GET /api/orders/items/ costs the same for 10 or 200 lines per page"""
+        small, _ = self.count_queries("/api/orders/items/", 10)
+        queries, _ = self.count_queries("/api/orders/items/", 200)
+        self.assertEqual(queries, small)
+
+
+class OrderCursorPaginationTest(TestCase):
+    """Test cases for opt-in cursor and approximate-count order pages"""
+
+    databases = {"default", "order_numbers"}
+
+    def setUp(self):
+        """Set up orders, several sharing one timestamp"""
+        product = Product.objects.create(
+            name="Belt",
+            price=Decimal("8.00"),
+            stock=100,
+            category=Category.objects.create(name="Leather"),
+        )
+        start = timezone.now() - timedelta(days=1)
+        self.orders = []
+        for number in range(25):
+            # Pairs of orders share created_at so the id breaks the tie
+            order = create_completed_order(
+                product, 1, Decimal("8.00"), start + timedelta(minutes=number // 2)
+            )
+            self.orders.append(order)
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username="auditor", password="secret")
+        )
+
+    def walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            seen.extend(row["id"] for row in response.data["results"])
+            url = response.data["next"]
+        return seen
+
+    def test_cursor_walks_every_order_once(self):
+        """Cursor pages cover all orders newest first without repeats"""
+        seen = self.walk("/api/orders/?pagination=cursor&page_size=4")
+        expected = [
+            str(pk)
+            for pk in Order.objects.order_by("-created_at", "-id").values_list(
+                "id", flat=True
+            )
+        ]
+        self.assertEqual(seen, expected)
+
+        items = self.walk("/api/orders/items/?pagination=cursor&page_size=7")
+        self.assertEqual(len(set(items)), 25)
+
+    def test_deep_cursor_page_query_count(self):
+        """A page deep in the list costs the same as the first one"""
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get("/api/orders/?pagination=cursor&page_size=5")
+        cursor = response.data["next_cursor"]
+        for _ in range(3):
+            response = self.client.get(
+                f"/api/orders/?pagination=cursor&page_size=5&cursor={cursor}"
+            )
+            cursor = response.data["next_cursor"]
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(
+                f"/api/orders/?pagination=cursor&page_size=5&cursor={cursor}"
+            )
+        self.assertEqual(len(deep.captured_queries), len(first.captured_queries))
+        self.assertFalse(
+            any("COUNT(*)" in query["sql"] for query in deep.captured_queries)
+        )
+
+        response = self.client.get("/api/orders/?pagination=cursor&cursor=bogus")
+        self.assertEqual(response.status_code, 404)
+
+    def test_approximate_count(self):
+        """count=approximate keeps the page shape and is exact on the last page"""
+        response = self.client.get("/api/orders/?count=approximate&page_size=10")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["count_is_approximate"])
+        self.assertGreaterEqual(response.data["count"], 11)
+        self.assertIsNotNone(response.data["next"])
+
+        response = self.client.get("/api/orders/?count=approximate&page_size=10&page=3")
+        self.assertFalse(response.data["count_is_approximate"])
+        self.assertEqual(response.data["count"], 25)
+        self.assertIsNone(response.data["next"])
+
+        response = self.client.get("/api/orders/")
+        self.assertEqual(response.data["count"], 25)
+        self.assertNotIn("count_is_approximate", response.data)
+
+
+class ResponseCacheTest(TestCase):
+    """Test cases for the dashboard and analytics response cache"""
+
+    databases = {"default", "order_numbers"}
+
+    def setUp(self):
+        """Set up test data and an empty cache"""
+        get_cache().clear()
+        category = Category.objects.create(name="Scarves")
+        self.product = Product.objects.create(
+            name="Silk Scarf",
+            price=Decimal("18.00"),
+            stock=20,
+            min_stock=5,
+            category=category,
+        )
+        user = User.objects.create_user(username="manager", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def get(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def create_order(self):
+        return OrderService.create_order(
+            items=[{"product_id": self.product.id, "quantity": 1}],
+            payment_method="cash",
+        )
+
+    def test_hits_until_orders_change(self):
+        """Repeat polls are served from the cache until an order is written"""
+        url = "/api/dashboard/sales-summary/"
+        response, _ = self.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["pending_orders"], 0)
+
+        response, queries = self.get(url)
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(queries, 0)
+
+        self.create_order()
+        response, _ = self.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["pending_orders"], 1)
+
+    def test_params_are_normalized(self):
+        """Parameter order and blank values share one entry"""
+        url = "/api/orders/sales/analytics/top_products/"
+        self.assertEqual(
+            self.get(url, {"period": "week", "limit": "5"})[0]["X-Cache"], "MISS"
+        )
+        response, _ = self.get(f"{url}?limit=5&extra=&period=week")
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(
+            self.get(url, {"period": "month", "limit": "5"})[0]["X-Cache"], "MISS"
+        )
+
+    def test_stock_changes_invalidate_inventory(self):
+        """Stock ledger writes invalidate inventory responses only"""
+        self.get("/api/dashboard/inventory-alerts/")
+        self.get("/api/dashboard/sales-summary/")
+
+        StockService.set_stock(self.product.id, 4)
+        response, _ = self.get("/api/dashboard/inventory-alerts/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["low_stock_count"], 1)
+        response, _ = self.get("/api/dashboard/sales-summary/")
+        self.assertEqual(response["X-Cache"], "HIT")
+
+    def test_waits_for_concurrent_computation(self):
+        """A request finding the entry locked is served the other's result"""
+        key = make_key("sales_summary", {}, get_versions(["orders"]), get_store_today())
+        get_cache().add(f"{key}:lock", 1)
+
+        def finish_elsewhere(seconds):
+            get_cache().set(key, {"computed": "elsewhere"})
+
+        with patch("store_backend.cache.time.sleep", side_effect=finish_elsewhere):
+            response, queries = self.get("/api/dashboard/sales-summary/")
+        self.assertEqual(response["X-Cache"], "WAIT")
+        self.assertEqual(response.data, {"computed": "elsewhere"})
+        self.assertEqual(queries, 0)
+
+    def test_stamps_are_shared(self):
+        """Stamps live in the shared stamp cache, apart from the responses"""
+        self.get("/api/dashboard/sales-summary/")
+        stamp = get_stamp_cache().get("api-cache:version:orders")
+        self.assertIsNotNone(stamp)
+        self.assertIsNone(get_cache().get("api-cache:version:orders"))
+
+        # Another worker's write reaches this one through the shared stamps
+        get_stamp_cache().set("api-cache:version:orders", "elsewhere")
+        response, _ = self.get("/api/dashboard/sales-summary/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(get_versions(["orders"]), {"orders": "elsewhere"})
+
+    def test_process_local_stamps_warn(self):
+        """The system checks flag stamps kept in process memory"""
+        self.assertEqual(check_stamp_cache(None), [])
+        local = {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "stamps-test",
+        }
+        with override_settings(CACHES={**settings.CACHES, "stamps": local}):
+            self.assertEqual(
+                [warning.id for warning in check_stamp_cache(None)],
+                ["store_backend.W001"],
+            )
+
+    def test_cache_stats(self):
+        """The stats endpoint reports hits, misses and the hit rate"""
+        for _ in range(3):
+            self.get("/api/dashboard/overview/")
+        stats = self.get("/api/dashboard/cache-stats/")[0].data
+        self.assertEqual(
+            stats["dashboard_overview"],
+            {"hits": 2, "misses": 1, "waits": 0, "hit_rate": 0.6667},
+        )
+        self.assertIsNone(stats["sales_summary"]["hit_rate"])
+
+    @override_settings(API_CACHE_ENABLED=False)
+    def test_disabled(self):
+        """With the cache disabled every request is computed"""
+        response, _ = self.get("/api/dashboard/sales-summary/")
+        self.assertNotIn("X-Cache", response)
+        response, queries = self.get("/api/dashboard/sales-summary/")
+        self.assertGreater(queries, 0)
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class DashboardQueryTest(TestCase):
+    """Test cases for the dashboard endpoints' conditional aggregates"""
+
+    databases = {"default", "order_numbers"}
+
+    def setUp(self):
+        """Set up completed and pending orders paid in cash and by card"""
+        category = Category.objects.create(name="Belts")
+        self.product = Product.objects.create(
+            name="Leather Belt", price=Decimal("25.00"), stock=100, category=category
+        )
+        for payment_method, quantity, complete in [
+            ("cash", 2, True),
+            ("cash", 1, True),
+            ("card", 4, True),
+            ("card", 1, False),
+        ]:
+            order = OrderService.create_order(
+                items=[{"product_id": self.product.id, "quantity": quantity}],
+                payment_method=payment_method,
+            )
+            if complete:
+                OrderService.complete_order(order.id)
+        user = User.objects.create_user(username="manager", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(ctx.captured_queries)
+
+    def test_overview_query_count(self):
+        """The overview needs fewer than five queries"""
+        data, queries = self.get("/api/dashboard/overview/")
+        self.assertLess(queries, 5)
+        for period in ("today_metrics", "month_metrics"):
+            self.assertEqual(data[period]["orders_count"], 3)
+            self.assertEqual(data[period]["items_sold"], 7)
+            self.assertEqual(data[period]["avg_order_value"], Decimal("58.33"))
+        self.assertEqual(data["today_metrics"]["total_sales"], Decimal("175.00"))
+        self.assertEqual(len(data["recent_orders"]), 4)
+        self.assertEqual({row["items_count"] for row in data["recent_orders"]}, {1})
+
+    def test_sales_summary_single_query(self):
+        """Today's summary comes from one conditional-aggregate query"""
+        data, queries = self.get("/api/dashboard/sales-summary/")
+        self.assertEqual(queries, 1)
+        self.assertEqual(data["date"], get_store_today().isoformat())
+        self.assertEqual(
+            (data["total_orders"], data["total_items"], data["pending_orders"]),
+            (3, 7, 1),
+        )
+        self.assertEqual(
+            [Decimal(data[key]) for key in ("total_sales", "cash_sales", "card_sales")],
+            [Decimal("175.00"), Decimal("75.00"), Decimal("100.00")],
+        )
+
+    def test_rollup_totals_by_range(self):
+        """Several ranges are totalled in one query"""
+        today = get_store_today()
+        with self.assertNumQueries(1):
+            totals = SalesAnalyticsService.get_rollup_totals_by_range(
+                {
+                    "today": (today, today),
+                    "yesterday": (today - timedelta(days=1), today - timedelta(days=1)),
+                }
+            )
+        self.assertEqual(
+            totals["today"], SalesAnalyticsService.get_rollup_totals(today, today)
+        )
+        self.assertEqual(totals["yesterday"]["total_orders"], 0)
+        self.assertEqual(totals["yesterday"]["total_revenue"], Decimal("0"))
+
+    def test_analytics_dashboard_single_query(self):
+        """Today, this week and this month are computed in one query"""
+        data, queries = self.get("/api/orders/sales/analytics/dashboard/")
+        self.assertEqual(queries, 1)
+        for key in ("today", "this_week", "this_month"):
+            self.assertEqual(data[key]["total_orders"], 3)
+            self.assertEqual(data[key]["products_sold"], 7)
+            self.assertEqual(data[key]["total_revenue"], 175.0)
+        self.assertEqual(
+            data["today"], SalesAnalyticsService.get_dashboard_stats("today")
+        )
+
+    def test_analytics_dashboard_custom_periods(self):
+        """period= takes comma-separated windows of any kind"""
+        today = get_store_today()
+        data, queries = self.get(
+            "/api/orders/sales/analytics/dashboard/"
+            "?period=today,7d,2020-01-01..2020-01-31"
+        )
+        self.assertEqual(queries, 1)
+        periods = data["periods"]
+        self.assertEqual(list(periods), ["today", "7d", "2020-01-01..2020-01-31"])
+        self.assertEqual(periods["7d"]["total_orders"], 3)
+        self.assertEqual(
+            periods["7d"]["start_date"], (today - timedelta(days=6)).isoformat()
+        )
+        self.assertEqual(periods["2020-01-01..2020-01-31"]["total_orders"], 0)
+
+        for period in ("fortnight", "0d", "2020-02-01..2020-01-01", ","):
+            response = self.client.get(
+                "/api/orders/sales/analytics/dashboard/", {"period": period}
+            )
+            self.assertEqual(response.status_code, 400)
+
+    def test_parse_window(self):
+        """Windows are period names, rolling day counts or explicit ranges"""
+        today = date(2025, 3, 12)
+        self.assertEqual(
+            parse_window("month", today), (date(2025, 3, 1), date(2025, 3, 31))
+        )
+        self.assertEqual(parse_window("1d", today), (today, today))
+        self.assertEqual(parse_window("30d", today), (date(2025, 2, 11), today))
+        self.assertEqual(
+            parse_window("2025-01-05..2025-01-09", today),
+            (date(2025, 1, 5), date(2025, 1, 9)),
+        )
+        for window in ("99999999d", "2025-1-5..x", "decade"):
+            with self.assertRaises(ValueError):
+                parse_window(window, today)
+
+
+@override_settings(STORE_TIME_ZONE="Asia/Tokyo")
+class AggregateReferenceTest(TestCase):
+    """
+    Property tests of the sales reports against a brute-force reference
+
+    Each trial builds a random set of orders (several lines per order,
+    repeated products and categories, mixed statuses, customers and store
+    hours) and checks every report against totals computed in Python from
+    the same orders, so any join fan-out or missed boundary shows up as a
+    mismatch.
+    """
+
+    databases = {"default", "order_numbers"}
+
+    TRIALS = 25
+    START = date(2025, 3, 3)
+    DAYS = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up two categories of products"""
+        cls.categories = [
+            Category.objects.create(name=name) for name in ("Shirts", "Shoes")
+        ]
+        cls.products = [
+            Product.objects.create(
+                name=f"Item {number}",
+                price=Decimal("10.00"),
+                stock=1000,
+                category=cls.categories[number % 2],
+            )
+            for number in range(4)
+        ]
+
+    def create_random_orders(self, rng):
+        """Insert random orders; return plain dicts describing them"""
+        store_tz = ZoneInfo("Asia/Tokyo")
+        orders = []
+        for _ in range(rng.randint(0, 25)):
+            local_time = datetime(
+                2025, 3, 3, rng.randint(0, 23), rng.randint(0, 59), tzinfo=store_tz
+            ) + timedelta(days=rng.randint(0, self.DAYS - 1))
+            lines = [
+                (
+                    rng.choice(self.products),
+                    rng.randint(1, 5),
+                    rng.choice([Decimal("4.50"), Decimal("10.00"), Decimal("19.99")]),
+                    rng.choice([Decimal("0"), Decimal("1.00")]),
+                )
+                for _ in range(rng.randint(1, 4))
+            ]
+            subtotal = sum(
+                quantity * price - discount for _, quantity, price, discount in lines
+            )
+            tax = rng.choice([Decimal("0"), Decimal("2.50")])
+            order = Order.objects.create(
+                status=rng.choice(["completed", "completed", "pending", "cancelled"]),
+                payment_method=rng.choice(["cash", "card", "mobile_money"]),
+                customer_name=rng.choice(["", "", "Ama", "Kofi", "Esi"]),
+                subtotal=subtotal,
+                tax_amount=tax,
+                total=subtotal + tax,
+            )
+            OrderItem.objects.bulk_create(
+                [
+                    OrderItem(
+                        order=order,
+                        product=product,
+                        product_name=product.name,
+                        quantity=quantity,
+                        price=price,
+                        discount=discount,
+                    )
+                    for product, quantity, price, discount in lines
+                ]
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=local_time)
+            orders.append(
+                {
+                    "id": order.id,
+                    "status": order.status,
+                    "customer": order.customer_name,
+                    "total": order.total,
+                    "day": local_time.date(),
+                    "hour": local_time.hour,
+                    "quantity": sum(line[1] for line in lines),
+                    "categories": {line[0].category_id for line in lines},
+                }
+            )
+        SalesRollupService.rebuild(
+            self.START, self.START + timedelta(days=self.DAYS - 1)
+        )
+        return orders
+
+    def check_trials(self, check):
+        """Run check(rng, orders) per trial, rolling the orders back after each"""
+        for seed in range(self.TRIALS):
+            with self.subTest(seed=seed), transaction.atomic():
+                rng = random.Random(seed)
+                check(rng, self.create_random_orders(rng))
+                transaction.set_rollback(True)
+
+    def completed(self, orders, **match):
+        return [
+            order
+            for order in orders
+            if order["status"] == "completed"
+            and all(order[key] == value for key, value in match.items())
+        ]
+
+    def test_daily_sales(self):
+        """Daily revenue, orders and items match the reference"""
+        end = self.START + timedelta(days=self.DAYS - 1)
+
+        def check(_, orders):
+            report = SalesAnalyticsService.get_daily_sales(self.START, end)
+            self.assertEqual(len(report), self.DAYS)
+            for row in report:
+                expected = self.completed(orders, day=row["date"])
+                self.assertEqual(row["total_sales"], sum(o["total"] for o in expected))
+                self.assertEqual(row["total_orders"], len(expected))
+                self.assertEqual(
+                    row["total_items_sold"], sum(o["quantity"] for o in expected)
+                )
+
+        self.check_trials(check)
+
+    def test_sales_summary(self):
+        """The period summary matches the reference"""
+        end = self.START + timedelta(days=self.DAYS - 1)
+
+        def check(_, orders):
+            summary = SalesAnalyticsService.get_sales_summary(self.START, end)
+            expected = self.completed(orders)
+            revenue = sum(order["total"] for order in expected)
+            self.assertEqual(summary["total_revenue"], revenue)
+            self.assertEqual(summary["total_orders"], len(expected))
+            self.assertEqual(
+                summary["total_items_sold"], sum(o["quantity"] for o in expected)
+            )
+            self.assertEqual(
+                summary["average_order_value"],
+                (
+                    (revenue / len(expected)).quantize(Decimal("0.01"))
+                    if expected
+                    else Decimal("0")
+                ),
+            )
+
+        self.check_trials(check)
+
+    def test_hourly_pattern(self):
+        """Sales per local hour match the reference"""
+
+        def check(rng, orders):
+            day = self.START + timedelta(days=rng.randint(0, self.DAYS - 1))
+            pattern = SalesAnalyticsService.get_hourly_sales_pattern(day)
+            for row in pattern:
+                expected = self.completed(orders, day=day, hour=row["hour"])
+                self.assertEqual(row["sales"], sum(o["total"] for o in expected))
+                self.assertEqual(row["orders"], len(expected))
+                self.assertEqual(
+                    row["items_sold"], sum(o["quantity"] for o in expected)
+                )
+
+        self.check_trials(check)
+
+    def test_category_filter(self):
+        """Filtering by category returns each order once"""
+
+        def check(rng, orders):
+            category = rng.choice(self.categories)
+            queryset = SalesReportFilter(
+                {"category": str(category.id)}, queryset=Order.objects.all()
+            ).qs
+            expected = [o for o in orders if category.id in o["categories"]]
+            self.assertEqual(
+                sorted(queryset.values_list("id", flat=True)),
+                sorted(o["id"] for o in expected),
+            )
+            self.assertEqual(
+                queryset.aggregate(total=Sum("total"))["total"] or 0,
+                sum(o["total"] for o in expected),
+            )
+
+        self.check_trials(check)
+
+    def test_customer_stats(self):
+        """Customer statistics match the reference"""
+        window = "2025-03-03..2025-03-07"
+
+        def check(_, orders):
+            stats = SalesSelectors.get_customer_stats(window)
+            named = [o for o in self.completed(orders) if o["customer"]]
+            walk_in = [o for o in self.completed(orders) if not o["customer"]]
+            customers = {}
+            for order in named:
+                entry = customers.setdefault(
+                    order["customer"], {"orders": 0, "spent": 0, "items": 0}
+                )
+                entry["orders"] += 1
+                entry["spent"] += order["total"]
+                entry["items"] += order["quantity"]
+
+            self.assertEqual(stats["total_customers"], len(customers))
+            self.assertEqual(
+                stats["repeat_customers"],
+                sum(1 for entry in customers.values() if entry["orders"] > 1),
+            )
+            self.assertEqual(stats["customer_orders"], len(named))
+            self.assertEqual(stats["customer_revenue"], sum(o["total"] for o in named))
+            self.assertEqual(stats["walk_in_orders"], len(walk_in))
+            self.assertEqual(stats["walk_in_revenue"], sum(o["total"] for o in walk_in))
+            self.assertEqual(
+                stats["items_sold"], sum(o["quantity"] for o in named + walk_in)
+            )
+            self.assertEqual(
+                {
+                    row["customer_name"]: (
+                        row["orders"],
+                        row["total_spent"],
+                        row["items_bought"],
+                    )
+                    for row in stats["top_customers"]
+                },
+                {
+                    name: (entry["orders"], entry["spent"], entry["items"])
+                    for name, entry in customers.items()
+                },
+            )
+
+        self.check_trials(check)
+
+    def test_customer_stats_endpoint(self):
+        """The customer stats action serves the selector and rejects bad periods"""
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="manager"))
+        url = "/api/orders/sales/analytics/customer_stats/"
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["period"], "month")
+        self.assertEqual(client.get(url, {"period": "fortnight"}).status_code, 400)
+
+
+class OrderExportTest(TestCase):
+    """Test cases for the streaming order and order line exports"""
+
+    def setUp(self):
+        """Set up orders on two days, two of them at the same instant"""
+        category = Category.objects.create(name="Gloves")
+        self.product = Product.objects.create(
+            name="Wool Gloves",
+            price=Decimal("15.00"),
+            stock=100,
+            category=category,
+            sku="GLV-1",
+        )
+        moments = [
+            datetime(2025, 4, 1, 9, 0, tzinfo=ZoneInfo("UTC")),
+            datetime(2025, 4, 1, 9, 0, tzinfo=ZoneInfo("UTC")),
+            datetime(2025, 4, 2, 15, 30, tzinfo=ZoneInfo("UTC")),
+        ]
+        self.orders = [
+            create_completed_order(
+                self.product, quantity, Decimal("15.00"), moment, customer_name=name
+            )
+            for quantity, moment, name in zip((1, 2, 3), moments, ("Ama", "", "Kofi"))
+        ]
+        self.orders[2].status = "pending"
+        self.orders[2].save(update_fields=["status"])
+
+    def read(self, url, params=None):
+        response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode(), response
+
+    def test_orders_csv(self):
+        """Orders stream as CSV, oldest first, filtered like the list"""
+        body, response = self.read("/api/orders/export/")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn("attachment;", response["Content-Disposition"])
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[-1]["customer_name"], "Kofi")
+        self.assertEqual(
+            [row["id"] for row in rows[:2]],
+            sorted(str(order.id) for order in self.orders[:2]),
+        )
+        totals = {row["id"]: row["total"] for row in rows}
+        self.assertEqual(totals[str(self.orders[1].id)], "30.00")
+
+        body, _ = self.read("/api/orders/export/", {"status": "completed"})
+        self.assertEqual(len(list(csv.DictReader(StringIO(body)))), 2)
+
+        response = self.client.get("/api/orders/export/", {"status": "lost"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_order_items_ndjson(self):
+        """Order lines stream as NDJSON and take order and item filters"""
+        body, response = self.read(
+            "/api/orders/items/export/", {"format": "ndjson", "status": "completed"}
+        )
+        self.assertTrue(response["Content-Type"].startswith("application/x-ndjson"))
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual({line["sku"] for line in lines}, {"GLV-1"})
+        self.assertEqual(
+            sorted(Decimal(line["line_total"]) for line in lines),
+            [Decimal("15.00"), Decimal("30.00")],
+        )
+
+        body, _ = self.read(
+            "/api/orders/items/export/", {"format": "ndjson", "quantity_min": 3}
+        )
+        self.assertEqual(
+            [json.loads(line)["order_status"] for line in body.splitlines()],
+            ["pending"],
+        )
+
+    def test_keyset_chunks(self):
+        """Chunks cover every row once, across ties and chunk boundaries"""
+        expected = list(
+            Order.objects.order_by("created_at", "id").values_list("id", flat=True)
+        )
+        for chunk_size in (1, 2, 3, 10):
+            with self.subTest(chunk_size=chunk_size):
+                with CaptureQueriesContext(connection) as ctx:
+                    chunks = list(
+                        keyset_chunks(
+                            Order.objects.all(),
+                            ORDER_KEYSET,
+                            ["id"],
+                            chunk_size,
+                        )
+                    )
+                self.assertEqual(
+                    [row[0] for chunk in chunks for row in chunk], expected
+                )
+                self.assertEqual(len(ctx.captured_queries), 3 // chunk_size + 1)
+
+
+class PayloadTest(TestCase):
+    """Test cases for the JSON renderer and response compression"""
+
+    databases = {"default", "order_numbers"}
+
+    def setUp(self):
+        """Set up enough orders for a list worth compressing"""
+        category = Category.objects.create(name="Belts")
+        product = Product.objects.create(
+            name="Leather Belt", price=Decimal("22.50"), stock=500, category=category
+        )
+        moment = datetime(2025, 5, 1, 10, 0, tzinfo=ZoneInfo("UTC"))
+        for number in range(20):
+            create_completed_order(
+                product, 1, Decimal("22.50"), moment + timedelta(hours=number)
+            )
+        user = User.objects.create_user(username="cashier", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_renderer_matches_drf(self):
+        """FastJSONRenderer writes exactly what JSONRenderer writes"""
+        data = {
+            "results": ReturnList(
+                [
+                    {
+                        "id": uuid.UUID(int=7),
+                        "total": Decimal("12.30"),
+                        "created_at": datetime(
+                            2025, 5, 1, 10, 0, 5, 250000, tzinfo=ZoneInfo("UTC")
+                        ),
+                        "local": datetime(
+                            2025, 5, 1, 10, 0, tzinfo=ZoneInfo("Africa/Lagos")
+                        ),
+                        "day": date(2025, 5, 1),
+                        "name": "Kente \u2028 scarf \u00e9",
+                        "counts": {1: 2},
+                    }
+                ],
+                serializer=None,
+            ),
+            "next": None,
+        }
+        expected = JSONRenderer().render(data)
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+        self.assertEqual(
+            FastJSONRenderer().render(data, "application/json; indent=2"),
+            JSONRenderer().render(data, "application/json; indent=2"),
+        )
+        # orjson stops at 64-bit integers; the json module takes over
+        self.assertEqual(
+            FastJSONRenderer().render([2**70]), b"[1180591620717411303424]"
+        )
+        with override_settings(JSON_RENDERER_BACKEND="stdlib"):
+            self.assertEqual(renderers.get_backend(), "stdlib")
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+        with override_settings(JSON_RENDERER_BACKEND="yaml"):
+            with self.assertRaises(ValueError):
+                renderers.get_backend()
+
+    def test_order_list_gzip(self):
+        """Lists are gzipped when accepted and decode to the plain response"""
+        plain = self.client.get("/api/orders/", {"page_size": 20})
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertIn("Accept-Encoding", plain["Vary"])
+
+        with patch.object(middleware, "brotli", None):
+            response = self.client.get(
+                "/api/orders/",
+                {"page_size": 20},
+                HTTP_ACCEPT_ENCODING="gzip, deflate, br",
+            )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(
+            json.loads(gzip.decompress(response.content)), json.loads(plain.content)
+        )
+
+    def test_small_responses_not_compressed(self):
+        """Bodies below COMPRESSION_MIN_SIZE are sent as they are"""
+        with override_settings(COMPRESSION_MIN_SIZE=10**6):
+            response = self.client.get(
+                "/api/orders/", {"page_size": 20}, HTTP_ACCEPT_ENCODING="gzip"
+            )
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(len(response.json()["results"]), 20)
+
+    @skipUnless(middleware.brotli, "brotli is not installed")
+    def test_order_list_brotli(self):
+        """Brotli is preferred when installed and accepted"""
+        plain = self.client.get("/api/orders/", {"page_size": 20})
+        response = self.client.get(
+            "/api/orders/", {"page_size": 20}, HTTP_ACCEPT_ENCODING="gzip, br"
+        )
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(middleware.brotli.decompress(response.content), plain.content)
@@ -1,14 +1,26 @@
 from django.shortcuts import render
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from store_backend.cache import cached_api
+from store_backend.pagination import StorePagination
 from datetime import date, datetime, timedelta
 from django.utils import timezone
 from django.db.models import Sum, Count, Avg
 from decimal import Decimal
 
+from .exports import (
+    EXPORT_RENDERERS,
+    ORDER_COLUMNS,
+    ORDER_ITEM_COLUMNS,
+    ORDER_ITEM_KEYSET,
+    ORDER_KEYSET,
+    stream_export,
+    with_line_total,
+)
 from .models import Order, OrderItem
 from .serializers import (
     OrderReadSerializer,
@@ -20,9 +32,10 @@ from .serializers import (
     TopProductSerializer,
     PaymentMethodReportSerializer,
 )
+from .dateranges import get_store_timezone, get_store_today
 from .selectors import OrderSelectors, SalesSelectors, OrderItemSelectors
 from .services import OrderService, SalesAnalyticsService
-from .filters import OrderFilter
+from .filters import OrderFilter, OrderItemFilter
 
 
 class OrderViewSet(viewsets.ModelViewSet):
@@ -31,6 +44,8 @@ class OrderViewSet(viewsets.ModelViewSet):
     """
 
     queryset = Order.objects.all().prefetch_related("items__product")
+    pagination_class = StorePagination
+    cursor_ordering = ("-created_at", "-id")
     filter_backends = [
         DjangoFilterBackend,
         filters.SearchFilter,
@@ -122,6 +137,28 @@ class OrderViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(recent_orders, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["get"], renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        """
+        Stream orders as a CSV or NDJSON download
+
+        Takes the order list filters (OrderFilter params and search) plus
+        format=csv (default) or format=ndjson. Orders are written oldest
+        first; the ordering parameter is ignored.
+        """
+        orders = self.filter_queryset(Order.objects.all())
+        return stream_export(
+            orders,
+            ORDER_COLUMNS,
+            ORDER_KEYSET,
+            request.accepted_renderer.format,
+            "orders",
+        )
+
+
+# Most windows the analytics dashboard computes in one request
+MAX_DASHBOARD_PERIODS = 12
+
 
 class SalesAnalyticsViewSet(viewsets.ViewSet):
     """
@@ -131,25 +168,50 @@ class SalesAnalyticsViewSet(viewsets.ViewSet):
     filter_backends = [DjangoFilterBackend]
 
     @action(detail=False, methods=["get"])
+    @cached_api("analytics_dashboard", ("orders",), ttl=30, vary=get_store_today)
     def dashboard(self, request):
-        """Get comprehensive sales dashboard data"""
+        """
+        Get comprehensive sales dashboard data
+
+        Query Parameters:
+        - period: Comma-separated windows, each a period name (today, week,
+          month, last_month, year...), 'Nd' for the last N days or
+          'YYYY-MM-DD..YYYY-MM-DD'. Without it today, this week and this
+          month are returned.
+        """
         analytics_service = SalesAnalyticsService()
+        period_param = request.query_params.get("period")
+
+        if not period_param:
+            # Get dashboard stats for the default periods in one query
+            stats = analytics_service.get_dashboard_stats_for_periods(
+                ["today", "week", "month"]
+            )
+            return Response(
+                {
+                    "today": stats["today"],
+                    "this_week": stats["week"],
+                    "this_month": stats["month"],
+                    "timestamp": timezone.now(),
+                }
+            )
+
+        periods = [period.strip() for period in period_param.split(",")]
+        periods = [period for period in periods if period]
+        if not periods or len(periods) > MAX_DASHBOARD_PERIODS:
+            return Response(
+                {"error": f"Give between 1 and {MAX_DASHBOARD_PERIODS} periods"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            stats = analytics_service.get_dashboard_stats_for_periods(periods)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get dashboard stats for different periods
-        today_stats = analytics_service.get_dashboard_stats("today")
-        week_stats = analytics_service.get_dashboard_stats("week")
-        month_stats = analytics_service.get_dashboard_stats("month")
-
-        return Response(
-            {
-                "today": today_stats,
-                "this_week": week_stats,
-                "this_month": month_stats,
-                "timestamp": timezone.now(),
-            }
-        )
+        return Response({"periods": stats, "timestamp": timezone.now()})
 
     @action(detail=False, methods=["get"])
+    @cached_api("analytics_daily_report", ("orders",), ttl=300, vary=get_store_today)
     def daily_report(self, request):
         """Get daily sales report"""
         start_date = request.query_params.get("start_date")
@@ -167,6 +229,7 @@ class SalesAnalyticsViewSet(viewsets.ViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
+    @cached_api("analytics_weekly_report", ("orders",), ttl=300, vary=get_store_today)
     def weekly_report(self, request):
         """Get weekly sales report"""
         start_date = request.query_params.get("start_date")
@@ -184,6 +247,7 @@ class SalesAnalyticsViewSet(viewsets.ViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
+    @cached_api("analytics_monthly_report", ("orders",), ttl=300, vary=get_store_today)
     def monthly_report(self, request):
         """Get monthly sales report"""
         start_date = request.query_params.get("start_date")
@@ -201,6 +265,12 @@ class SalesAnalyticsViewSet(viewsets.ViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
+    @cached_api(
+        "analytics_top_products",
+        ("orders", "products"),
+        ttl=120,
+        vary=get_store_today,
+    )
     def top_products(self, request):
         """Get top selling products"""
         period = request.query_params.get("period", "month")  # day, week, month, year
@@ -213,6 +283,7 @@ class SalesAnalyticsViewSet(viewsets.ViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
+    @cached_api("analytics_payment_methods", ("orders",), ttl=120, vary=get_store_today)
     def payment_methods(self, request):
         """Get payment method breakdown"""
         start_date = request.query_params.get("start_date")
@@ -220,16 +291,11 @@ class SalesAnalyticsViewSet(viewsets.ViewSet):
 
         # If no dates provided, use default month period
         if not start_date or not end_date:
-            from datetime import date, timedelta
-            from django.utils import timezone
-
-            today = timezone.now().date()
+            today = get_store_today()
             end_date = today
             start_date = today.replace(day=1)  # First day of current month
         else:
             # Convert string dates to date objects
-            from datetime import datetime
-
             start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
             end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
 
@@ -242,6 +308,7 @@ class SalesAnalyticsViewSet(viewsets.ViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
+    @cached_api("analytics_trends", ("orders",), ttl=300, vary=get_store_today)
     def trends(self, request):
         """Get sales trends over time"""
         period = request.query_params.get("period", "daily")  # daily, weekly, monthly
@@ -253,12 +320,84 @@ class SalesAnalyticsViewSet(viewsets.ViewSet):
         return Response(trends_data)
 
     @action(detail=False, methods=["get"])
+    @cached_api("analytics_hourly_pattern", ("orders",), ttl=120, vary=get_store_today)
+    def hourly_pattern(self, request):
+        """
+        Get hourly sales pattern in the store timezone
+
+        Query Parameters:
+        - mode: 'day' (default) for a single date, 'heatmap' for weekday x hour
+        - date: Date for 'day' mode (defaults to today)
+        - start_date/end_date: Range for 'heatmap' mode (defaults to last 4 weeks)
+        """
+        mode = request.query_params.get("mode", "day")
+        analytics_service = SalesAnalyticsService()
+
+        try:
+            if mode == "heatmap":
+                end_date = request.query_params.get("end_date")
+                start_date = request.query_params.get("start_date")
+                end_date = (
+                    datetime.strptime(end_date, "%Y-%m-%d").date()
+                    if end_date
+                    else get_store_today()
+                )
+                start_date = (
+                    datetime.strptime(start_date, "%Y-%m-%d").date()
+                    if start_date
+                    else end_date - timedelta(days=27)
+                )
+            else:
+                date_param = request.query_params.get("date")
+                date_obj = (
+                    datetime.strptime(date_param, "%Y-%m-%d").date()
+                    if date_param
+                    else get_store_today()
+                )
+        except ValueError:
+            return Response(
+                {"error": "Dates must use the YYYY-MM-DD format"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if mode == "heatmap":
+            if start_date > end_date:
+                return Response(
+                    {"error": "start_date must be on or before end_date"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            return Response(
+                {
+                    "mode": "heatmap",
+                    "start_date": start_date,
+                    "end_date": end_date,
+                    "timezone": str(get_store_timezone()),
+                    "results": analytics_service.get_hourly_sales_heatmap(
+                        start_date, end_date
+                    ),
+                }
+            )
+
+        return Response(
+            {
+                "mode": "day",
+                "date": date_obj,
+                "timezone": str(get_store_timezone()),
+                "results": analytics_service.get_hourly_sales_pattern(date_obj),
+            }
+        )
+
+    @action(detail=False, methods=["get"])
+    @cached_api("analytics_customer_stats", ("orders",), ttl=120, vary=get_store_today)
     def customer_stats(self, request):
         """Get customer-related sales statistics"""
         period = request.query_params.get("period", "month")
 
         selectors = SalesSelectors()
-        customer_stats = selectors.get_customer_stats(period=period)
+        try:
+            customer_stats = selectors.get_customer_stats(period=period)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(customer_stats)
 
@@ -269,6 +408,8 @@ class OrderItemViewSet(viewsets.ReadOnlyModelViewSet):
     """
 
     serializer_class = OrderItemReadSerializer
+    pagination_class = StorePagination
+    cursor_ordering = ("-order__created_at", "-id")
     filter_backends = [
         DjangoFilterBackend,
         filters.SearchFilter,
@@ -281,3 +422,37 @@ class OrderItemViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         """Use selectors for optimized queries"""
         return OrderItemSelectors.list_order_items()
+
+    @action(detail=False, methods=["get"], renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        """
+        Stream order lines as a CSV or NDJSON download
+
+        Takes the order filters (OrderFilter params, applied to the lines'
+        orders), the order item filters (OrderItemFilter params) and search,
+        plus format=csv (default) or format=ndjson. Lines are written in
+        order of their order's creation.
+        """
+        items = self.filter_queryset(with_line_total(OrderItem.objects.all()))
+
+        item_filter = OrderItemFilter(request.query_params, queryset=items)
+        if not item_filter.is_valid():
+            raise ValidationError(item_filter.errors)
+        items = item_filter.qs
+
+        order_params = set(request.query_params) & set(OrderFilter.base_filters)
+        if order_params:
+            order_filter = OrderFilter(
+                request.query_params, queryset=Order.objects.all()
+            )
+            if not order_filter.is_valid():
+                raise ValidationError(order_filter.errors)
+            items = items.filter(order__in=order_filter.qs.values("id"))
+
+        return stream_export(
+            items,
+            ORDER_ITEM_COLUMNS,
+            ORDER_ITEM_KEYSET,
+            request.accepted_renderer.format,
+            "order-items",
+        )
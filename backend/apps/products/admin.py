@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.db import transaction
 from django.utils.html import format_html
-from .models import Category, Product
+from apps.inventory.services import StockService
+from .models import STOCK_STATUS_LABELS, Category, Product
 
 
 @admin.register(Category)
@@ -35,36 +37,51 @@ class ProductAdmin(admin.ModelAdmin):
     )
     list_display_links = ("name",)
     search_fields = ("name", "description", "category__name")
-    list_filter = ("status", "category", "created_at")
+    list_filter = ("status", "stock_state", "category", "created_at")
     ordering = ("-created_at",)
     readonly_fields = ("created_at", "updated_at")
 
     fieldsets = (
         ("Basic Information", {"fields": ("name", "description", "category")}),
         ("Pricing", {"fields": ("price", "sale_price")}),
-        ("Inventory", {"fields": ("stock", "min_stock", "status")}),
+        (
+            "Inventory",
+            {"fields": ("stock", "min_stock", "status")},
+        ),
         (
             "Timestamps",
             {"fields": ("created_at", "updated_at"), "classes": ("collapse",)},
         ),
     )
 
+    STOCK_STATUS_COLORS = {
+        "in_stock": "green",
+        "low_stock": "orange",
+        "out_of_stock": "red",
+    }
+
     def stock_status(self, obj):
         """Return colored stock status."""
-        if obj.stock > 10:
-            color = "green"
-            status = "In Stock"
-        elif obj.stock > 0:
-            color = "orange"
-            status = "Low Stock"
-        else:
-            color = "red"
-            status = "Out of Stock"
-
-        return format_html('<span style="color: {};">{}</span>', color, status)
+        return format_html(
+            '<span style="color: {};">{}</span>',
+            self.STOCK_STATUS_COLORS[obj.stock_status],
+            STOCK_STATUS_LABELS[obj.stock_status],
+        )
 
     stock_status.short_description = "Stock Status"
+    stock_status.admin_order_field = "stock"
 
+    @transaction.atomic
     def save_model(self, request, obj, form, change):
-        """Custom save logic if needed."""
-        super().save_model(request, obj, form, change)
+        """Save edited fields, sending stock changes through the ledger."""
+        if not change:
+            super().save_model(request, obj, form, change)
+            return
+
+        # Save only the edited fields so concurrent sales keep their stock
+        update_fields = [name for name in form.changed_data if name != "stock"]
+        obj.save(update_fields=update_fields + ["updated_at"])
+        if "stock" in form.changed_data:
+            StockService.set_stock(
+                obj.id, obj.stock, note=f"Admin edit by {request.user}"
+            )
@@ -0,0 +1,365 @@
+"""
+POS catalogue: versioned change feed and process-local lookup cache.
+
+Every change a till cares about (a product's SKU, name, prices, category or
+status; a category rename; a deletion) takes the next value of a single
+CatalogueVersion counter. Changed products carry that version and deleted
+ones leave a DeletedProduct tombstone, so "everything since version N" is
+one indexed range query. The counter row is locked from the bump until the
+transaction commits, so versions become visible in order and a reader can
+never skip past a change that is still in flight.
+
+POSCatalogue keeps compact records of the whole catalogue in each worker,
+indexed by id and SKU with a sorted name/SKU list for prefix search. It
+syncs from the same change feed, checking the counter at most every
+POS_CATALOGUE_CHECK_SECONDS.
+"""
+
+import bisect
+import threading
+import time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import CatalogueVersion, Category, DeletedProduct, Product
+
+# Product fields whose changes bump the catalogue version
+CATALOGUE_FIELDS = {"sku", "name", "price", "sale_price", "category", "status"}
+
+RECORD_FIELDS = (
+    "id",
+    "sku",
+    "name",
+    "price",
+    "sale_price",
+    "category_id",
+    "category__name",
+    "status",
+    "catalogue_version",
+)
+
+
+def bump_catalogue_version() -> int:
+    """
+    Take the next catalogue version.
+
+    The counter row stays locked until the caller's transaction ends, so
+    call this as late as possible in a transaction.
+
+    Returns:
+        int: The new version.
+    """
+    versions = CatalogueVersion.objects.filter(pk=1)
+    with transaction.atomic():
+        if not versions.update(value=F("value") + 1):
+            CatalogueVersion.objects.bulk_create(
+                [CatalogueVersion(pk=1)], ignore_conflicts=True
+            )
+            versions.update(value=F("value") + 1)
+        return versions.values_list("value", flat=True).get()
+
+
+def get_catalogue_version() -> int:
+    """
+    Return the latest committed catalogue version.
+
+    Returns:
+        int: Current version (0 before the first change).
+    """
+    return (
+        CatalogueVersion.objects.filter(pk=1).values_list("value", flat=True).first()
+        or 0
+    )
+
+
+def record_product_change(product: Product) -> int:
+    """
+    Stamp a product with a new catalogue version.
+
+    Args:
+        product (Product): The saved product.
+
+    Returns:
+        int: The version the product now carries.
+    """
+    version = bump_catalogue_version()
+    Product.objects.filter(pk=product.pk).update(catalogue_version=version)
+    DeletedProduct.objects.filter(product_id=product.pk).delete()
+    product.catalogue_version = version
+    return version
+
+
+def record_category_change(category: Category) -> int:
+    """
+    Stamp every product of a changed category with a new catalogue version.
+
+    Args:
+        category (Category): The saved category.
+
+    Returns:
+        int: The new version.
+    """
+    version = bump_catalogue_version()
+    Product.objects.filter(category=category).update(catalogue_version=version)
+    return version
+
+
+def record_product_deletion(product_id: UUID) -> int:
+    """
+    Leave a tombstone for a deleted product.
+
+    Args:
+        product_id (UUID): ID of the deleted product.
+
+    Returns:
+        int: The version of the deletion.
+    """
+    version = bump_catalogue_version()
+    DeletedProduct.objects.update_or_create(
+        product_id=product_id, defaults={"catalogue_version": version}
+    )
+    return version
+
+
+def get_catalogue_changes(since: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Return the catalogue changes after a version.
+
+    Args:
+        since (int): Version the caller already has; None for everything.
+
+    Returns:
+        Dict: version (to pass as since next time), full (True when all
+        products are listed), products (CatalogueRecords) and deleted (ids).
+    """
+    with transaction.atomic():
+        # One transaction so the version and the rows come from one snapshot
+        version = get_catalogue_version()
+        products = Product.objects.filter(catalogue_version__lte=version)
+        deleted = []
+        if since is not None:
+            products = products.filter(catalogue_version__gt=since)
+            deleted = list(
+                DeletedProduct.objects.filter(
+                    catalogue_version__gt=since, catalogue_version__lte=version
+                ).values_list("product_id", flat=True)
+            )
+        rows = list(products.order_by("catalogue_version").values_list(*RECORD_FIELDS))
+    return {
+        "version": version,
+        "full": since is None,
+        "products": [CatalogueRecord(*row) for row in rows],
+        "deleted": deleted,
+    }
+
+
+class CatalogueRecord:
+    """Compact, read-only view of a product as the till sees it."""
+
+    __slots__ = RECORD_FIELDS[:6] + ("category_name", "status", "version")
+
+    def __init__(
+        self,
+        id: UUID,
+        sku: Optional[str],
+        name: str,
+        price: Decimal,
+        sale_price: Optional[Decimal],
+        category_id: UUID,
+        category_name: str,
+        status: str,
+        version: int,
+    ):
+        self.id = id
+        self.sku = sku
+        self.name = name
+        self.price = price
+        self.sale_price = sale_price
+        self.category_id = category_id
+        self.category_name = category_name
+        self.status = status
+        self.version = version
+
+    @property
+    def effective_price(self) -> Decimal:
+        """Sale price if one is set, otherwise the regular price."""
+        if self.sale_price and self.sale_price > 0:
+            return self.sale_price
+        return self.price
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": str(self.id),
+            "sku": self.sku,
+            "name": self.name,
+            "price": str(self.price),
+            "sale_price": None if self.sale_price is None else str(self.sale_price),
+            "effective_price": str(self.effective_price),
+            "category_id": str(self.category_id),
+            "category_name": self.category_name,
+            "status": self.status,
+            "version": self.version,
+        }
+
+
+class POSCatalogue:
+    """
+    Process-local catalogue cache for till lookups.
+
+    Lookups by id or SKU are dictionary hits; prefix search bisects a sorted
+    list of lowercased names and SKUs. The cache loads in full on first use
+    and then applies only the changes since its version.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._by_id: Dict[UUID, CatalogueRecord] = {}
+        self._by_sku: Dict[str, CatalogueRecord] = {}
+        self._keys: List[Tuple[str, UUID]] = []
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._version
+
+    def invalidate(self) -> None:
+        """Make the next lookup check for changes straight away."""
+        self._checked_at = 0.0
+
+    def reset(self) -> None:
+        """Drop everything; the next lookup reloads the whole catalogue."""
+        with self._lock:
+            self._version = None
+            self._by_id, self._by_sku, self._keys = {}, {}, []
+
+    @staticmethod
+    def _record_keys(record: CatalogueRecord) -> List[Tuple[str, UUID]]:
+        keys = [(record.name.casefold(), record.id)]
+        if record.sku:
+            keys.append((record.sku.casefold(), record.id))
+        return keys
+
+    def _remove(self, product_id: UUID) -> None:
+        record = self._by_id.pop(product_id, None)
+        if record is None:
+            return
+        if record.sku:
+            self._by_sku.pop(record.sku.casefold(), None)
+        for key in self._record_keys(record):
+            position = bisect.bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                del self._keys[position]
+
+    def _sync(self) -> None:
+        interval = getattr(settings, "POS_CATALOGUE_CHECK_SECONDS", 1)
+        if self._version is not None and time.monotonic() - self._checked_at < interval:
+            return
+
+        with self._lock:
+            current = self._version
+            if current is not None and get_catalogue_version() == current:
+                self._checked_at = time.monotonic()
+                return
+
+            changes = get_catalogue_changes(self._version)
+            if changes["full"]:
+                self._by_id, self._by_sku, self._keys = {}, {}, []
+            for product_id in changes["deleted"]:
+                self._remove(product_id)
+
+            incremental = not changes["full"]
+            for record in changes["products"]:
+                self._remove(record.id)
+                self._by_id[record.id] = record
+                if record.sku:
+                    self._by_sku[record.sku.casefold()] = record
+                for key in self._record_keys(record):
+                    if incremental:
+                        bisect.insort(self._keys, key)
+                    else:
+                        self._keys.append(key)
+            if not incremental:
+                self._keys.sort()
+
+            self._version = changes["version"]
+            self._checked_at = time.monotonic()
+
+    def get(self, product_id: UUID) -> Optional[CatalogueRecord]:
+        """
+        Look a product up by id.
+
+        Args:
+            product_id (UUID): Product ID.
+
+        Returns:
+            CatalogueRecord | None: The product, if it exists.
+        """
+        self._sync()
+        return self._by_id.get(product_id)
+
+    def get_by_sku(self, sku: str) -> Optional[CatalogueRecord]:
+        """
+        Look a product up by SKU (the code printed on its barcode label).
+
+        Args:
+            sku (str): SKU, matched case-insensitively.
+
+        Returns:
+            CatalogueRecord | None: The product, if it exists.
+        """
+        self._sync()
+        return self._by_sku.get(sku.strip().casefold())
+
+    def lookup(self, code: str) -> Optional[CatalogueRecord]:
+        """
+        Resolve a scanned or typed code: SKU first, then product id.
+
+        Args:
+            code (str): SKU or product UUID.
+
+        Returns:
+            CatalogueRecord | None: The product, if it exists.
+        """
+        record = self.get_by_sku(code)
+        if record is not None:
+            return record
+        try:
+            return self.get(UUID(code.strip()))
+        except ValueError:
+            return None
+
+    def prefix_search(self, prefix: str, limit: int = 20) -> List[CatalogueRecord]:
+        """
+        Find products whose name or SKU starts with a prefix.
+
+        Args:
+            prefix (str): Start of the name or SKU, any case.
+            limit (int): Maximum number of products to return.
+
+        Returns:
+            List[CatalogueRecord]: Matches in name/SKU order.
+        """
+        prefix = prefix.strip().casefold()
+        if not prefix:
+            return []
+        self._sync()
+        with self._lock:
+            results, seen = [], set()
+            position = bisect.bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and len(results) < limit:
+                key, product_id = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                if product_id not in seen:
+                    seen.add(product_id)
+                    results.append(self._by_id[product_id])
+                position += 1
+            return results
+
+
+pos_catalogue = POSCatalogue()
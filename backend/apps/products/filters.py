@@ -6,6 +6,7 @@ Provides advanced filtering capabilities for the Product API.
 import django_filters
 from django.db.models import Q
 from .models import Product, Category
+from .search import search_products
 
 
 class ProductFilter(django_filters.FilterSet):
@@ -64,6 +65,18 @@ class ProductFilter(django_filters.FilterSet):
     # Sale items filtering
     on_sale = django_filters.BooleanFilter(method="filter_on_sale", label="On Sale")
 
+    # Ordering, including the effective (sale or regular) price
+    ordering = django_filters.OrderingFilter(
+        fields=(
+            ("name", "name"),
+            ("price", "price"),
+            ("effective_price", "effective_price"),
+            ("stock", "stock"),
+            ("created_at", "created_at"),
+        ),
+        label="Ordering",
+    )
+
     class Meta:
         model = Product
         fields = [
@@ -78,6 +91,7 @@ class ProductFilter(django_filters.FilterSet):
             "created_after",
             "created_before",
             "on_sale",
+            "ordering",
         ]
 
     def filter_search(self, queryset, name, value):
@@ -87,32 +101,28 @@ class ProductFilter(django_filters.FilterSet):
         if not value:
             return queryset
 
-        return queryset.filter(
-            Q(name__icontains=value)
-            | Q(description__icontains=value)
-            | Q(category__name__icontains=value)
+        return search_products(queryset, value)
+
+    def filter_queryset(self, queryset):
+        """
+        Annotate effective_price and stock_status before filtering, so both
+        can be ordered on.
+        """
+        return super().filter_queryset(
+            queryset.with_effective_price().with_stock_status()
         )
 
     def filter_stock_status(self, queryset, name, value):
         """
         Filter products by stock status.
         """
-        if value == "in_stock":
-            return queryset.filter(stock__gt=10)
-        elif value == "low_stock":
-            return queryset.filter(stock__gt=0, stock__lte=10)
-        elif value == "out_of_stock":
-            return queryset.filter(stock=0)
-        return queryset
+        return queryset.filter_stock_status(value)
 
     def filter_on_sale(self, queryset, name, value):
         """
         Filter products that are on sale.
         """
-        if value:
-            return queryset.filter(sale_price__isnull=False, sale_price__gt=0)
-        else:
-            return queryset.filter(Q(sale_price__isnull=True) | Q(sale_price=0))
+        return queryset.on_sale(value)
 
 
 class CategoryFilter(django_filters.FilterSet):
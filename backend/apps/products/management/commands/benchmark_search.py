@@ -0,0 +1,200 @@
+"""
+Management command to benchmark the product search backends.
+Usage: python manage.py benchmark_search [--products 100000] [--queries 200]
+       [--limit 20] [--backend database --backend memory ...] [--keep]
+
+Times the same search-box queries (whole words and typed prefixes taken from
+real product names) against each backend: the original icontains filter,
+the MySQL FULLTEXT index (MySQL only) and the in-process inverted index.
+With --products, that many synthetic products are added first and removed
+again afterwards unless --keep is given; both skip the model signals, so
+the catalogue version and the other workers' indexes are left alone.
+"""
+
+import random
+import statistics
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from apps.products.models import Category, Product
+from apps.products.search import BACKENDS, get_search_backend, tokenize
+
+SKU_PREFIX = "BENCH-"
+CATEGORY_NAME = "Search Benchmark"
+
+COLOURS = ["black", "white", "navy", "olive", "maroon", "grey", "beige", "teal"]
+MATERIALS = ["cotton", "linen", "denim", "wool", "silk", "leather", "fleece"]
+GARMENTS = [
+    "shirt",
+    "trousers",
+    "jacket",
+    "dress",
+    "skirt",
+    "hoodie",
+    "sweater",
+    "shorts",
+    "blazer",
+    "cardigan",
+]
+FITS = ["slim", "regular", "relaxed", "oversized", "tailored", "cropped"]
+
+
+class Command(BaseCommand):
+    help = "Compare product search backends on the same queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--products",
+            type=int,
+            default=0,
+            help="Synthetic products to add before timing (default: 0)",
+        )
+        parser.add_argument(
+            "--queries",
+            type=int,
+            default=200,
+            help="Number of queries timed per backend (default: 200)",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Results fetched per query, like the POS search box (default: 20)",
+        )
+        parser.add_argument(
+            "--backend",
+            action="append",
+            choices=sorted(BACKENDS),
+            help="Backend to time; repeat for several (default: all available)",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the synthetic products after the run",
+        )
+        parser.add_argument("--seed", type=int, default=1, help="Random seed")
+
+    def handle(self, *args, **options):
+        if options["queries"] < 1 or options["limit"] < 1:
+            raise CommandError("--queries and --limit must be at least 1")
+        rng = random.Random(options["seed"])
+
+        backends = options["backend"] or [
+            name
+            for name in ("database", "fulltext", "memory")
+            if name != "fulltext" or connection.vendor == "mysql"
+        ]
+        if "fulltext" in backends and connection.vendor != "mysql":
+            raise CommandError("The fulltext backend needs MySQL")
+
+        if options["products"]:
+            self.create_products(options["products"], rng)
+        try:
+            total = Product.objects.count()
+            if not total:
+                raise CommandError("No products to search; use --products N")
+            queries = self.sample_queries(options["queries"], rng)
+            self.stdout.write(
+                f"Timing {len(queries)} queries over {total} products, "
+                f"{options['limit']} results each"
+            )
+            for name in backends:
+                self.time_backend(name, queries, options["limit"])
+        finally:
+            if options["products"] and not options["keep"]:
+                self.remove_products()
+
+    def create_products(self, count, rng):
+        """Bulk insert synthetic products (signals are skipped on purpose)"""
+        category, _ = Category.objects.get_or_create(name=CATEGORY_NAME)
+        started = time.perf_counter()
+        batch = []
+        for number in range(count):
+            words = [
+                rng.choice(FITS),
+                rng.choice(COLOURS),
+                rng.choice(MATERIALS),
+                rng.choice(GARMENTS),
+            ]
+            batch.append(
+                Product(
+                    name=" ".join(words).title() + f" {number}",
+                    description=f"{words[2]} {words[3]} in {words[1]}, {words[0]} fit",
+                    price=Decimal("10.00") + number % 90,
+                    stock=number % 50,
+                    category=category,
+                    sku=f"{SKU_PREFIX}{number}",
+                )
+            )
+            if len(batch) == 2000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+        self.stdout.write(
+            f"Created {count} products in {time.perf_counter() - started:.1f}s"
+        )
+
+    def remove_products(self):
+        """
+        Delete the synthetic rows without signals, as they were created
+
+        A rolled-back transaction, as the other benchmarks use, would hide
+        the rows from the FULLTEXT index, which InnoDB only updates on
+        commit. A plain delete() would leave catalogue tombstones and
+        version bumps behind for products no client ever saw.
+        """
+        products = Product.objects.filter(sku__startswith=SKU_PREFIX)
+        products._raw_delete(products.db)
+        categories = Category.objects.filter(name=CATEGORY_NAME, products__isnull=True)
+        categories._raw_delete(categories.db)
+        self.stdout.write("Removed the synthetic products")
+
+    def sample_queries(self, count, rng):
+        """Whole words and typed prefixes taken from random product names"""
+        names = list(
+            Product.objects.order_by("?").values_list("name", flat=True)[:count]
+        )
+        queries = []
+        for number in range(count):
+            name = names[number % len(names)]
+            words = [word for word in tokenize(name) if word.isalpha()]
+            if not words:
+                continue
+            word = rng.choice(words)
+            kind = number % 3
+            if kind == 0:
+                queries.append(word)
+            elif kind == 1:
+                queries.append(word[: max(2, len(word) // 2)])
+            else:
+                queries.append(" ".join(rng.sample(words, min(2, len(words)))))
+        return queries
+
+    def time_backend(self, name, queries, limit):
+        backend = get_search_backend(name)
+        if name == "memory":
+            started = time.perf_counter()
+            backend.rebuild()
+            self.stdout.write(
+                f"  memory index built in {time.perf_counter() - started:.2f}s"
+            )
+
+        timings = []
+        matches = 0
+        for query in queries:
+            started = time.perf_counter()
+            products = backend.top(Product.objects.all(), query, limit)
+            timings.append((time.perf_counter() - started) * 1000)
+            matches += len(products)
+
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{name:<9} mean {statistics.mean(timings):8.2f} ms  "
+                f"p50 {statistics.median(timings):8.2f} ms  "
+                f"p95 {p95:8.2f} ms  "
+                f"avg results {matches / len(queries):.1f}"
+            )
+        )
@@ -0,0 +1,135 @@
+"""
+Management command to benchmark product list serialization.
+Usage: python manage.py benchmark_serializers [--products 1000] [--rounds 20]
+       [--keep]
+
+Renders the same products with ProductSerializer over model instances (the
+old list path) and with the row serializer over values() rows (the current
+one), and reports milliseconds per 1,000 products and the speed-up, both
+for serialization alone and including the query. With --products,
+that many synthetic products are inserted first inside a transaction that
+is rolled back afterwards unless --keep is given.
+"""
+
+import statistics
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from apps.products.models import Category, Product
+from apps.products.selectors import get_product_rows
+from apps.products.serializers import ProductSerializer, serialize_product_rows
+
+SKU_PREFIX = "SERBENCH-"
+CATEGORY_NAME = "Serializer Benchmark"
+
+
+class Rollback(Exception):
+    """Raised to discard the synthetic products"""
+
+
+class Command(BaseCommand):
+    help = "Compare ProductSerializer with the values() row serializer"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--products",
+            type=int,
+            default=0,
+            help="Synthetic products to add before timing (default: 0)",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=20,
+            help="Timed rounds per path; the median is reported (default: 20)",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the synthetic products after the run",
+        )
+
+    def handle(self, *args, **options):
+        if options["rounds"] < 1:
+            raise CommandError("--rounds must be at least 1")
+        try:
+            with transaction.atomic():
+                if options["products"]:
+                    self.create_products(options["products"])
+                self.run(options["rounds"])
+                if options["products"] and not options["keep"]:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write("Rolled back the synthetic products")
+
+    def create_products(self, count):
+        """Bulk insert synthetic products (signals are skipped on purpose)"""
+        category, _ = Category.objects.get_or_create(name=CATEGORY_NAME)
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name=f"Benchmark Product {number:06d}",
+                    description="Synthetic product",
+                    image=f"products/bench-{number}.jpg" if number % 2 else "",
+                    price=Decimal("10.00") + number % 90,
+                    sale_price=Decimal("8.50") if number % 3 == 0 else None,
+                    stock=number % 30,
+                    category=category,
+                    sku=f"{SKU_PREFIX}{number}",
+                )
+                for number in range(count)
+            ],
+            batch_size=2000,
+        )
+
+    def run(self, rounds):
+        total = Product.objects.count()
+        if not total:
+            raise CommandError("No products to serialize; use --products N")
+        request = Request(APIRequestFactory().get("/api/products/"))
+        queryset = Product.objects.select_related("category").order_by("name")
+        self.stdout.write(f"{total} products, median of {rounds} rounds")
+
+        def instances():
+            return ProductSerializer(
+                list(queryset), many=True, context={"request": request}
+            ).data
+
+        def rows():
+            return serialize_product_rows(list(get_product_rows(queryset)), request)
+
+        products = list(queryset)
+        product_rows = list(get_product_rows(queryset))
+        results = [
+            (
+                "serializer only",
+                lambda: ProductSerializer(
+                    products, many=True, context={"request": request}
+                ).data,
+                lambda: serialize_product_rows(product_rows, request),
+            ),
+            ("query + serializer", instances, rows),
+        ]
+        for name, before, after in results:
+            old = self.time(before, rounds) * 1000 / total
+            new = self.time(after, rounds) * 1000 / total
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{name:<19} per 1,000 products: "
+                    f"ProductSerializer {old * 1000:8.1f} ms  "
+                    f"rows {new * 1000:7.1f} ms  ({old / new:.1f}x)"
+                )
+            )
+
+    @staticmethod
+    def time(render, rounds):
+        """Median seconds of one call of render"""
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            render()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
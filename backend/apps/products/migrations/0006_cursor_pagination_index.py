@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0005_product_image"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["name", "id"], name="products_pr_name_37bd5c_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+INDEX_NAME = "products_product_search_ft"
+
+
+def create_fulltext_index(apps, schema_editor):
+    """Add the FULLTEXT index used by the fulltext search backend (MySQL only)"""
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(
+        f"CREATE FULLTEXT INDEX {INDEX_NAME} " "ON products_product (name, description)"
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(f"DROP INDEX {INDEX_NAME} ON products_product")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0006_cursor_pagination_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0007_product_fulltext_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogueVersion",
+            fields=[
+                (
+                    "id",
+                    models.PositiveSmallIntegerField(
+                        default=1, primary_key=True, serialize=False
+                    ),
+                ),
+                ("value", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DeletedProduct",
+            fields=[
+                ("product_id", models.UUIDField(primary_key=True, serialize=False)),
+                ("catalogue_version", models.PositiveBigIntegerField(db_index=True)),
+                ("deleted_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="catalogue_version",
+            field=models.PositiveBigIntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:27
+
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+
+
+def fill_stock_state(apps, schema_editor):
+    """Derive stock_state for the existing products."""
+    Product = apps.get_model("products", "Product")
+    Product.objects.update(
+        stock_state=Case(
+            When(stock__lte=0, then=Value("out")),
+            When(stock__lte=F("min_stock"), then=Value("low")),
+            default=Value("ok"),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0008_pos_catalogue_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="stock_state",
+            field=models.CharField(
+                choices=[
+                    ("ok", "In stock"),
+                    ("low", "Low stock"),
+                    ("out", "Out of stock"),
+                ],
+                default="out",
+                editable=False,
+                max_length=3,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["stock_state", "status", "stock"],
+                name="products_pr_stock_s_da4ea1_idx",
+            ),
+        ),
+        migrations.RunPython(fill_stock_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0009_product_stock_state"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["updated_at"], name="products_pr_updated_150263_idx"
+            ),
+        ),
+    ]
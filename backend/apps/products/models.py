@@ -1,8 +1,109 @@
 import uuid
 from django.db import models
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.db.models.functions import Now
+from django.db.models.lookups import LessThanOrEqual
 
 # Create your models here.
 
+# Stored stock states (Product.stock_state)
+STOCK_OK = "ok"
+STOCK_LOW = "low"
+STOCK_OUT = "out"
+STOCK_STATE_CHOICES = [
+    (STOCK_OK, "In stock"),
+    (STOCK_LOW, "Low stock"),
+    (STOCK_OUT, "Out of stock"),
+]
+
+# API stock status code of each stored state
+STOCK_STATE_STATUS = {
+    STOCK_OK: "in_stock",
+    STOCK_LOW: "low_stock",
+    STOCK_OUT: "out_of_stock",
+}
+
+STOCK_STATUS_LABELS = {
+    "in_stock": "In Stock",
+    "low_stock": "Low Stock",
+    "out_of_stock": "Out of Stock",
+}
+
+# Properties of Product that ProductQuerySet can also annotate in SQL
+ANNOTATED_PROPERTIES = ("effective_price", "is_on_sale", "stock_status")
+
+# Stock status filters as lookups on the indexed stock_state column
+STOCK_STATUS_FILTERS = {
+    status: Q(stock_state=state) for state, status in STOCK_STATE_STATUS.items()
+}
+
+
+def get_stock_state(stock: int, threshold: int) -> str:
+    """
+    Return the stock state for a stock level.
+
+    Args:
+        stock (int): Units in stock.
+        threshold (int): The product's minimum stock; at or below it (and
+            above zero) the product is low on stock.
+
+    Returns:
+        str: STOCK_OK, STOCK_LOW or STOCK_OUT.
+    """
+    if stock <= 0:
+        return STOCK_OUT
+    if stock <= threshold:
+        return STOCK_LOW
+    return STOCK_OK
+
+
+def stock_state_expression(stock=None) -> Case:
+    """
+    Return the SQL equivalent of get_stock_state for a product row.
+
+    Args:
+        stock (Expression): Stock level to judge; the stock column if None.
+            Pass the new stock of an UPDATE to set stock_state in the same
+            statement.
+
+    Returns:
+        Case: Expression computing stock_state from stock and min_stock.
+    """
+    stock = F("stock") if stock is None else stock
+    return Case(
+        When(LessThanOrEqual(stock, 0), then=Value(STOCK_OUT)),
+        When(
+            LessThanOrEqual(stock, F("min_stock")),
+            then=Value(STOCK_LOW),
+        ),
+        default=Value(STOCK_OK),
+        output_field=models.CharField(),
+    )
+
+
+def stock_update(stock) -> dict:
+    """
+    Return QuerySet.update() arguments setting stock and stock_state.
+
+    stock_state comes first: MySQL evaluates SET assignments left to right
+    against the already updated columns, so it must be computed before
+    stock changes; other databases read the old row either way. updated_at
+    is bumped as a save would, which keeps list ETags honest.
+
+    Args:
+        stock (Expression | int): New stock, in terms of the old row.
+
+    Returns:
+        dict: Keyword arguments for update().
+    """
+    if isinstance(stock, int):
+        stock = Value(stock)
+    return {
+        "stock_state": stock_state_expression(stock),
+        "stock": stock,
+        "updated_at": Now(),
+    }
+
 
 class Category(models.Model):
     id = models.UUIDField(
@@ -19,6 +120,95 @@ class Category(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    """Product queries with the derived pricing and stock values in SQL."""
+
+    def with_effective_price(self) -> "ProductQuerySet":
+        """
+        Annotate effective_price (the sale price if above zero, otherwise the
+        regular price) and is_on_sale, so both can be filtered and sorted on.
+
+        Returns:
+            ProductQuerySet: Annotated products.
+        """
+        return self.annotate(
+            is_on_sale=Case(
+                When(sale_price__gt=0, then=Value(True)),
+                default=Value(False),
+                output_field=models.BooleanField(),
+            ),
+            effective_price=Case(
+                When(sale_price__gt=0, then=F("sale_price")),
+                default=F("price"),
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ),
+        )
+
+    def with_stock_status(self) -> "ProductQuerySet":
+        """
+        Annotate stock_status with the codes of STOCK_STATUS_LABELS, read
+        from the stored stock_state.
+
+        Returns:
+            ProductQuerySet: Annotated products.
+        """
+        return self.annotate(
+            stock_status=Case(
+                *(
+                    When(stock_state=state, then=Value(status))
+                    for state, status in STOCK_STATE_STATUS.items()
+                ),
+                output_field=models.CharField(),
+            )
+        )
+
+    def filter_stock_status(self, stock_status: str) -> "ProductQuerySet":
+        """
+        Keep products with a stock status, using the stock_state index.
+
+        Args:
+            stock_status (str): in_stock, low_stock or out_of_stock; anything
+                else leaves the queryset as it is.
+
+        Returns:
+            ProductQuerySet: Filtered products.
+        """
+        condition = STOCK_STATUS_FILTERS.get(stock_status)
+        return self if condition is None else self.filter(condition)
+
+    def on_sale(self, value: bool = True) -> "ProductQuerySet":
+        """
+        Keep products that are (or, with value=False, are not) on sale.
+
+        Args:
+            value (bool): Whether to keep products on sale.
+
+        Returns:
+            ProductQuerySet: Filtered products.
+        """
+        if value:
+            return self.filter(sale_price__gt=0)
+        return self.filter(Q(sale_price__isnull=True) | Q(sale_price__lte=0))
+
+    def refresh_stock_state(self) -> int:
+        """
+        Recompute the stored stock_state from stock and min_stock.
+
+        Needed after an UPDATE of stock that does not use stock_update().
+
+        Returns:
+            int: Number of products updated.
+        """
+        return self.update(stock_state=stock_state_expression())
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Bulk insert products with their stock_state set (save is skipped)."""
+        objs = list(objs)
+        for product in objs:
+            product.stock_state = get_stock_state(product.stock, product.min_stock)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Product(models.Model):
     STATUS_CHOICES = [
         ("active", "Active"),
@@ -48,17 +238,129 @@ class Product(models.Model):
     sku = models.CharField(
         max_length=100, unique=True, null=True, blank=True
     )  # Stock Keeping Unit for unique identification
+    # Catalogue version of the last change tills need to see (see catalogue.py)
+    catalogue_version = models.PositiveBigIntegerField(default=0, db_index=True)
+    # Derived from stock and min_stock on every stock change, so
+    # alert lists are index lookups
+    stock_state = models.CharField(
+        max_length=3, choices=STOCK_STATE_CHOICES, default=STOCK_OUT, editable=False
+    )
+
+    objects = ProductQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Save the product, keeping stock_state in line with its stock."""
+        self.forget_annotations()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "stock" in update_fields:
+            self.stock_state = get_stock_state(self.stock, self.min_stock)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "stock_state"}
+        super().save(*args, **kwargs)
+        if update_fields is not None and "stock" not in update_fields:
+            if "min_stock" in update_fields:
+                # Judge the new minimum against the stock in the database,
+                # which sales may have changed since this instance was read
+                Product.objects.filter(pk=self.pk).refresh_stock_state()
+
+    def refresh_from_db(self, *args, **kwargs):
+        """Reload the product, dropping annotated values that may be stale."""
+        self.forget_annotations()
+        super().refresh_from_db(*args, **kwargs)
+
+    def forget_annotations(self):
+        """
+        Drop the values annotated by ProductQuerySet, so the properties are
+        computed from the instance's own fields again.
+        """
+        for name in ANNOTATED_PROPERTIES:
+            self.__dict__.pop(f"_annotated_{name}", None)
+
+    def _get_annotated(self, name):
+        return self.__dict__.get(f"_annotated_{name}")
+
     @property
     def effective_price(self):
-        """Return the effective selling price (sale price if available, otherwise regular price)."""
+        """
+        Return the effective selling price (sale price if available, otherwise
+        regular price), as annotated by with_effective_price() if it was.
+        """
+        annotated = self._get_annotated("effective_price")
+        if annotated is not None:
+            return annotated
         if self.sale_price and self.sale_price > 0:
             return self.sale_price
         return self.price
 
+    @effective_price.setter
+    def effective_price(self, value):
+        # Annotated by with_effective_price(); kept until save or reload
+        self.__dict__["_annotated_effective_price"] = value
+
+    @property
+    def stock_status(self):
+        """
+        Return the stock status code (see STOCK_STATUS_LABELS), as annotated
+        by with_stock_status() if it was.
+        """
+        annotated = self._get_annotated("stock_status")
+        if annotated is not None:
+            return annotated
+        return STOCK_STATE_STATUS[get_stock_state(self.stock, self.min_stock)]
+
+    @stock_status.setter
+    def stock_status(self, value):
+        # Annotated by with_stock_status(); kept until save or reload
+        self.__dict__["_annotated_stock_status"] = value
+
+    @property
+    def is_on_sale(self):
+        """
+        Return whether a sale price above zero is set, as annotated by
+        with_effective_price() if it was.
+        """
+        annotated = self._get_annotated("is_on_sale")
+        if annotated is not None:
+            return bool(annotated)
+        return self.sale_price is not None and self.sale_price > 0
+
+    @is_on_sale.setter
+    def is_on_sale(self, value):
+        # Annotated by with_effective_price(); kept until save or reload
+        self.__dict__["_annotated_is_on_sale"] = value
+
     class Meta:
         ordering = ["name", "created_at"]
         verbose_name_plural = "Products"
+        indexes = [
+            # Keyset (cursor) pagination of the product list
+            models.Index(fields=["name", "id"]),
+            # Stock alert lists: state and status, ordered by stock
+            models.Index(fields=["stock_state", "status", "stock"]),
+            # MAX(updated_at) for list ETags (store_backend.conditional)
+            models.Index(fields=["updated_at"]),
+        ]
+
+
+class CatalogueVersion(models.Model):
+    """Single-row counter bumped on every product or category change."""
+
+    id = models.PositiveSmallIntegerField(primary_key=True, default=1)
+    value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Catalogue version {self.value}"
+
+
+class DeletedProduct(models.Model):
+    """Tombstone telling tills to drop a product deleted after their last sync."""
+
+    product_id = models.UUIDField(primary_key=True)
+    catalogue_version = models.PositiveBigIntegerField(db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Deleted product {self.product_id}"
@@ -0,0 +1,42 @@
+import codecs
+import csv
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def read_stock_csv(stream, encoding: str = "utf-8") -> list:
+    """
+    Read stock count rows from a CSV byte stream.
+
+    The file needs a header row with 'id' and 'stock' columns; other
+    columns are ignored. Rows are decoded as the stream is read.
+
+    Args:
+        stream: Binary file-like object with the CSV data.
+        encoding (str): Text encoding of the file.
+
+    Returns:
+        list: Dicts with 'id' and 'stock' keys, one per data row.
+    """
+    # utf-8-sig also strips the byte order mark spreadsheet exports add
+    if encoding.lower().replace("_", "-") == "utf-8":
+        encoding = "utf-8-sig"
+    try:
+        reader = csv.DictReader(codecs.iterdecode(stream, encoding))
+        if not reader.fieldnames or not {"id", "stock"} <= set(reader.fieldnames):
+            raise ParseError("CSV header must contain 'id' and 'stock' columns")
+        return [{"id": row["id"], "stock": row["stock"]} for row in reader]
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ParseError(f"CSV parse error - {e}")
+
+
+class StockCSVParser(BaseParser):
+    """Parse a text/csv request body of stock counts into {'updates': [...]}."""
+
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", "utf-8")
+        if stream is None:
+            return {"updates": []}
+        return {"updates": read_stock_csv(stream, encoding)}
@@ -0,0 +1,524 @@
+"""
+Product search backends.
+
+Searching used to be a name/description/category icontains filter, which
+scans the whole product table (and joins categories) on every keystroke of
+the POS search box. Searches now go through a pluggable backend chosen by
+the PRODUCT_SEARCH_BACKEND setting:
+
+- fulltext: MySQL FULLTEXT index on name and description (boolean mode,
+  prefix matching), ranked by MATCH relevance.
+- memory: an inverted index held in the worker process, with prefixes of
+  name and category words and whole description words, ranked by where the
+  terms matched. Signals keep it fresh for this process and a periodic
+  incremental refresh picks up changes made by other workers.
+- database: the original icontains filter, kept as the reference path.
+- auto (default): fulltext on MySQL, memory anywhere else.
+
+Every backend narrows a product queryset and annotates it with search_rank
+(higher is more relevant).
+"""
+
+import heapq
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Set
+from uuid import UUID
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, QuerySet, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from .models import Category, Product
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Longest word prefix kept in the in-memory index
+MAX_PREFIX_LENGTH = 15
+
+# Incremental refreshes look back this far before the last sync, so rows
+# saved by transactions that were still open at that point are not missed
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase search terms.
+
+    Args:
+        text (str): Text to split.
+
+    Returns:
+        List[str]: Words of the text, casefolded.
+    """
+    return TOKEN_RE.findall((text or "").casefold())
+
+
+def rank_by_scores(queryset: QuerySet, scores: Dict[UUID, int]) -> QuerySet:
+    """
+    Restrict a queryset to scored ids and annotate their score as rank.
+
+    Scores are small integers, so the CASE has one branch per distinct
+    score rather than one per product.
+
+    Args:
+        queryset (QuerySet): Products to narrow.
+        scores (Dict[UUID, int]): Score of every matching product id.
+
+    Returns:
+        QuerySet: Matching products with search_rank set.
+    """
+    if not scores:
+        return queryset.none().annotate(search_rank=Value(0))
+    buckets = defaultdict(list)
+    for pk, score in scores.items():
+        buckets[score].append(pk)
+    return queryset.annotate(
+        search_rank=Case(
+            *(
+                When(id__in=ids, then=Value(score))
+                for score, ids in sorted(buckets.items(), reverse=True)
+            ),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    ).filter(search_rank__gt=0)
+
+
+class SearchBackend:
+    """Base class for product search backends."""
+
+    name = ""
+
+    def filter(self, queryset: QuerySet, query: str) -> QuerySet:
+        """
+        Narrow a product queryset to products matching a query.
+
+        Args:
+            queryset (QuerySet): Products to search within.
+            query (str): Search text as typed by the user.
+
+        Returns:
+            QuerySet: Matching products annotated with search_rank.
+        """
+        raise NotImplementedError
+
+    def top(self, queryset: QuerySet, query: str, limit: int) -> List[Product]:
+        """
+        Fetch the best matches for a query, as the POS search box needs.
+
+        Args:
+            queryset (QuerySet): Products to search within.
+            query (str): Search text as typed by the user.
+            limit (int): Number of products to return.
+
+        Returns:
+            List[Product]: Best matching products, best first.
+        """
+        return list(
+            self.filter(queryset, query).order_by("-search_rank", "name")[:limit]
+        )
+
+    def index_product(self, product: Product) -> None:
+        """Add or refresh one product in the index."""
+
+    def remove_product(self, product_id: UUID) -> None:
+        """Drop one product from the index."""
+
+    def index_category(self, category: Category) -> None:
+        """Refresh the products of a renamed category."""
+
+    def rebuild(self) -> None:
+        """Rebuild the whole index from the database."""
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """The original icontains filter over name, description and category."""
+
+    name = "database"
+
+    def filter(self, queryset: QuerySet, query: str) -> QuerySet:
+        return queryset.filter(
+            Q(name__icontains=query)
+            | Q(description__icontains=query)
+            | Q(category__name__icontains=query)
+        ).annotate(
+            search_rank=Case(
+                When(name__icontains=query, then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        )
+
+
+class FullTextSearchBackend(SearchBackend):
+    """
+    MySQL FULLTEXT search over product name and description.
+
+    Every query word must match the start of an indexed word. Category names
+    are matched separately against the small category table.
+    """
+
+    name = "fulltext"
+
+    def filter(self, queryset: QuerySet, query: str) -> QuerySet:
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none().annotate(search_rank=Value(0))
+
+        table = Product._meta.db_table
+        against = " ".join(f"+{term}*" for term in terms)
+        queryset = queryset.annotate(
+            search_rank=RawSQL(
+                f"MATCH ({table}.name, {table}.description) "
+                "AGAINST (%s IN BOOLEAN MODE)",
+                [against],
+            )
+        )
+        # MySQL cannot use the FULLTEXT index inside an OR, so the category
+        # condition is only added when a category actually matches
+        category_ids = list(
+            Category.objects.filter(name__icontains=query.strip()).values_list(
+                "id", flat=True
+            )
+        )
+        if category_ids:
+            return queryset.filter(
+                Q(search_rank__gt=0) | Q(category_id__in=category_ids)
+            )
+        return queryset.filter(search_rank__gt=0)
+
+
+class InMemorySearchBackend(SearchBackend):
+    """
+    Inverted index of the product catalogue held in process memory.
+
+    Products get small integer document numbers. Name words are indexed
+    whole and by every prefix, category names by prefix (per category, not
+    per product) and description words whole only, which keeps 100k
+    products within a few hundred MB. A product matches when every query
+    term matches it somewhere; its rank adds up the best match per term:
+    whole name word 4, name prefix 3, category 2, description word 1.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._synced_at = None
+        self._checked_at = 0.0
+        self._clear()
+
+    def _clear(self) -> None:
+        self._doc_ids: Dict[UUID, int] = {}
+        self._product_ids: List[Optional[UUID]] = []
+        self._names: List[str] = []
+        self._doc_text: List[tuple] = []
+        self._doc_category: List[Optional[UUID]] = []
+        self._name_words: Dict[str, Set[int]] = defaultdict(set)
+        self._name_prefixes: Dict[str, Set[int]] = defaultdict(set)
+        self._description_words: Dict[str, Set[int]] = defaultdict(set)
+        self._category_prefixes: Dict[str, Set[UUID]] = defaultdict(set)
+        self._category_terms: Dict[UUID, Set[str]] = {}
+        self._category_docs: Dict[UUID, Set[int]] = defaultdict(set)
+
+    @staticmethod
+    def _prefixes(word: str) -> Iterable[str]:
+        longest = min(len(word), MAX_PREFIX_LENGTH)
+        return (word[:length] for length in range(1, longest + 1))
+
+    def _terms(self, name: str, description: str) -> Iterable[tuple]:
+        """Postings lists a product belongs to, with the term for each."""
+        for word in set(tokenize(name)):
+            yield self._name_words, word
+            for prefix in self._prefixes(word):
+                yield self._name_prefixes, prefix
+        for word in set(tokenize(description)):
+            yield self._description_words, word
+
+    def _add(self, product_id, name, description, category_id, category_name) -> None:
+        """Index one product; the caller holds the lock."""
+        doc = self._drop(product_id)
+        if doc is None:
+            doc = len(self._product_ids)
+            self._product_ids.append(None)
+            self._names.append("")
+            self._doc_text.append(None)
+            self._doc_category.append(None)
+        self._doc_ids[product_id] = doc
+        self._product_ids[doc] = product_id
+        self._names[doc] = (name or "").casefold()
+        self._doc_text[doc] = (name, description)
+        for postings, term in self._terms(name, description):
+            postings[term].add(doc)
+
+        self._doc_category[doc] = category_id
+        if category_id is not None:
+            self._set_category(category_id, category_name)
+            self._category_docs[category_id].add(doc)
+
+    def _drop(self, product_id) -> Optional[int]:
+        """
+        Remove a product's postings; the caller holds the lock.
+
+        Returns the freed document number so a re-indexed product keeps it.
+        """
+        doc = self._doc_ids.pop(product_id, None)
+        if doc is None:
+            return None
+        for postings, term in self._terms(*self._doc_text[doc]):
+            postings[term].discard(doc)
+        category_id = self._doc_category[doc]
+        if category_id is not None:
+            self._category_docs[category_id].discard(doc)
+        self._product_ids[doc] = None
+        self._doc_text[doc] = None
+        self._doc_category[doc] = None
+        return doc
+
+    def _set_category(self, category_id, category_name) -> None:
+        """Index a category name by prefix; the caller holds the lock."""
+        terms = set()
+        for word in tokenize(category_name):
+            terms.update(self._prefixes(word))
+        old_terms = self._category_terms.get(category_id, set())
+        if terms == old_terms:
+            return
+        for term in old_terms - terms:
+            self._category_prefixes[term].discard(category_id)
+        for term in terms - old_terms:
+            self._category_prefixes[term].add(category_id)
+        self._category_terms[category_id] = terms
+
+    def _rows(self, products: QuerySet) -> Iterable[tuple]:
+        return products.values_list(
+            "id", "name", "description", "category_id", "category__name"
+        ).iterator(chunk_size=2000)
+
+    def rebuild(self) -> None:
+        synced_at = timezone.now()
+        with self._lock:
+            self._clear()
+            for row in self._rows(Product.objects.all()):
+                self._add(*row)
+            self._built = True
+            self._synced_at = synced_at
+            self._checked_at = time.monotonic()
+
+    def refresh(self) -> None:
+        """
+        Re-index products and categories changed since the last sync.
+
+        Deleted products are not seen here; they simply drop out of the
+        results because the queryset no longer contains them, and are
+        removed for good at the next rebuild.
+        """
+        synced_at = timezone.now()
+        with self._lock:
+            since = self._synced_at - REFRESH_OVERLAP
+            changed = Product.objects.filter(
+                Q(updated_at__gte=since) | Q(category__updated_at__gte=since)
+            )
+            for row in self._rows(changed):
+                self._add(*row)
+            self._synced_at = synced_at
+            self._checked_at = time.monotonic()
+
+    def _ensure_fresh(self) -> None:
+        if not self._built:
+            self.rebuild()
+            return
+        interval = getattr(settings, "PRODUCT_SEARCH_REFRESH_SECONDS", 30)
+        if time.monotonic() - self._checked_at >= interval:
+            self.refresh()
+
+    def index_product(self, product: Product) -> None:
+        with self._lock:
+            if not self._built:
+                return
+            category_name = (
+                Category.objects.filter(pk=product.category_id)
+                .values_list("name", flat=True)
+                .first()
+            )
+            self._add(
+                product.id,
+                product.name,
+                product.description,
+                product.category_id,
+                category_name,
+            )
+
+    def remove_product(self, product_id: UUID) -> None:
+        with self._lock:
+            self._drop(product_id)
+
+    def index_category(self, category: Category) -> None:
+        with self._lock:
+            if self._built:
+                self._set_category(category.id, category.name)
+
+    def _score(self, terms: List[str]) -> Dict[int, int]:
+        """Score of every document matching all terms; the lock must be held"""
+        scores = None
+        for term in dict.fromkeys(terms):
+            term_scores = dict.fromkeys(self._description_words.get(term, ()), 1)
+            for category_id in self._category_prefixes.get(term, ()):
+                term_scores.update(
+                    dict.fromkeys(self._category_docs.get(category_id, ()), 2)
+                )
+            term_scores.update(dict.fromkeys(self._name_prefixes.get(term, ()), 3))
+            term_scores.update(dict.fromkeys(self._name_words.get(term, ()), 4))
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    doc: scores[doc] + score
+                    for doc, score in term_scores.items()
+                    if doc in scores
+                }
+            if not scores:
+                return {}
+        return scores
+
+    def scores(self, query: str) -> Dict[UUID, int]:
+        """
+        Score every product matching every word of a query.
+
+        Args:
+            query (str): Search text as typed by the user.
+
+        Returns:
+            Dict[UUID, int]: Score of each matching product id (higher is
+            more relevant).
+        """
+        terms = tokenize(query)
+        if not terms:
+            return {}
+
+        self._ensure_fresh()
+        with self._lock:
+            return {
+                self._product_ids[doc]: score
+                for doc, score in self._score(terms).items()
+            }
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[UUID]:
+        """
+        Find products matching every word of a query.
+
+        Args:
+            query (str): Search text as typed by the user.
+            limit (int): Maximum number of ids to return; all when None.
+
+        Returns:
+            List[UUID]: Matching product ids, best first.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        self._ensure_fresh()
+        with self._lock:
+            scores = self._score(terms)
+            if limit is None:
+                ranked = sorted(
+                    scores, key=lambda doc: (-scores[doc], self._names[doc])
+                )
+                return [self._product_ids[doc] for doc in ranked]
+
+            # Scores are small integers, so only the best buckets need sorting
+            buckets = defaultdict(list)
+            for doc, score in scores.items():
+                buckets[score].append(doc)
+            ranked = []
+            for score in sorted(buckets, reverse=True):
+                ranked.extend(
+                    heapq.nsmallest(
+                        limit - len(ranked), buckets[score], key=self._names.__getitem__
+                    )
+                )
+                if len(ranked) >= limit:
+                    break
+            return [self._product_ids[doc] for doc in ranked]
+
+    def filter(self, queryset: QuerySet, query: str) -> QuerySet:
+        # Every match is kept: the caller's filters and pagination run on
+        # the result, so cutting it here could drop the matches they want
+        return rank_by_scores(queryset, self.scores(query))
+
+    def top(self, queryset: QuerySet, query: str, limit: int) -> List[Product]:
+        # Rank in memory and fetch just those rows by primary key; a few
+        # spare ids cover matches the queryset filters out
+        ids = self.search(query, limit=limit * 2)
+        products = queryset.in_bulk(ids)
+        return [products[pk] for pk in ids if pk in products][:limit]
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (
+        DatabaseSearchBackend,
+        FullTextSearchBackend,
+        InMemorySearchBackend,
+    )
+}
+_instances: Dict[str, SearchBackend] = {}
+_instances_lock = threading.Lock()
+
+
+def get_search_backend(name: Optional[str] = None) -> SearchBackend:
+    """
+    Return the shared instance of a search backend.
+
+    Args:
+        name (str): Backend name; defaults to the PRODUCT_SEARCH_BACKEND setting.
+
+    Returns:
+        SearchBackend: The backend instance for this process.
+    """
+    name = name or getattr(settings, "PRODUCT_SEARCH_BACKEND", "auto")
+    if name == "auto":
+        vendor = connections["default"].vendor
+        name = "fulltext" if vendor == "mysql" else "memory"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown product search backend: {name}")
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = BACKENDS[name]()
+        return _instances[name]
+
+
+def search_products(queryset: QuerySet, query: str) -> QuerySet:
+    """
+    Narrow a product queryset to a search query with the configured backend.
+
+    Args:
+        queryset (QuerySet): Products to search within.
+        query (str): Search text as typed by the user.
+
+    Returns:
+        QuerySet: Matching products annotated with search_rank.
+    """
+    return get_search_backend().filter(queryset, query)
+
+
+def top_products(queryset: QuerySet, query: str, limit: int) -> List[Product]:
+    """
+    Fetch the best matches for a query with the configured backend.
+
+    Args:
+        queryset (QuerySet): Products to search within.
+        query (str): Search text as typed by the user.
+        limit (int): Number of products to return.
+
+    Returns:
+        List[Product]: Best matching products, best first.
+    """
+    return get_search_backend().top(queryset, query, limit)
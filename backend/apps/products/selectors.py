@@ -1,7 +1,8 @@
 from django.http import HttpRequest
-from django.db.models import Q, QuerySet
+from django.db.models import QuerySet
 from .models import Product, Category
-from .serializers import ProductSerializer, CategorySerializer
+from .search import search_products
+from .serializers import PRODUCT_ROW_FIELDS, ProductSerializer, CategorySerializer
 
 
 def get_all_products() -> QuerySet[Product]:
@@ -31,20 +32,17 @@ def get_filtered_products(
         stock_status (str): Filter by stock status (in_stock, low_stock, out_of_stock)
         min_price (float): Minimum price filter
         max_price (float): Maximum price filter
-        ordering (str): Field to order by (e.g., 'name', '-created_at')
+        ordering (str): Field to order by (e.g., 'name', '-created_at',
+            'effective_price')
 
     Returns:
         QuerySet[Product]: Filtered queryset of products.
     """
-    queryset = Product.objects.select_related("category").all()
+    queryset = Product.objects.select_related("category").with_effective_price()
 
     # Search filter
     if search:
-        queryset = queryset.filter(
-            Q(name__icontains=search)
-            | Q(description__icontains=search)
-            | Q(category__name__icontains=search)
-        )
+        queryset = search_products(queryset, search)
 
     # Category filter
     if category:
@@ -52,12 +50,7 @@ def get_filtered_products(
 
     # Stock status filter
     if stock_status:
-        if stock_status == "in_stock":
-            queryset = queryset.filter(stock__gt=10)
-        elif stock_status == "low_stock":
-            queryset = queryset.filter(stock__gt=0, stock__lte=10)
-        elif stock_status == "out_of_stock":
-            queryset = queryset.filter(stock=0)
+        queryset = queryset.filter_stock_status(stock_status)
 
     # Price range filters
     if min_price is not None:
@@ -65,15 +58,32 @@ def get_filtered_products(
     if max_price is not None:
         queryset = queryset.filter(price__lte=max_price)
 
-    # Ordering
+    # Ordering (search results default to best match first)
     if ordering:
         queryset = queryset.order_by(ordering)
+    elif search:
+        queryset = queryset.order_by("-search_rank", "name", "created_at")
     else:
         queryset = queryset.order_by("name", "created_at")
 
     return queryset
 
 
+def get_product_rows(queryset: QuerySet[Product]) -> QuerySet:
+    """
+    Project products onto the columns the fast list serializer reads.
+
+    Args:
+        queryset (QuerySet[Product]): Filtered and ordered products.
+
+    Returns:
+        QuerySet: values() rows with PRODUCT_ROW_FIELDS, category included.
+    """
+    return (
+        queryset.with_effective_price().with_stock_status().values(*PRODUCT_ROW_FIELDS)
+    )
+
+
 def get_product_by_id(product_id: str) -> Product | None:
     """
     Retrieve a product by its ID.
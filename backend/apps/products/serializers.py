@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from decimal import Decimal
-from .models import Product, Category
+from typing import Any, Callable, Dict, Iterable, List
+from django.db import transaction
+from django.utils import timezone
+from apps.inventory.services import StockService
+from .models import STOCK_STATUS_LABELS, Product, Category
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -40,11 +44,7 @@ class ProductListSerializer(serializers.ModelSerializer):
 
     def get_stock_status(self, obj):
         """Return human-readable stock status."""
-        if obj.stock > 10:
-            return "In Stock"
-        elif obj.stock > 0:
-            return "Low Stock"
-        return "Out of Stock"
+        return STOCK_STATUS_LABELS[obj.stock_status]
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -84,21 +84,15 @@ class ProductSerializer(serializers.ModelSerializer):
 
     def get_stock_status(self, obj):
         """Return human-readable stock status."""
-        if obj.stock > 10:
-            return "In Stock"
-        elif obj.stock > 0:
-            return "Low Stock"
-        return "Out of Stock"
+        return STOCK_STATUS_LABELS[obj.stock_status]
 
     def get_is_on_sale(self, obj):
         """Check if product is on sale."""
-        return obj.sale_price is not None and obj.sale_price > 0
+        return obj.is_on_sale
 
     def get_effective_price(self, obj):
         """Return the effective selling price (sale price if available, otherwise regular price)."""
-        if obj.sale_price and obj.sale_price > 0:
-            return obj.sale_price
-        return obj.price
+        return obj.effective_price
 
     def validate(self, attrs):
         """Validate product data."""
@@ -132,12 +126,26 @@ class ProductSerializer(serializers.ModelSerializer):
             validated_data["category"] = category_data
         return super().create(validated_data)
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update an existing product."""
         category_data = validated_data.pop("category", None)
         if category_data:
             instance.category = category_data
-        return super().update(instance, validated_data)
+        stock = validated_data.pop("stock", None)
+
+        # Save only the edited fields so concurrent sales keep their stock
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        update_fields = list(validated_data) + ["updated_at"]
+        if category_data:
+            update_fields.append("category")
+        instance.save(update_fields=update_fields)
+
+        if stock is not None:
+            StockService.set_stock(instance.id, stock, note="Product edit")
+            instance.stock = stock
+        return instance
 
     def to_representation(self, instance):
         """Customize the output representation."""
@@ -182,3 +190,122 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         """Validate product data."""
         return ProductSerializer().validate(attrs)
+
+
+# Columns read for the fast product list path (see product_row_serializer)
+PRODUCT_ROW_FIELDS = (
+    "id",
+    "name",
+    "description",
+    "image",
+    "price",
+    "sale_price",
+    "stock",
+    "min_stock",
+    "category_id",
+    "category__name",
+    "category__description",
+    "category__created_at",
+    "category__updated_at",
+    "status",
+    "created_at",
+    "updated_at",
+    # Annotations of ProductQuerySet
+    "stock_status",
+    "is_on_sale",
+    "effective_price",
+)
+
+
+def _format_datetime(value, tz):
+    """Format a datetime the way DRF's DateTimeField does (ISO 8601)."""
+    if not value:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def product_row_serializer(request=None) -> Callable[[Dict[str, Any]], Dict]:
+    """
+    Build a plain function rendering a product values() row.
+
+    The function returns exactly what ProductSerializer returns for the same
+    product, without field objects, method fields, a nested serializer or
+    float round trips per row. The timezone, the request's scheme and host
+    and each category's representation are worked out once per function.
+
+    Args:
+        request (Request): The current request, for absolute image URLs.
+
+    Returns:
+        Callable: Function taking a row with PRODUCT_ROW_FIELDS.
+    """
+    storage = Product._meta.get_field("image").storage
+    origin = request.build_absolute_uri("/")[:-1] if request else ""
+    tz = timezone.get_current_timezone()
+    categories = {}
+
+    def image_url(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        if request is None:
+            return url
+        if url.startswith("/") and not url.startswith("//"):
+            return origin + url
+        return request.build_absolute_uri(url)
+
+    def category(row):
+        category_id = row["category_id"]
+        data = categories.get(category_id)
+        if data is None:
+            data = categories[category_id] = {
+                "id": str(category_id),
+                "name": row["category__name"],
+                "description": row["category__description"],
+                "created_at": _format_datetime(row["category__created_at"], tz),
+                "updated_at": _format_datetime(row["category__updated_at"], tz),
+            }
+        # Each product gets its own copy, as with a nested serializer
+        return dict(data)
+
+    def serialize(row):
+        sale_price = row["sale_price"]
+        return {
+            "id": str(row["id"]),
+            "name": row["name"],
+            "description": row["description"],
+            "image": image_url(row["image"]),
+            "price": f"{row['price']:.2f}",
+            "sale_price": None if sale_price is None else f"{sale_price:.2f}",
+            "stock": row["stock"],
+            "min_stock": row["min_stock"],
+            "category": category(row),
+            "status": row["status"],
+            "stock_status": STOCK_STATUS_LABELS[row["stock_status"]],
+            "is_on_sale": bool(row["is_on_sale"]),
+            "effective_price": f"{row['effective_price']:.2f}",
+            "created_at": _format_datetime(row["created_at"], tz),
+            "updated_at": _format_datetime(row["updated_at"], tz),
+        }
+
+    return serialize
+
+
+def serialize_product_rows(
+    rows: Iterable[Dict[str, Any]], request=None
+) -> List[Dict[str, Any]]:
+    """
+    Render product values() rows in the ProductSerializer format.
+
+    Args:
+        rows (Iterable[Dict]): Rows with PRODUCT_ROW_FIELDS.
+        request (Request): The current request, for absolute image URLs.
+
+    Returns:
+        List[Dict]: Serialized products.
+    """
+    serialize = product_row_serializer(request)
+    return [serialize(row) for row in rows]
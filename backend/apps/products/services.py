@@ -1,8 +1,14 @@
+import uuid
 from typing import Tuple, Dict, Any, Optional
 from django.core.paginator import Paginator
+from django.db import transaction
+from apps.inventory.services import StockService
 from .models import Product, Category
 from .serializers import ProductSerializer, CategorySerializer
 
+# Products written per UPDATE by bulk_update_stock
+BULK_STOCK_CHUNK_SIZE = 500
+
 
 def create_product(
     data: dict, request=None
@@ -90,19 +96,91 @@ def get_product_by_id(
         return None, "Product not found"
 
 
-def bulk_update_stock(updates: list) -> Tuple[bool, Optional[str]]:
+def bulk_update_stock(
+    updates: list, chunk_size: int = BULK_STOCK_CHUNK_SIZE
+) -> Tuple[Dict[str, Any], bool]:
     """
-    Bulk update product stock levels.
+    Bulk update product stock levels, e.g. from a stocktake.
+
+    Every row is validated before anything is written, looking all product
+    IDs up in one query. The counts are then applied in a single transaction,
+    chunk_size products per UPDATE. If any row fails nothing is applied.
 
     Args:
         updates (list): List of dicts with 'id' and 'stock' keys.
+        chunk_size (int): Number of products written per UPDATE.
 
     Returns:
-        Tuple[bool, error | None]: Success status and error if any.
+        Tuple[report, applied]: Per-row report and whether the counts were applied.
     """
-    try:
-        for update in updates:
-            Product.objects.filter(id=update["id"]).update(stock=update["stock"])
-        return True, None
-    except Exception as e:
-        return False, str(e)
+    results = []
+    counts = {}
+    rows_by_product = {}
+    for row_number, update in enumerate(updates, start=1):
+        result = {"row": row_number}
+        results.append(result)
+        if not isinstance(update, dict):
+            result.update(status="failed", error="Expected an object with id and stock")
+            continue
+
+        result["id"] = update.get("id")
+        try:
+            product_id = uuid.UUID(str(update.get("id")))
+        except ValueError:
+            result.update(status="failed", error="Invalid product ID")
+            continue
+        try:
+            stock = int(str(update.get("stock")).strip())
+        except ValueError:
+            result.update(status="failed", error="Stock must be a whole number")
+            continue
+        if stock < 0:
+            result.update(status="failed", error="Stock cannot be negative")
+            continue
+        if product_id in counts:
+            result.update(
+                status="failed",
+                error=f"Duplicate of row {rows_by_product[product_id]['row']}",
+            )
+            continue
+
+        counts[product_id] = stock
+        rows_by_product[product_id] = result
+
+    with transaction.atomic():
+        products = (
+            Product.objects.select_for_update()
+            .only("id", "stock")
+            .in_bulk(list(counts))
+        )
+        for product_id, result in rows_by_product.items():
+            if product_id not in products:
+                result.update(status="failed", error="Product not found")
+
+        failed = sum(1 for result in results if result.get("status") == "failed")
+        applied = not failed
+        if applied:
+            previous = StockService.set_stocks(
+                products, counts, note="Bulk stock update", chunk_size=chunk_size
+            )
+            for product_id, result in rows_by_product.items():
+                result.update(
+                    status=(
+                        "updated"
+                        if previous[product_id] != counts[product_id]
+                        else "unchanged"
+                    ),
+                    previous_stock=previous[product_id],
+                    stock=counts[product_id],
+                )
+
+    report = {
+        "total": len(results),
+        "updated": sum(1 for result in results if result.get("status") == "updated"),
+        "unchanged": sum(
+            1 for result in results if result.get("status") == "unchanged"
+        ),
+        "failed": failed,
+        "results": results,
+    }
+    return report, applied
@@ -1,37 +1,103 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Product
+from store_backend.cache import mark_changed
+from .catalogue import (
+    CATALOGUE_FIELDS,
+    pos_catalogue,
+    record_category_change,
+    record_product_change,
+    record_product_deletion,
+)
+from .models import Category, Product
+from .search import get_search_backend
 
 
 @receiver(post_save, sender=Product)
 def create_or_sync_inventory(sender, instance: Product, created, **kwargs):
-    """Ensure an Inventory record exists and stays in sync with product stock.
+    """Ensure an Inventory record exists for every product.
 
-    When a product is created it should appear in inventory automatically.
-    Also sync stock/min_stock on subsequent saves.
+    When a product is created it should appear in inventory automatically,
+    with the stock it was created with recorded as its opening balance.
+    On later saves only min_stock is synced; stock itself lives on the
+    product and changes through the StockService ledger.
     """
-    try:
-        from apps.inventory.models import Inventory
-
-        inventory, inv_created = Inventory.objects.get_or_create(
-            product=instance,
-            defaults={
-                "stock": instance.stock,
-                "min_stock": getattr(instance, "min_stock", 1) or 1,
-            },
+    if kwargs.get("raw"):
+        return
+
+    from apps.inventory.models import Inventory
+    from apps.inventory.services import StockService
+
+    min_stock = getattr(instance, "min_stock", 1) or 1
+    if created:
+        Inventory.objects.create(product=instance, min_stock=min_stock)
+        StockService.record_opening(instance)
+    elif not kwargs.get("update_fields") or "min_stock" in kwargs["update_fields"]:
+        Inventory.objects.filter(product=instance).exclude(min_stock=min_stock).update(
+            min_stock=min_stock, updated_at=Now()
         )
-        if not inv_created:
-            updated = False
-            if inventory.stock != instance.stock:
-                inventory.stock = instance.stock
-                updated = True
-            if (
-                getattr(instance, "min_stock", None) is not None
-                and inventory.min_stock != instance.min_stock
-            ):
-                inventory.min_stock = instance.min_stock
-                updated = True
-            if updated:
-                inventory.save(update_fields=["stock", "min_stock"])
-    except Exception as e:
-        print("Inventory sync signal error:", e)
+
+
+@receiver(post_save, sender=Product)
+def index_product_for_search(sender, instance: Product, **kwargs):
+    """Refresh the product in this process's search index once committed."""
+    if kwargs.get("raw"):
+        return
+    backend = get_search_backend()
+    transaction.on_commit(lambda: backend.index_product(instance))
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search(sender, instance: Product, **kwargs):
+    """Drop a deleted product from this process's search index."""
+    backend = get_search_backend()
+    product_id = instance.pk
+    transaction.on_commit(lambda: backend.remove_product(product_id))
+
+
+@receiver(post_save, sender=Category)
+def index_category_for_search(sender, instance: Category, **kwargs):
+    """Re-index a category's name for its products' search matches."""
+    if kwargs.get("raw"):
+        return
+    backend = get_search_backend()
+    transaction.on_commit(lambda: backend.index_category(instance))
+
+
+@receiver(post_save, sender=Product)
+def bump_catalogue_for_product(sender, instance: Product, **kwargs):
+    """Give a product the next catalogue version when till-visible fields change."""
+    if kwargs.get("raw"):
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and not CATALOGUE_FIELDS & set(update_fields):
+        return
+    record_product_change(instance)
+    transaction.on_commit(pos_catalogue.invalidate)
+
+
+@receiver(post_delete, sender=Product)
+def bump_catalogue_for_deletion(sender, instance: Product, **kwargs):
+    """Leave a catalogue tombstone for a deleted product."""
+    record_product_deletion(instance.pk)
+    transaction.on_commit(pos_catalogue.invalidate)
+
+
+@receiver(post_save, sender=Category)
+def bump_catalogue_for_category(sender, instance: Category, created, **kwargs):
+    """Give a renamed category's products the next catalogue version."""
+    if kwargs.get("raw") or created:
+        return
+    record_category_change(instance)
+    transaction.on_commit(pos_catalogue.invalidate)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_product_responses(sender, **kwargs):
+    """Make cached dashboard responses miss after product or category writes."""
+    if not kwargs.get("raw"):
+        mark_changed("products")
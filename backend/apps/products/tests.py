@@ -3,13 +3,25 @@ Comprehensive test suite for the Products app.
 Tests API endpoints, models, serializers, and business logic.
 """
 
+import json
 from decimal import Decimal
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework import status
+from apps.inventory.services import StockService
+from .catalogue import get_catalogue_version, pos_catalogue
+from .filters import ProductFilter
 from .models import Product, Category
+from .search import get_search_backend
 from .serializers import ProductSerializer, CategorySerializer
+from .serializers import serialize_product_rows
+from .selectors import get_product_rows
 
 
 class CategoryModelTest(TestCase):
@@ -236,7 +248,7 @@ class ProductAPITest(APITestCase):
         Product.objects.create(
             name="Low Stock Item",
             price=Decimal("19.99"),
-            stock=5,  # Low stock
+            stock=3,  # Low stock
             min_stock=3,
             category=self.category,
         )
@@ -302,3 +314,734 @@ class CategoryAPITest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
+
+
+class BulkStockUpdateAPITest(APITestCase):
+    """Test cases for the bulk stock update endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.category = Category.objects.create(name="Footwear")
+        self.products = [
+            Product.objects.create(
+                name=f"Trainer {number}",
+                price=Decimal("59.99"),
+                stock=10,
+                category=self.category,
+            )
+            for number in range(3)
+        ]
+        self.url = reverse("product-bulk-update-stock")
+
+    def stock_levels(self):
+        return [Product.objects.get(pk=product.pk).stock for product in self.products]
+
+    def test_json_updates_report_and_ledger(self):
+        """Test JSON counts are applied and reported row by row."""
+        updates = [
+            {"id": str(self.products[0].id), "stock": 4},
+            {"id": str(self.products[1].id), "stock": "10"},
+        ]
+        response = self.client.post(self.url, {"updates": updates}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["updated"], 1)
+        self.assertEqual(response.data["unchanged"], 1)
+        self.assertEqual(response.data["failed"], 0)
+        self.assertEqual(
+            [
+                (row["status"], row["previous_stock"], row["stock"])
+                for row in response.data["results"]
+            ],
+            [("updated", 10, 4), ("unchanged", 10, 10)],
+        )
+        self.assertEqual(self.stock_levels(), [4, 10, 10])
+        self.assertEqual(
+            list(
+                self.products[0]
+                .stock_movements.filter(kind="adjustment")
+                .values_list("quantity", flat=True)
+            ),
+            [-6],
+        )
+        self.assertFalse(
+            self.products[1].stock_movements.filter(kind="adjustment").exists()
+        )
+
+    def test_csv_body(self):
+        """Test a raw text/csv body is accepted."""
+        body = "id,stock,name\n" + "".join(
+            f"{product.id},7,{product.name}\n" for product in self.products
+        )
+        response = self.client.post(self.url, body, content_type="text/csv")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["updated"], 3)
+        self.assertEqual(self.stock_levels(), [7, 7, 7])
+
+    def test_csv_upload(self):
+        """Test a multipart CSV upload is accepted."""
+        upload = SimpleUploadedFile(
+            "stocktake.csv",
+            f"﻿id,stock\n{self.products[2].id},0\n".encode("utf-8"),
+            content_type="text/csv",
+        )
+        response = self.client.post(self.url, {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stock_levels(), [10, 10, 0])
+
+        upload = SimpleUploadedFile("stocktake.csv", b"sku,count\nA,1\n")
+        response = self.client.post(self.url, {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_rows_apply_nothing(self):
+        """Test any failed row leaves every product unchanged."""
+        updates = [
+            {"id": str(self.products[0].id), "stock": 1},
+            {"id": "not-a-uuid", "stock": 1},
+            {"id": str(self.products[1].id), "stock": -2},
+            {"id": str(self.products[2].id), "stock": "many"},
+            {"id": str(self.products[0].id), "stock": 2},
+            {"id": "00000000-0000-0000-0000-000000000000", "stock": 1},
+        ]
+        response = self.client.post(self.url, {"updates": updates}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["failed"], 5)
+        self.assertEqual(
+            [row.get("error") for row in response.data["results"]],
+            [
+                None,
+                "Invalid product ID",
+                "Stock cannot be negative",
+                "Stock must be a whole number",
+                "Duplicate of row 1",
+                "Product not found",
+            ],
+        )
+        self.assertEqual(self.stock_levels(), [10, 10, 10])
+
+        response = self.client.post(self.url, {"updates": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        """Test 150 rows cost as many queries as 10."""
+        # Kept under SQLite's 999 parameter limit, past which bulk_create
+        # splits the ledger insert into batches
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name=f"Sandal {number}",
+                    price=Decimal("19.99"),
+                    stock=1,
+                    category=self.category,
+                )
+                for number in range(150)
+            ]
+        )
+        ids = list(
+            Product.objects.filter(name__startswith="Sandal").values_list(
+                "id", flat=True
+            )
+        )
+
+        def post(count, stock):
+            updates = [{"id": str(pk), "stock": stock} for pk in ids[:count]]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    self.url, {"updates": updates}, format="json"
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries.captured_queries)
+
+        self.assertEqual(post(150, 5), post(10, 3))
+
+
+class ProductListPaginationTest(APITestCase):
+    """Test cases for cursor and approximate-count product pages."""
+
+    def setUp(self):
+        """Set up test data."""
+        category = Category.objects.create(name="Outerwear")
+        for number in range(12):
+            # Duplicate names are ordered by id within the cursor
+            Product.objects.create(
+                name=f"Coat {number // 3}",
+                price=Decimal("80.00"),
+                stock=number,
+                min_stock=10,
+                category=category,
+            )
+        self.url = reverse("product-list")
+
+    def test_cursor_pages(self):
+        """Test cursor pages walk products by name then id."""
+        seen = []
+        params = {"pagination": "cursor", "page_size": 5}
+        while True:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            seen.extend(row["id"] for row in response.data["results"])
+            if not response.data["has_next"]:
+                break
+            params["cursor"] = response.data["next_cursor"]
+
+        expected = [
+            str(pk)
+            for pk in Product.objects.order_by("name", "id").values_list(
+                "id", flat=True
+            )
+        ]
+        self.assertEqual(seen, expected)
+
+    def test_approximate_count(self):
+        """Test count=approximate keeps the default response shape."""
+        response = self.client.get(
+            self.url,
+            {"count": "approximate", "page_size": 5, "stock_status": "low_stock"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(response.data),
+            {
+                "results",
+                "count",
+                "num_pages",
+                "current_page",
+                "has_next",
+                "has_previous",
+                "count_is_approximate",
+            },
+        )
+        self.assertEqual(response.data["count"], 10)
+        self.assertTrue(response.data["has_next"])
+
+        response = self.client.get(
+            self.url, {"count": "approximate", "page_size": 5, "page": 9}
+        )
+        self.assertEqual(response.data["current_page"], 3)
+        self.assertFalse(response.data["has_next"])
+        self.assertEqual(response.data["count"], 12)
+
+
+@override_settings(PRODUCT_SEARCH_BACKEND="memory")
+class ProductSearchTest(APITestCase):
+    """Test cases for the product search backends."""
+
+    def setUp(self):
+        """Set up test data and a fresh in-memory index."""
+        self.tops = Category.objects.create(name="Tops")
+        self.bottoms = Category.objects.create(name="Bottoms")
+        self.products = {
+            name: Product.objects.create(
+                name=name,
+                description=description,
+                price=Decimal("20.00"),
+                category=category,
+            )
+            for name, description, category in [
+                ("Linen Shirt", "Breathable summer shirt", self.tops),
+                ("Shirt Dress", "Cotton dress", self.tops),
+                ("Oxford Shirt", "Button-down cotton", self.tops),
+                ("Cargo Shorts", "Cotton twill with pockets", self.bottoms),
+            ]
+        }
+        self.backend = get_search_backend("memory")
+        self.backend.rebuild()
+
+    def names(self, products):
+        return [product.name for product in products]
+
+    def test_memory_backend_ranking(self):
+        """Test whole words rank above prefixes, categories and descriptions."""
+        self.assertEqual(
+            self.names(self.backend.top(Product.objects.all(), "shirt", 10)),
+            ["Linen Shirt", "Oxford Shirt", "Shirt Dress"],
+        )
+        # Typed prefixes match name words; every term has to match
+        self.assertEqual(
+            self.names(self.backend.top(Product.objects.all(), "sh cotton", 10)),
+            ["Cargo Shorts", "Oxford Shirt", "Shirt Dress"],
+        )
+        self.assertEqual(
+            self.names(self.backend.top(Product.objects.all(), "botto", 10)),
+            ["Cargo Shorts"],
+        )
+        self.assertEqual(self.backend.top(Product.objects.all(), "??", 10), [])
+
+    def test_backends_agree_with_icontains(self):
+        """Test every backend finds what icontains finds for whole words."""
+        database = get_search_backend("database")
+        for query in ("shirt", "cotton", "tops", "dress"):
+            expected = set(database.filter(Product.objects.all(), query))
+            found = set(self.backend.filter(Product.objects.all(), query))
+            self.assertEqual(found, expected, query)
+
+    def test_filter_keeps_every_match(self):
+        """Test filtered searches see matches ranked below the top ones."""
+        Product.objects.bulk_create(
+            Product(
+                name=f"Cotton Tee {number}", price=Decimal("10.00"), category=self.tops
+            )
+            for number in range(50)
+        )
+        self.backend.rebuild()
+        found = self.backend.filter(Product.objects.all(), "cotton")
+        self.assertEqual(found.count(), 53)
+        # Only a description word matches, so it ranks below every tee
+        self.assertEqual(
+            self.names(found.filter(category=self.bottoms)), ["Cargo Shorts"]
+        )
+        ranked = found.order_by("-search_rank", "name")
+        self.assertEqual(
+            [product.search_rank for product in ranked[48:]], [4, 4, 1, 1, 1]
+        )
+        self.assertEqual(len(self.backend.search("cotton", limit=10)), 10)
+
+    def test_signals_keep_index_fresh(self):
+        """Test saves, renames and deletes reach the index on commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                name="Denim Jacket", price=Decimal("60.00"), category=self.tops
+            )
+        self.assertEqual(self.backend.search("jack"), [product.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = "Denim Coat"
+            product.save()
+            self.tops.name = "Outerwear"
+            self.tops.save()
+        self.assertEqual(self.backend.search("jack"), [])
+        self.assertIn(product.id, self.backend.search("outer"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(self.backend.search("denim"), [])
+
+    def test_refresh_picks_up_other_workers(self):
+        """Test the periodic refresh indexes rows changed by bulk updates."""
+        Product.objects.filter(name="Cargo Shorts").update(
+            name="Cargo Trousers", updated_at=timezone.now()
+        )
+        with override_settings(PRODUCT_SEARCH_REFRESH_SECONDS=0):
+            self.assertEqual(
+                self.backend.search("trousers"), [self.products["Cargo Shorts"].id]
+            )
+
+    def test_search_endpoints(self):
+        """Test the search action and list filter use the backend ranking."""
+        response = self.client.get(reverse("product-search"), {"q": "shirt"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row["name"] for row in response.data["results"]],
+            ["Linen Shirt", "Oxford Shirt", "Shirt Dress"],
+        )
+
+        response = self.client.get(reverse("product-list"), {"search": "cotton"})
+        self.assertEqual(
+            [row["name"] for row in response.data["results"]],
+            ["Cargo Shorts", "Oxford Shirt", "Shirt Dress"],
+        )
+
+
+@override_settings(PRODUCT_SEARCH_BACKEND="memory")
+class ProductRowSerializerTest(APITestCase):
+    """Test cases for the fast values() path of the product list endpoints."""
+
+    def setUp(self):
+        """Set up products covering every branch of the representation."""
+        self.category = Category.objects.create(name="Tops", description="Shirts")
+        self.shirt = Product.objects.create(
+            name="Linen Shirt",
+            description="Breathable",
+            price=Decimal("45.50"),
+            sale_price=Decimal("39.90"),
+            stock=25,
+            category=self.category,
+        )
+        Product.objects.filter(pk=self.shirt.pk).update(image="products/linen.jpg")
+        self.tee = Product.objects.create(
+            name="Plain Tee",
+            price=Decimal("12"),
+            stock=4,
+            min_stock=5,
+            category=self.category,
+        )
+        self.vest = Product.objects.create(
+            name="Vest Shirt",
+            price=Decimal("8.00"),
+            sale_price=Decimal("0"),
+            stock=0,
+            category=self.category,
+        )
+        get_search_backend("memory").rebuild()
+
+    def expected(self, products):
+        """ProductSerializer output for products, as the client sees it."""
+        request = APIRequestFactory().get("/")
+        data = ProductSerializer(
+            Product.objects.filter(pk__in=[product.pk for product in products])
+            .select_related("category")
+            .order_by("name"),
+            many=True,
+            context={"request": request},
+        ).data
+        return json.loads(JSONRenderer().render(data))
+
+    def test_rows_match_product_serializer(self):
+        """Test the row serializer reproduces ProductSerializer exactly."""
+        request = APIRequestFactory().get("/")
+        rows = get_product_rows(Product.objects.order_by("name"))
+        data = json.loads(JSONRenderer().render(serialize_product_rows(rows, request)))
+        self.assertEqual(data, self.expected([self.shirt, self.tee, self.vest]))
+        self.assertEqual(data[0]["image"], "http://testserver/media/products/linen.jpg")
+        self.assertEqual(data[0]["effective_price"], "39.90")
+        self.assertEqual(data[1]["price"], "12.00")
+
+    def test_endpoints_keep_their_shape(self):
+        """Test every list endpoint returns the ProductSerializer format."""
+        everything = self.expected([self.shirt, self.tee, self.vest])
+
+        response = self.client.get(reverse("product-list"))
+        self.assertEqual(response.json()["results"], everything)
+        response = self.client.get(
+            reverse("product-list"), {"pagination": "cursor", "page_size": 2}
+        )
+        self.assertEqual(response.json()["results"], everything[:2])
+        response = self.client.get(
+            reverse("product-list"),
+            {"pagination": "cursor", "cursor": response.json()["next_cursor"]},
+        )
+        self.assertEqual(response.json()["results"], everything[2:])
+
+        response = self.client.get(reverse("product-search"), {"q": "shirt"})
+        self.assertEqual(
+            response.json()["results"], self.expected([self.shirt, self.vest])
+        )
+        response = self.client.get(reverse("product-low-stock"))
+        self.assertEqual(response.json(), self.expected([self.tee]))
+        response = self.client.get(reverse("product-out-of-stock"))
+        self.assertEqual(response.json(), self.expected([self.vest]))
+        response = self.client.get(
+            reverse("category-products", kwargs={"pk": self.category.pk})
+        )
+        self.assertEqual(response.json(), everything)
+
+    def test_one_query_per_list(self):
+        """Test the category products list no longer queries per product."""
+        url = reverse("category-products", kwargs={"pk": self.category.pk})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        # The category lookup and the product rows
+        self.assertEqual(len(queries), 2)
+
+
+class ProductQuerySetTest(APITestCase):
+    """Test cases for the effective price and stock status annotations."""
+
+    def setUp(self):
+        """Set up products on and off sale at every stock level."""
+        self.category = Category.objects.create(name="Tops")
+        for name, price, sale_price, stock in [
+            ("Blazer", "80.00", "35.00", 30),
+            ("Chinos", "50.00", None, 10),
+            ("Denim", "40.00", "0.00", 1),
+            ("Parka", "120.00", "99.00", 0),
+            ("Scarf", "15.00", None, 11),
+        ]:
+            Product.objects.create(
+                name=name,
+                price=Decimal(price),
+                sale_price=None if sale_price is None else Decimal(sale_price),
+                stock=stock,
+                min_stock=10,
+                category=self.category,
+            )
+
+    def test_annotations_match_model(self):
+        """Test the SQL values agree with the model's own properties."""
+        annotated = Product.objects.with_effective_price().with_stock_status()
+        for row in annotated.values(
+            "pk", "effective_price", "is_on_sale", "stock_status"
+        ):
+            product = Product.objects.get(pk=row["pk"])
+            self.assertEqual(row["effective_price"], product.effective_price)
+            self.assertEqual(bool(row["is_on_sale"]), product.is_on_sale)
+            self.assertEqual(row["stock_status"], product.stock_status)
+
+        self.assertEqual(
+            dict(annotated.values_list("name", "stock_status")),
+            {
+                "Blazer": "in_stock",
+                "Chinos": "low_stock",
+                "Denim": "low_stock",
+                "Parka": "out_of_stock",
+                "Scarf": "in_stock",
+            },
+        )
+
+    def test_instances_use_annotations(self):
+        """Test annotated instances read the SQL values until saved."""
+        product = (
+            Product.objects.with_effective_price()
+            .with_stock_status()
+            .get(name="Blazer")
+        )
+        product.sale_price = None
+        product.stock = 0
+        self.assertEqual(product.effective_price, Decimal("35.00"))
+        self.assertTrue(product.is_on_sale)
+        self.assertEqual(product.stock_status, "in_stock")
+
+        product.save()
+        self.assertEqual(product.effective_price, Decimal("80.00"))
+        self.assertFalse(product.is_on_sale)
+        self.assertEqual(product.stock_status, "out_of_stock")
+
+        product = Product.objects.with_effective_price().get(name="Parka")
+        Product.objects.filter(pk=product.pk).update(sale_price=None)
+        product.refresh_from_db()
+        self.assertEqual(product.effective_price, Decimal("120.00"))
+
+    def test_stock_status_filter_uses_stock_ranges(self):
+        """Test stock status filters are plain ranges, not the CASE expression."""
+        for stock_status, names in [
+            ("in_stock", ["Blazer", "Scarf"]),
+            ("low_stock", ["Chinos", "Denim"]),
+            ("out_of_stock", ["Parka"]),
+        ]:
+            queryset = Product.objects.filter_stock_status(stock_status)
+            self.assertNotIn("CASE", str(queryset.query))
+            self.assertEqual(
+                list(queryset.order_by("name").values_list("name", flat=True)),
+                names,
+            )
+
+    def test_list_ordering_by_effective_price(self):
+        """Test the product list sorts by effective price in the database."""
+        response = self.client.get(
+            reverse("product-list"), {"ordering": "effective_price"}
+        )
+        self.assertEqual(
+            [product["name"] for product in response.data["results"]],
+            ["Scarf", "Blazer", "Denim", "Chinos", "Parka"],
+        )
+
+    def test_filter_on_sale_by_effective_price(self):
+        """Test ProductFilter combines on_sale with effective price ordering."""
+        products = ProductFilter(
+            {"on_sale": "true", "ordering": "-effective_price"},
+            queryset=Product.objects.all(),
+        ).qs
+        self.assertEqual(
+            [(product.name, product.effective_price) for product in products],
+            [("Parka", Decimal("99.00")), ("Blazer", Decimal("35.00"))],
+        )
+        products = ProductFilter(
+            {"stock_status": "low_stock", "ordering": "effective_price"},
+            queryset=Product.objects.all(),
+        ).qs
+        self.assertEqual([product.name for product in products], ["Denim", "Chinos"])
+
+
+class ConditionalListTest(APITestCase):
+    """Test cases for ETags and 304 responses on the product and category lists."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.category = Category.objects.create(name="Tops")
+        self.shirt = Product.objects.create(
+            name="Linen Shirt", price=Decimal("45.00"), stock=8, category=self.category
+        )
+        self.tee = Product.objects.create(
+            name="Plain Tee", price=Decimal("12.00"), stock=30, category=self.category
+        )
+
+    def revalidate(self, url, etag, params=None):
+        """GET url with If-None-Match, returning the response and query count."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        return response, len(queries)
+
+    def test_not_modified_costs_one_query(self):
+        """Test a matching If-None-Match gets an empty 304 from one query."""
+        url = reverse("product-list")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn("Last-Modified", response)
+
+        response, queries = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+        self.assertLessEqual(queries, 1)
+
+        # Weak forms of the tag (e.g. after compression) match as well
+        response, _ = self.revalidate(url, f"W/{etag}")
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_changes_and_params_change_the_etag(self):
+        """Test edits, stock changes, deletions and filters all give new tags."""
+        url = reverse("product-list")
+        etag = self.client.get(url)["ETag"]
+        self.assertNotEqual(self.client.get(url, {"page_size": 1})["ETag"], etag)
+
+        StockService.set_stock(self.shirt.id, 2)
+        response, _ = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["stock"], 2)
+        etag = response["ETag"]
+
+        self.tee.delete()
+        response, _ = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        etag = response["ETag"]
+
+        self.category.name = "Shirts"
+        self.category.save()
+        response, _ = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_category_list(self):
+        """Test the category list revalidates until a category changes."""
+        # The products app's category list, as used by the frontend
+        url = "/api/products/categories/"
+        etag = self.client.get(url)["ETag"]
+        response, queries = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertLessEqual(queries, 1)
+
+        Category.objects.create(name="Bottoms")
+        response, _ = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+
+@override_settings(POS_CATALOGUE_CHECK_SECONDS=0)
+class POSCatalogueTest(APITestCase):
+    """Test cases for the catalogue version feed and the POS cache."""
+
+    def setUp(self):
+        """Set up test data and an empty catalogue cache."""
+        self.category = Category.objects.create(name="Tops")
+        self.shirt = Product.objects.create(
+            name="Linen Shirt",
+            price=Decimal("30.00"),
+            category=self.category,
+            sku="TOP-001",
+        )
+        self.tee = Product.objects.create(
+            name="Plain Tee",
+            price=Decimal("15.00"),
+            sale_price=Decimal("12.00"),
+            category=self.category,
+            sku="TOP-002",
+        )
+        pos_catalogue.reset()
+
+    def test_changes_bump_version(self):
+        """Test catalogue changes stamp products and stock changes do not."""
+        version = get_catalogue_version()
+        self.tee.refresh_from_db()
+        self.assertEqual(self.tee.catalogue_version, version)
+
+        self.tee.price = Decimal("16.00")
+        self.tee.save()
+        self.assertEqual(get_catalogue_version(), version + 1)
+        self.tee.refresh_from_db()
+        self.assertEqual(self.tee.catalogue_version, version + 1)
+
+        self.tee.stock = 5
+        self.tee.save(update_fields=["stock"])
+        self.assertEqual(get_catalogue_version(), version + 1)
+
+        self.category.name = "Shirts"
+        self.category.save()
+        self.assertEqual(
+            set(Product.objects.values_list("catalogue_version", flat=True)),
+            {version + 2},
+        )
+
+    def test_delta_endpoint(self):
+        """Test the feed returns everything, then only changes since a version."""
+        url = reverse("product-catalogue")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["full"])
+        self.assertEqual(
+            {row["sku"] for row in response.data["products"]}, {"TOP-001", "TOP-002"}
+        )
+        tee = next(row for row in response.data["products"] if row["sku"] == "TOP-002")
+        self.assertEqual(tee["effective_price"], "12.00")
+        version = response.data["version"]
+
+        response = self.client.get(url, {"since": version})
+        self.assertEqual(response.data["products"], [])
+        self.assertEqual(response.data["deleted"], [])
+
+        self.shirt.name = "Linen Overshirt"
+        self.shirt.save()
+        tee_id = str(self.tee.id)
+        self.tee.delete()
+
+        response = self.client.get(url, {"since": version})
+        self.assertFalse(response.data["full"])
+        self.assertEqual(
+            [row["name"] for row in response.data["products"]], ["Linen Overshirt"]
+        )
+        self.assertEqual(response.data["deleted"], [tee_id])
+        self.assertEqual(response.data["version"], version + 2)
+
+        response = self.client.get(url, {"since": "latest"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cache_lookups(self):
+        """Test SKU, id and prefix lookups against the cache."""
+        self.assertEqual(pos_catalogue.get_by_sku("top-001").id, self.shirt.id)
+        self.assertEqual(pos_catalogue.lookup(str(self.tee.id)).sku, "TOP-002")
+        self.assertIsNone(pos_catalogue.lookup("NOPE"))
+        self.assertEqual(
+            [record.sku for record in pos_catalogue.prefix_search("top-")],
+            ["TOP-001", "TOP-002"],
+        )
+        self.assertEqual(
+            [record.name for record in pos_catalogue.prefix_search("pla")],
+            ["Plain Tee"],
+        )
+
+    def test_cache_applies_changes(self):
+        """Test the cache picks up edits and deletions after it has loaded."""
+        version = pos_catalogue.get_by_sku("TOP-001") and pos_catalogue.version
+
+        self.shirt.sku = "TOP-010"
+        self.shirt.name = "Oxford Shirt"
+        self.shirt.save()
+        self.tee.delete()
+
+        self.assertIsNone(pos_catalogue.get_by_sku("TOP-001"))
+        self.assertEqual(pos_catalogue.get_by_sku("TOP-010").name, "Oxford Shirt")
+        self.assertIsNone(pos_catalogue.get(self.tee.id))
+        self.assertEqual(pos_catalogue.prefix_search("pla"), [])
+        self.assertEqual(
+            [record.name for record in pos_catalogue.prefix_search("ox")],
+            ["Oxford Shirt"],
+        )
+        self.assertEqual(pos_catalogue.version, version + 2)
+
+    def test_scan_endpoint(self):
+        """Test the scan action resolves codes and name prefixes."""
+        url = reverse("product-scan")
+        response = self.client.get(url, {"code": "TOP-002"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["name"], "Plain Tee")
+
+        response = self.client.get(url, {"code": "MISSING"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(url, {"q": "lin"})
+        self.assertEqual([row["sku"] for row in response.data["results"]], ["TOP-001"])
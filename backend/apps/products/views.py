@@ -1,12 +1,17 @@
 from django.shortcuts import render
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.request import Request
+from store_backend.conditional import conditional_list
+from store_backend.pagination import paginate_list
+from .catalogue import get_catalogue_changes, pos_catalogue
 from .models import Product, Category
-from .serializers import ProductSerializer, CategorySerializer
-from .selectors import get_filtered_products
+from .parsers import StockCSVParser, read_stock_csv
+from .search import top_products
+from .serializers import CategorySerializer, serialize_product_rows
+from .selectors import get_filtered_products, get_product_rows
 from .services import (
     create_product,
     update_product,
@@ -22,6 +27,7 @@ class ProductViewSet(viewsets.ViewSet):
     Provides CRUD operations and filtering capabilities.
     """
 
+    @conditional_list(Product, Category)
     def list(self, request: Request) -> Response:
         """
         List all products with filtering, searching, and pagination.
@@ -32,9 +38,14 @@ class ProductViewSet(viewsets.ViewSet):
         - stock_status: in_stock, low_stock, out_of_stock
         - min_price: Minimum price
         - max_price: Maximum price
-        - ordering: Field to order by
+        - ordering: Field to order by (including effective_price)
         - page: Page number
         - page_size: Items per page (default: 10)
+        - count: "approximate" to estimate the count instead of counting
+        - pagination: "cursor" for keyset pages ordered by name
+        - cursor: next_cursor of the previous page (cursor pagination)
+
+        Responses carry an ETag; a matching If-None-Match gets a 304.
         """
         # Get query parameters
         search = request.query_params.get("search", None)
@@ -43,8 +54,6 @@ class ProductViewSet(viewsets.ViewSet):
         min_price = request.query_params.get("min_price", None)
         max_price = request.query_params.get("max_price", None)
         ordering = request.query_params.get("ordering", None)
-        page = request.query_params.get("page", 1)
-        page_size = int(request.query_params.get("page_size", 10))
 
         # Convert price parameters to float if provided
         try:
@@ -63,29 +72,13 @@ class ProductViewSet(viewsets.ViewSet):
             ordering=ordering,
         )
 
-        # Pagination
-        paginator = Paginator(products, page_size)
-        try:
-            products_page = paginator.page(page)
-        except PageNotAnInteger:
-            products_page = paginator.page(1)
-        except EmptyPage:
-            products_page = paginator.page(paginator.num_pages)
-
-        # Serialize data
-        serializer = ProductSerializer(
-            products_page, many=True, context={"request": request}
+        # Pagination over plain rows, rendered without model instances
+        products_page, pagination = paginate_list(
+            request, get_product_rows(products), ("name", "id")
         )
 
         return Response(
-            {
-                "results": serializer.data,
-                "count": paginator.count,
-                "num_pages": paginator.num_pages,
-                "current_page": products_page.number,
-                "has_next": products_page.has_next(),
-                "has_previous": products_page.has_previous(),
-            },
+            {"results": serialize_product_rows(products_page, request), **pagination},
             status=status.HTTP_200_OK,
         )
 
@@ -139,41 +132,54 @@ class ProductViewSet(viewsets.ViewSet):
     @action(detail=False, methods=["get"])
     def low_stock(self, request: Request) -> Response:
         """Get products with low stock levels."""
-        products = Product.objects.filter(stock__lte=10, stock__gt=0).select_related(
-            "category"
-        )
-        serializer = ProductSerializer(
-            products, many=True, context={"request": request}
+        products = Product.objects.filter_stock_status("low_stock")
+        return Response(
+            serialize_product_rows(get_product_rows(products), request),
+            status=status.HTTP_200_OK,
         )
-        return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["get"])
     def out_of_stock(self, request: Request) -> Response:
         """Get products that are out of stock."""
-        products = Product.objects.filter(stock=0).select_related("category")
-        serializer = ProductSerializer(
-            products, many=True, context={"request": request}
+        products = Product.objects.filter_stock_status("out_of_stock")
+        return Response(
+            serialize_product_rows(get_product_rows(products), request),
+            status=status.HTTP_200_OK,
         )
-        return Response(serializer.data, status=status.HTTP_200_OK)
 
-    @action(detail=False, methods=["post"])
+    @action(
+        detail=False,
+        methods=["post"],
+        parser_classes=[JSONParser, StockCSVParser, MultiPartParser],
+    )
     def bulk_update_stock(self, request: Request) -> Response:
-        """Bulk update stock levels for multiple products."""
-        updates = request.data.get("updates", [])
+        """
+        Bulk update stock levels for multiple products.
 
-        if not updates:
+        Accepts JSON {"updates": [{"id": ..., "stock": ...}]}, a text/csv body
+        or a multipart CSV upload in 'file'; CSV needs 'id' and 'stock'
+        columns. Responds with a per-row report. Nothing is applied unless
+        every row is valid.
+        """
+        upload = request.FILES.get("file")
+        if upload is not None:
+            updates = read_stock_csv(upload)
+        else:
+            updates = request.data.get("updates", [])
+
+        if not updates or not isinstance(updates, list):
             return Response(
                 {"error": "No updates provided"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        success, error = bulk_update_stock(updates)
+        report, applied = bulk_update_stock(updates)
 
-        if not success:
-            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        if not applied:
+            report["error"] = "No stock was updated; fix the failed rows and retry"
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(
-            {"message": "Stock levels updated successfully"}, status=status.HTTP_200_OK
-        )
+        report["message"] = "Stock levels updated successfully"
+        return Response(report, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=["get"])
     def search(self, request: Request) -> Response:
@@ -183,12 +189,76 @@ class ProductViewSet(viewsets.ViewSet):
         if not query:
             return Response({"results": []}, status=status.HTTP_200_OK)
 
-        products = get_filtered_products(search=query)[:20]  # Limit to 20 results
-        serializer = ProductSerializer(
-            products, many=True, context={"request": request}
+        # Rank on ids only, then read the rows of the matches in rank order
+        matches = top_products(Product.objects.only("id"), query, 20)
+        ranked = [product.id for product in matches]
+        rows = {
+            row["id"]: row
+            for row in get_product_rows(Product.objects.filter(id__in=ranked))
+        }
+        results = serialize_product_rows(
+            (rows[pk] for pk in ranked if pk in rows), request
         )
 
-        return Response({"results": serializer.data}, status=status.HTTP_200_OK)
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"])
+    def catalogue(self, request: Request) -> Response:
+        """
+        POS catalogue feed.
+
+        Without 'since' every product is returned (full=true). With
+        since=<version> only products changed after that version are
+        returned, plus the ids of products deleted since. Pass the returned
+        version as 'since' on the next call.
+        """
+        since = request.query_params.get("since")
+        if since is not None:
+            try:
+                since = int(since)
+                if since < 0:
+                    raise ValueError
+            except ValueError:
+                return Response(
+                    {"error": "since must be a non-negative integer"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        changes = get_catalogue_changes(since)
+        return Response(
+            {
+                "version": changes["version"],
+                "full": changes["full"],
+                "products": [record.as_dict() for record in changes["products"]],
+                "deleted": [str(product_id) for product_id in changes["deleted"]],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["get"])
+    def scan(self, request: Request) -> Response:
+        """
+        Till lookup served from the in-process catalogue cache.
+
+        Query Parameters:
+        - code: Scanned SKU or product ID; returns that product or 404
+        - q: Start of a product name or SKU; returns up to 20 matches
+        """
+        code = request.query_params.get("code", "").strip()
+        if code:
+            record = pos_catalogue.lookup(code)
+            if record is None:
+                return Response(
+                    {"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(record.as_dict(), status=status.HTTP_200_OK)
+
+        query = request.query_params.get("q", "")
+        records = pos_catalogue.prefix_search(query)
+        return Response(
+            {"results": [record.as_dict() for record in records]},
+            status=status.HTTP_200_OK,
+        )
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -198,6 +268,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
+    @conditional_list(Category)
     def list(self, request: Request) -> Response:
         """List all categories."""
         categories = Category.objects.all().order_by("name")
@@ -212,10 +283,10 @@ class CategoryViewSet(viewsets.ModelViewSet):
         try:
             category = Category.objects.get(pk=pk)
             products = category.products.all().order_by("name")
-            serializer = ProductSerializer(
-                products, many=True, context={"request": request}
+            return Response(
+                serialize_product_rows(get_product_rows(products), request),
+                status=status.HTTP_200_OK,
             )
-            return Response(serializer.data, status=status.HTTP_200_OK)
         except Category.DoesNotExist:
             return Response(
                 {"error": "Category not found"}, status=status.HTTP_404_NOT_FOUND
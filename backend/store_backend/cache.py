@@ -0,0 +1,328 @@
+"""
+Response cache for the dashboard and analytics endpoints.
+
+Every open dashboard polls the same handful of read-only endpoints, so their
+responses are cached in the configured Django cache (local memory or files,
+no external service needed). A cache key is made of:
+
+- the endpoint name and its normalized query parameters,
+- the data-version stamp of every scope the endpoint reads ("orders",
+  "products", "inventory"), which writers replace through mark_changed,
+- optionally a value such as the store's current day.
+
+A write therefore never needs to know which responses it makes stale: new
+stamps simply lead to new keys, and old entries age out with their TTL.
+The responses may be cached per worker process, but the stamps live in a
+separate cache (API_CACHE_STAMP_ALIAS) that all workers share, so a write
+in one worker invalidates the responses of every other at once. A
+process-local stamp cache is only correct with a single worker, and the
+system checks warn about it.
+When an entry is missing, only one request per key recomputes it while the
+others wait for its result (single-flight), and hits, misses and waits are
+counted per endpoint.
+"""
+
+import hashlib
+import json
+import time
+import uuid
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+KEY_PREFIX = "api-cache"
+SCOPES = ("orders", "products", "inventory")
+
+# Longest a request waits for another one computing the same entry
+LOCK_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+
+COUNTERS = ("hits", "misses", "waits")
+
+# Endpoint names registered through cached_api, for get_cache_stats
+ENDPOINTS = set()
+
+
+def get_cache():
+    """Cache holding the responses and counters"""
+    return caches[getattr(settings, "API_CACHE_ALIAS", "default")]
+
+
+def get_stamp_cache():
+    """Cache shared by all workers holding the data-version stamps"""
+    return caches[getattr(settings, "API_CACHE_STAMP_ALIAS", "stamps")]
+
+
+@checks.register(checks.Tags.caches)
+def check_stamp_cache(app_configs, **kwargs):
+    """Warn when the data-version stamps are kept per process"""
+    if not is_enabled() or not isinstance(get_stamp_cache(), LocMemCache):
+        return []
+    return [
+        checks.Warning(
+            "The API response cache keeps its data-version stamps in process "
+            "memory, so writes only invalidate the responses of the worker "
+            "that made them.",
+            hint="Use CACHE_STAMPS_BACKEND=file or redis unless the site runs "
+            "a single worker process.",
+            id="store_backend.W001",
+        )
+    ]
+
+
+def is_enabled() -> bool:
+    """Whether responses are cached at all (API_CACHE_ENABLED)"""
+    return getattr(settings, "API_CACHE_ENABLED", True)
+
+
+def _version_key(scope: str) -> str:
+    return f"{KEY_PREFIX}:version:{scope}"
+
+
+def _counter_key(endpoint: str, counter: str) -> str:
+    return f"{KEY_PREFIX}:stats:{endpoint}:{counter}"
+
+
+def bump_versions(*scopes: str) -> None:
+    """
+    Give scopes new data-version stamps right away
+
+    Args:
+        scopes: Names from SCOPES whose data changed
+    """
+    get_stamp_cache().set_many(
+        {_version_key(scope): uuid.uuid4().hex for scope in scopes}, timeout=None
+    )
+
+
+def mark_changed(*scopes: str) -> None:
+    """
+    Record that the data behind scopes changed
+
+    The stamps are replaced at once, so reads later in the same transaction
+    miss the cache, and again on commit, so no entry computed from the
+    uncommitted state in the meantime outlives the transaction.
+
+    Args:
+        scopes: Names from SCOPES whose data changed
+    """
+    bump_versions(*scopes)
+    transaction.on_commit(lambda: bump_versions(*scopes))
+
+
+def get_versions(scopes: Iterable[str]) -> Dict[str, str]:
+    """
+    Current data-version stamp of each scope, creating missing ones
+
+    Args:
+        scopes: Names from SCOPES
+
+    Returns:
+        Mapping of scope to stamp
+    """
+    cache = get_stamp_cache()
+    keys = {scope: _version_key(scope) for scope in scopes}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for scope, key in keys.items():
+        stamp = found.get(key)
+        if stamp is None:
+            # add() keeps a stamp another request created in the meantime
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            stamp = cache.get(key)
+        versions[scope] = stamp
+    return versions
+
+
+def normalize_params(request: Request) -> Dict[str, Any]:
+    """
+    Query parameters in a canonical form for cache keys
+
+    Parameter order and blank values do not matter; repeated parameters are
+    kept as sorted lists.
+
+    Args:
+        request: DRF request
+
+    Returns:
+        Sorted mapping of parameter name to value(s)
+    """
+    params = {}
+    for name in sorted(request.query_params):
+        values = sorted(value for value in request.query_params.getlist(name) if value)
+        if values:
+            params[name] = values[0] if len(values) == 1 else values
+    return params
+
+
+def make_key(
+    endpoint: str,
+    params: Dict[str, Any],
+    versions: Dict[str, str],
+    vary: Any = None,
+) -> str:
+    """
+    Cache key of one endpoint response
+
+    Args:
+        endpoint: Endpoint name
+        params: Normalized query parameters
+        versions: Data-version stamps of the scopes the endpoint reads
+        vary: Any further JSON-serializable value the response depends on
+
+    Returns:
+        Cache key
+    """
+    payload = json.dumps(
+        [params, sorted(versions.items()), vary],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    digest = hashlib.sha1(payload.encode()).hexdigest()
+    return f"{KEY_PREFIX}:{endpoint}:{digest}"
+
+
+def _count(endpoint: str, counter: str) -> None:
+    cache = get_cache()
+    key = _counter_key(endpoint, counter)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Hit, miss and wait counters of every cached endpoint
+
+    Waits are requests that found another one computing the same entry and
+    were served its result.
+
+    Returns:
+        Mapping of endpoint name to its counters and hit rate
+    """
+    cache = get_cache()
+    keys = {
+        (endpoint, counter): _counter_key(endpoint, counter)
+        for endpoint in ENDPOINTS
+        for counter in COUNTERS
+    }
+    found = cache.get_many(keys.values())
+    stats = {}
+    for endpoint in sorted(ENDPOINTS):
+        counts = {
+            counter: found.get(keys[(endpoint, counter)], 0) for counter in COUNTERS
+        }
+        requests = sum(counts.values())
+        served = counts["hits"] + counts["waits"]
+        counts["hit_rate"] = round(served / requests, 4) if requests else None
+        stats[endpoint] = counts
+    return stats
+
+
+def reset_cache_stats() -> None:
+    """Set every endpoint counter back to zero"""
+    get_cache().delete_many(
+        [
+            _counter_key(endpoint, counter)
+            for endpoint in ENDPOINTS
+            for counter in COUNTERS
+        ]
+    )
+
+
+def _cached_response(data: Any, outcome: str) -> Response:
+    return Response(data, status=status.HTTP_200_OK, headers={"X-Cache": outcome})
+
+
+def _compute(cache, key: str, ttl: int, view: Callable, args, kwargs) -> Response:
+    """Run the view and cache a successful response"""
+    response = view(*args, **kwargs)
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(key, response.data, timeout=ttl)
+    response["X-Cache"] = "MISS"
+    return response
+
+
+def cached_api(
+    endpoint: str,
+    scopes: Iterable[str],
+    ttl: int,
+    vary: Optional[Callable[[], Any]] = None,
+) -> Callable:
+    """
+    Cache the successful responses of a read-only API view
+
+    Wraps a function view (below @api_view) or a viewset action. Responses
+    carry an X-Cache header of HIT, MISS or WAIT.
+
+    Args:
+        endpoint: Name used in cache keys and the counters
+        scopes: Data scopes the response is computed from
+        ttl: Seconds an entry is served at most
+        vary: Callable returning anything else the response depends on,
+            such as the current store day
+
+    Returns:
+        View decorator
+    """
+    scopes = tuple(scopes)
+    unknown = set(scopes) - set(SCOPES)
+    if unknown:
+        raise ValueError(f"Unknown cache scopes: {', '.join(sorted(unknown))}")
+    ENDPOINTS.add(endpoint)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return view(*args, **kwargs)
+
+            request = args[0] if isinstance(args[0], Request) else args[1]
+            cache = get_cache()
+            key = make_key(
+                endpoint,
+                normalize_params(request),
+                get_versions(scopes),
+                vary() if vary else None,
+            )
+
+            data = cache.get(key)
+            if data is not None:
+                _count(endpoint, "hits")
+                return _cached_response(data, "HIT")
+
+            lock_key = f"{key}:lock"
+            if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+                _count(endpoint, "misses")
+                try:
+                    return _compute(cache, key, ttl, view, args, kwargs)
+                finally:
+                    cache.delete(lock_key)
+
+            # Another request is computing this entry; wait for its result
+            deadline = time.monotonic() + LOCK_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                data = cache.get(key)
+                if data is not None:
+                    _count(endpoint, "waits")
+                    return _cached_response(data, "WAIT")
+                if cache.get(lock_key) is None:
+                    break
+            _count(endpoint, "misses")
+            return _compute(cache, key, ttl, view, args, kwargs)
+
+        return wrapper
+
+    return decorator
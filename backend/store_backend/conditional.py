@@ -0,0 +1,144 @@
+"""
+Conditional GET for the list endpoints tills and the frontend reload often.
+
+A list's validator is read in one query: for every table the list is built
+from, MAX(updated_at) and COUNT(*), combined with UNION ALL. Any save bumps
+updated_at (stock changes included, see stock_update), an insert or delete
+changes the count, so the validator changes whenever the list can. The
+strong ETag hashes the validator together with the path, the normalized
+query parameters and the negotiated media type, and Last-Modified is the
+newest updated_at.
+
+A request whose If-None-Match matches is answered 304 before the view
+runs, so nothing is fetched or serialized. If-Modified-Since is not used
+for 304s: a deletion leaves MAX(updated_at) unchanged and only the ETag
+sees it.
+"""
+
+import hashlib
+import json
+from functools import wraps
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from django.db.models import CharField, Count, Max, Model, Value
+from django.http import HttpResponseNotModified
+from django.utils.http import http_date, parse_etags
+from rest_framework import status
+from rest_framework.request import Request
+from .cache import normalize_params
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def get_validator(
+    models: Sequence[type[Model]],
+) -> Tuple[List[Tuple[str, Optional[str], int]], Optional[float]]:
+    """
+    Read the change markers of several tables in one query
+
+    Args:
+        models: Models whose tables the response is built from; each needs
+            an updated_at field
+
+    Returns:
+        Tuple of (per-table label, newest updated_at and row count; newest
+        updated_at of all as a timestamp, or None if every table is empty)
+    """
+    parts = [
+        model.objects.order_by()
+        .annotate(source=Value(model._meta.label, output_field=CharField()))
+        .values("source")
+        .annotate(latest=Max("updated_at"), rows=Count("pk"))
+        for model in models
+    ]
+    query = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+    rows = list(query)
+    validator = sorted(
+        (
+            row["source"],
+            row["latest"].isoformat() if row["latest"] else None,
+            row["rows"],
+        )
+        for row in rows
+    )
+    latest = [row["latest"] for row in rows if row["latest"]]
+    return validator, max(latest).timestamp() if latest else None
+
+
+def make_etag(request: Request, validator: List[Tuple]) -> str:
+    """
+    Strong ETag of a list response
+
+    Args:
+        request: DRF request, after content negotiation
+        validator: Table markers from get_validator
+
+    Returns:
+        Quoted ETag value
+    """
+    payload = json.dumps(
+        [
+            request.path,
+            normalize_params(request),
+            getattr(request, "accepted_media_type", None),
+            validator,
+        ],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return f'"{hashlib.sha1(payload.encode()).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match names the ETag (weak comparison, as per RFC 9110)"""
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    tags = parse_etags(header)
+    if tags == ["*"]:
+        return True
+    return etag in (tag.removeprefix("W/") for tag in tags)
+
+
+def _set_validators(response, etag: str, last_modified: Optional[float]) -> None:
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    # Let browsers keep the list but ask again before each use
+    response["Cache-Control"] = CACHE_CONTROL
+
+
+def conditional_list(*models: type[Model]) -> Callable:
+    """
+    Add ETag / Last-Modified to a read-only list view and answer 304s
+
+    Wraps a function view (below @api_view) or a viewset method.
+
+    Args:
+        models: Models whose tables the response is built from
+
+    Returns:
+        View decorator
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request = args[0] if isinstance(args[0], Request) else args[1]
+            validator, last_modified = get_validator(models)
+            etag = make_etag(request, validator)
+
+            if etag_matches(request, etag):
+                response = HttpResponseNotModified()
+                _set_validators(response, etag, last_modified)
+                return response
+
+            response = view(*args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                _set_validators(response, etag, last_modified)
+            return response
+
+        return wrapper
+
+    return decorator
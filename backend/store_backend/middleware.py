@@ -0,0 +1,68 @@
+"""
+Compression of API responses.
+
+Order, product and inventory lists are repetitive JSON that shrinks to a
+fraction of its size, which matters most to tills on slow shop networks.
+CompressionMiddleware picks the encoding from the request's
+Accept-Encoding: Brotli when the optional brotli package is installed and
+the client accepts "br", otherwise gzip through Django's GZipMiddleware.
+Responses below COMPRESSION_MIN_SIZE bytes are sent as they are, since
+compressing them costs more time than it saves on the wire; streaming
+responses such as the exports are gzipped chunk by chunk.
+"""
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Quality 4-5 compresses JSON better than gzip at a similar speed; higher
+# levels are meant for static files compressed once
+BROTLI_QUALITY = 5
+
+re_accepts_brotli = _lazy_re_compile(r"\bbr\b")
+
+
+def get_min_size() -> int:
+    """Smallest response body compressed, in bytes (COMPRESSION_MIN_SIZE)"""
+    return getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress responses with Brotli or gzip, whichever the client accepts
+
+    Like GZipMiddleware, sets Vary: Accept-Encoding, weakens strong ETags of
+    compressed responses and keeps the body as it is when compression would
+    not make it smaller.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header("Content-Encoding"):
+            return super().process_response(request, response)
+        if len(response.content) < get_min_size():
+            return response
+
+        accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if brotli is None or not re_accepts_brotli.search(accept_encoding):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        compressed_content = brotli.compress(
+            response.content, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY
+        )
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers["Content-Length"] = str(len(response.content))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
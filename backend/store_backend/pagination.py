@@ -0,0 +1,405 @@
+"""
+Pagination shared by the list endpoints.
+
+Page-number pagination with an exact count stays the default. Two opt-in
+query parameters make long lists cheaper to walk:
+
+- pagination=cursor: keyset pagination over a fixed (column, id) ordering.
+  Each page is a range scan from the last row of the previous one, so deep
+  pages cost the same as the first and no COUNT is run.
+- count=approximate: page-number pagination that takes the row count from
+  table statistics (or a count capped at PAGINATION_COUNT_CAP rows) instead
+  of an exact COUNT(*).
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 1000
+
+
+def get_count_cap() -> int:
+    """Rows counted at most when estimating a filtered list's size"""
+    return max(1, getattr(settings, "PAGINATION_COUNT_CAP", 1000))
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encode the ordering values of a row as an opaque cursor token
+
+    Args:
+        values: Values of the cursor ordering columns for the row
+
+    Returns:
+        URL-safe cursor string
+    """
+
+    def plain(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, (UUID, Decimal)):
+            return str(value)
+        return value
+
+    payload = json.dumps([plain(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> List[Any]:
+    """
+    Decode a cursor token made by encode_cursor
+
+    Args:
+        token: Cursor string from the client
+        size: Number of values the cursor must hold
+
+    Returns:
+        List of ordering values
+
+    Raises:
+        NotFound: If the token is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise NotFound("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise NotFound("Invalid cursor")
+    return values
+
+
+def keyset_paginate(
+    queryset: QuerySet,
+    ordering: Sequence[str],
+    page_size: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one page of a queryset after a cursor
+
+    The ordering must end in a unique column (normally the primary key) so
+    that it is total; the page is then everything strictly after the
+    cursor row, e.g. created_at < c OR (created_at = c AND id < i).
+
+    Args:
+        queryset: Rows to paginate, model instances or values() dicts
+        ordering: Cursor columns, "-" prefixed for descending order
+        page_size: Number of rows per page
+        cursor: Token of the last row of the previous page
+
+    Returns:
+        Tuple of (rows, next cursor or None on the last page)
+    """
+    queryset = queryset.order_by(*ordering)
+    fields = [(key.lstrip("-"), key.startswith("-")) for key in ordering]
+
+    if cursor:
+        values = decode_cursor(cursor, len(fields))
+        try:
+            queryset = queryset.filter(keyset_after_q(ordering, values))
+        except (DjangoValidationError, TypeError, ValueError):
+            raise NotFound("Invalid cursor")
+
+    rows = list(queryset[: page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+    values = []
+    for field, _ in fields:
+        if isinstance(last, dict):
+            # values() rows
+            values.append(last[field])
+            continue
+        value = last
+        for attribute in field.split("__"):
+            value = getattr(value, attribute)
+        values.append(value)
+    return rows, encode_cursor(values)
+
+
+def keyset_after_q(ordering: Sequence[str], values: Sequence[Any]) -> Q:
+    """
+    Filter for the rows strictly after a row in a keyset ordering
+
+    Args:
+        ordering: Keyset columns, "-" prefixed for descending order
+        values: Values of those columns for the row
+
+    Returns:
+        Q object, e.g. created_at > c OR (created_at = c AND id > i)
+    """
+    fields = [(key.lstrip("-"), key.startswith("-")) for key in ordering]
+    after = []
+    for position, (field, descending) in enumerate(fields):
+        equal = {name: value for (name, _), value in zip(fields[:position], values)}
+        lookup = f"{field}__{'lt' if descending else 'gt'}"
+        after.append(Q(**equal, **{lookup: values[position]}))
+    return reduce(or_, after)
+
+
+def keyset_chunks(
+    queryset: QuerySet,
+    ordering: Sequence[str],
+    fields: Sequence[str],
+    chunk_size: int = 2000,
+) -> Iterator[List[Tuple]]:
+    """
+    Walk a whole queryset as tuples, one keyset query per chunk
+
+    Unlike QuerySet.iterator(), which MySQL drivers buffer in full, every
+    chunk is a separate range query resuming after the last row of the
+    previous one, so memory stays flat however many rows there are.
+
+    Args:
+        queryset: Rows to walk
+        ordering: Keyset columns ending in a unique one, "-" for descending
+        fields: Columns to return, as for values_list()
+        chunk_size: Rows fetched per query
+
+    Returns:
+        Iterator of lists of value tuples (only the requested fields)
+    """
+    keys = [key.lstrip("-") for key in ordering]
+    columns = list(fields) + [key for key in keys if key not in fields]
+    positions = [columns.index(key) for key in keys]
+    width = len(fields)
+
+    queryset = queryset.order_by(*ordering).values_list(*columns)
+    after = None
+    while True:
+        chunk = queryset.filter(after) if after is not None else queryset
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+        yield rows if len(columns) == width else [row[:width] for row in rows]
+        if len(rows) < chunk_size:
+            return
+        after = keyset_after_q(ordering, [rows[-1][position] for position in positions])
+
+
+def approximate_count(queryset: QuerySet) -> int:
+    """
+    Estimate the number of rows in a queryset without a full COUNT(*)
+
+    Unfiltered querysets use the table statistics kept by MySQL or
+    PostgreSQL. Anything else is counted up to PAGINATION_COUNT_CAP rows,
+    which stops the scan early on large result sets.
+
+    Args:
+        queryset: Rows to count
+
+    Returns:
+        Estimated number of rows
+    """
+    if not queryset.query.where and not queryset.query.distinct:
+        estimate = _table_estimate(queryset)
+        if estimate:
+            return estimate
+    return queryset[: get_count_cap()].count()
+
+
+def _table_estimate(queryset: QuerySet) -> Optional[int]:
+    """Row estimate for a model's table from the database statistics"""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == "mysql":
+        sql = (
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+        )
+    elif connection.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = %s"
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] and row[0] > 0 else None
+
+
+class ApproximatePage(Page):
+    """Page that knows from its own fetch whether a next page exists"""
+
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator that estimates its count instead of running COUNT(*)
+
+    Pages are fetched with one extra row so has_next() is exact, and the
+    count is corrected from what the page shows: never less than the rows
+    seen so far, and exact once the last page has been read.
+    """
+
+    @cached_property
+    def count(self):
+        return approximate_count(self.object_list)
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("That page number is not an integer")
+        if number < 1:
+            raise EmptyPage("That page number is less than 1")
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom : bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage("That page contains no results")
+
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        seen = bottom + len(rows)
+        self.__dict__["count"] = max(self.count, seen + has_more) if has_more else seen
+        return ApproximatePage(rows, number, self, has_more)
+
+
+def get_page_size(request, default: int = DEFAULT_PAGE_SIZE) -> int:
+    """Read page_size from the query string, bounded to MAX_PAGE_SIZE"""
+    try:
+        page_size = int(request.query_params.get("page_size", default))
+    except (TypeError, ValueError):
+        page_size = default
+    return min(max(page_size, 1), MAX_PAGE_SIZE)
+
+
+def paginate_list(
+    request, queryset: QuerySet, cursor_ordering: Sequence[str]
+) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    Paginate a list for the hand-written list endpoints
+
+    Returns the rows of the requested page and the pagination fields of the
+    response. By default these are count, num_pages, current_page, has_next
+    and has_previous; count=approximate adds count_is_approximate, and
+    pagination=cursor returns next_cursor and has_next instead.
+
+    Args:
+        request: DRF request carrying the query parameters
+        queryset: Filtered and ordered rows to paginate
+        cursor_ordering: Columns keying cursor pagination, ending in a unique one
+
+    Returns:
+        Tuple of (page rows, pagination fields)
+    """
+    page_size = get_page_size(request)
+    params = request.query_params
+
+    if params.get("pagination") == "cursor":
+        rows, next_cursor = keyset_paginate(
+            queryset, cursor_ordering, page_size, params.get("cursor")
+        )
+        return rows, {"next_cursor": next_cursor, "has_next": next_cursor is not None}
+
+    approximate = params.get("count") == "approximate"
+    paginator_class = ApproximateCountPaginator if approximate else Paginator
+    paginator = paginator_class(queryset, page_size)
+    try:
+        page = paginator.page(params.get("page", 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        if approximate:
+            # Past the end of an estimated list; settle for the exact last page
+            paginator = Paginator(queryset, page_size)
+        page = paginator.page(paginator.num_pages)
+
+    meta = {
+        "count": paginator.count,
+        "num_pages": paginator.num_pages,
+        "current_page": page.number,
+        "has_next": page.has_next(),
+        "has_previous": page.has_previous(),
+    }
+    if approximate:
+        # The count is exact once the last page has been read
+        meta["count_is_approximate"] = page.has_next()
+    return list(page), meta
+
+
+class StorePagination(PageNumberPagination):
+    """
+    DRF pagination for the generic list views
+
+    Responds with the usual count/next/previous/results page. Views that
+    define cursor_ordering also accept pagination=cursor, and any view can
+    take count=approximate.
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor_mode = False
+        self.approximate = request.query_params.get("count") == "approximate"
+
+        ordering = getattr(view, "cursor_ordering", None)
+        if ordering and request.query_params.get("pagination") == "cursor":
+            self.cursor_mode = True
+            rows, self.next_cursor = keyset_paginate(
+                queryset,
+                ordering,
+                self.get_page_size(request),
+                request.query_params.get("cursor"),
+            )
+            return rows
+
+        self.django_paginator_class = (
+            ApproximateCountPaginator if self.approximate else Paginator
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), "page")
+        return replace_query_param(url, "cursor", self.next_cursor)
+
+    def get_paginated_response(self, data):
+        if self.cursor_mode:
+            return Response(
+                {
+                    "next": self.get_next_link(),
+                    "next_cursor": self.next_cursor,
+                    "results": data,
+                }
+            )
+        response = super().get_paginated_response(data)
+        if self.approximate:
+            response.data["count_is_approximate"] = self.page.has_next()
+        return response
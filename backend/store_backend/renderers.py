@@ -0,0 +1,84 @@
+"""
+JSON rendering for the API.
+
+FastJSONRenderer writes the same bytes as DRF's JSONRenderer, only faster:
+when orjson is installed (it is optional) the response data is encoded
+by orjson, which walks dicts, lists, strings, numbers, UUIDs and dates
+natively in C. Everything orjson leaves to Python is handed to DRF's own
+encoder, so datetimes keep the "Z" suffix, Decimals outside serializers
+become floats and lazy strings, querysets and the like work as before.
+Without orjson, with JSON_RENDERER_BACKEND=stdlib, for indented output
+(the browsable API, "Accept: application/json; indent=4") and for data
+orjson cannot encode (integers beyond 64 bits), DRF's renderer is used.
+"""
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = ("auto", "orjson", "stdlib")
+
+# DRF escapes these two so the output is also a valid JavaScript literal
+LINE_SEPARATORS = (
+    ("\u2028".encode(), b"\\u2028"),
+    ("\u2029".encode(), b"\\u2029"),
+)
+
+
+def get_backend() -> str:
+    """
+    JSON encoder in use, from JSON_RENDERER_BACKEND
+
+    Returns:
+        'orjson' or 'stdlib'
+
+    Raises:
+        ValueError: For an unknown backend, or orjson when it is not installed
+    """
+    name = getattr(settings, "JSON_RENDERER_BACKEND", "auto")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON renderer backend: {name}")
+    if name == "orjson" and orjson is None:
+        raise ValueError("JSON_RENDERER_BACKEND is orjson but it is not installed")
+    if name == "auto":
+        return "orjson" if orjson is not None else "stdlib"
+    return name
+
+
+if orjson is not None:
+    # Datetimes go through DRF's encoder for its "Z" suffix; int dict keys
+    # are written as strings, like the json module does
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+    """DRF's JSONRenderer, encoding with orjson when it is available"""
+
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None
+            or get_backend() == "stdlib"
+            or not (api_settings.COMPACT_JSON and api_settings.UNICODE_JSON)
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=self.encoder.default, option=ORJSON_OPTIONS
+            )
+        except TypeError:
+            # orjson.JSONEncodeError; the json module either manages (big
+            # integers) or raises the error DRF would
+            return super().render(data, accepted_media_type, renderer_context)
+        for character, escaped in LINE_SEPARATORS:
+            if character in content:
+                content = content.replace(character, escaped)
+        return content
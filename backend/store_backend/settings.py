@@ -56,6 +56,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "store_backend.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -98,6 +99,10 @@ DATABASES = {
         "PORT": config("MYSQL_PORT", default="3306"),
     }
 }
+# The same database on a second, autocommit connection, on which the daily
+# order number counter is bumped outside checkout transactions (see
+# ORDER_NUMBER_OWN_CONNECTION); tests reach it through the default database
+DATABASES["order_numbers"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
 
 
 # Password validation
@@ -126,6 +131,81 @@ LANGUAGE_CODE = "en-us"
 
 TIME_ZONE = "UTC"
 
+# Local timezone of the store, used for calendar days and hours in reports
+STORE_TIME_ZONE = config("STORE_TIME_ZONE", default=TIME_ZONE)
+
+# Order numbers reserved per database round trip by each worker process.
+# 1 hands out consecutive numbers; larger blocks save round trips at the
+# cost of gaps when a worker exits with unused numbers.
+ORDER_NUMBER_BLOCK_SIZE = config("ORDER_NUMBER_BLOCK_SIZE", default=1, cast=int)
+# Bump the daily order number counter on a separate autocommit connection so
+# checkouts do not hold its row lock until they commit. A rolled back
+# checkout then leaves a gap in the numbers (SQLite always uses the
+# checkout's own connection).
+ORDER_NUMBER_OWN_CONNECTION = config(
+    "ORDER_NUMBER_OWN_CONNECTION", default=True, cast=bool
+)
+
+# Rows counted at most for count=approximate on filtered lists; unfiltered
+# lists take their count from the database table statistics instead.
+PAGINATION_COUNT_CAP = config("PAGINATION_COUNT_CAP", default=1000, cast=int)
+
+# Product search backend: auto (MySQL FULLTEXT on MySQL, in-process index
+# elsewhere), fulltext, memory or database (plain icontains filtering).
+PRODUCT_SEARCH_BACKEND = config("PRODUCT_SEARCH_BACKEND", default="auto")
+# How often the in-process index picks up changes made by other workers
+PRODUCT_SEARCH_REFRESH_SECONDS = config(
+    "PRODUCT_SEARCH_REFRESH_SECONDS", default=30, cast=int
+)
+
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+# Cache for the dashboard and analytics responses. "locmem" keeps one cache
+# per worker process; "file" shares it between the workers of one host.
+CACHE_BACKEND = config("CACHE_BACKEND", default="locmem")
+# Data-version stamps that invalidate those responses. Every worker must see
+# the same stamps, so keep them in a shared store: "file" for the workers of
+# one host, "redis" (CACHE_STAMPS_LOCATION=redis://...) across hosts.
+# "locmem" is only correct with a single worker process.
+CACHE_STAMPS_BACKEND = config("CACHE_STAMPS_BACKEND", default="file")
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        "LOCATION": config(
+            "CACHE_LOCATION",
+            default=str(BASE_DIR / "cache") if CACHE_BACKEND == "file" else "store",
+        ),
+        "OPTIONS": {"MAX_ENTRIES": config("CACHE_MAX_ENTRIES", default=5000, cast=int)},
+    },
+    "stamps": {
+        "BACKEND": CACHE_BACKENDS[CACHE_STAMPS_BACKEND],
+        "LOCATION": config(
+            "CACHE_STAMPS_LOCATION",
+            default=(
+                str(BASE_DIR / "cache" / "stamps")
+                if CACHE_STAMPS_BACKEND == "file"
+                else "stamps"
+            ),
+        ),
+    },
+}
+# Set to False to compute every dashboard and analytics response afresh
+API_CACHE_ENABLED = config("API_CACHE_ENABLED", default=True, cast=bool)
+
+# Seconds the in-process POS catalogue trusts itself before checking the
+# catalogue version again (changes made in the same worker apply at once)
+POS_CATALOGUE_CHECK_SECONDS = config("POS_CATALOGUE_CHECK_SECONDS", default=1, cast=int)
+
+# API JSON encoder: auto (orjson when installed, else the json module),
+# orjson or stdlib. Both write the same output; orjson is optional.
+JSON_RENDERER_BACKEND = config("JSON_RENDERER_BACKEND", default="auto")
+# Responses smaller than this many bytes are not gzip/Brotli compressed
+# (Brotli needs the optional brotli package)
+COMPRESSION_MIN_SIZE = config("COMPRESSION_MIN_SIZE", default=1024, cast=int)
+
 USE_I18N = True
 
 USE_TZ = True
@@ -159,7 +239,7 @@ REST_FRAMEWORK = {
         "rest_framework.filters.OrderingFilter",
     ],
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "store_backend.renderers.FastJSONRenderer",
     ],
     "DEFAULT_PARSER_CLASSES": [
         "rest_framework.parsers.JSONParser",